@@ -1,4 +1,12 @@
 import gamelib
+from gamelib.range_table import get_range_table
+from gamelib.unit_spec import get_unit_specs
+from gamelib.frame_events import decode_frame_events
+from gamelib.heatmap import HeatmapStore, HEATMAP_EVENTS, UNIT_TYPE_FIELD
+from gamelib.distance_field import rank_locations
+from gamelib.turn_scheduler import TurnScheduler
+from gamelib.replay import record_from_environment
+from gamelib.profiler import profiler, enable_from_environment
 import random
 import math
 import warnings
@@ -15,11 +23,27 @@ Advanced strategy tips:
   - You can analyze action frames by modifying on_action_frame function
 
   - The GameState.map object can be manually manipulated to create hypothetical 
-  board states. Though, we recommended making a copy of the map to preserve 
-  the actual current map state.
+  board states. Though, we recommended working on game_state.fork() to preserve 
+  the actual current map state. Forks are copy-on-write and game_state.diff() 
+  shows what changed.
 """
 
 class AlgoStrategy(gamelib.AlgoCore):
+    # Tuning constants. gamelib.tournament plays variants that override them against each other.
+    # The breach and damage totals are multiplied by this every turn, 1.0 never forgets
+    HEATMAP_DECAY = 1.0
+    # The event field the breach and damage totals add up. This strategy has always added the unit type field.
+    HEATMAP_AMOUNT_FIELD = UNIT_TYPE_FIELD
+    # normal_attack goes all in with pings once our bits pass a threshold drawn from this range
+    ATTACK_BITS_RANGE = (10, 20)
+    # normal_encrypt builds encryptors after this turn
+    ENCRYPTOR_TURN = 10
+    # Wall layouts for the left side, they are mirrored for the right side
+    DEFENCE_DESTRUCTORS = [[0, 13], [1, 12]]
+    DEFENCE_FILTERS = [[3, 12], [4, 11], [5, 10], [6, 9], [7, 8], [8, 7], [9, 6], [10, 5], [11, 4], [12, 3], [13, 2]]
+    ENCRYPT_DESTRUCTOR_GROUPS = [[[1, 13], [3, 13]], [[4, 12], [5, 12]], [[4, 13], [6, 11], [7, 10]]]
+    ENCRYPTORS = [[5, 11], [6, 10], [7, 9], [8, 8], [9, 7], [10, 6], [11, 5], [12, 4], [13, 3]]
+
     def __init__(self):
         super().__init__()
         seed = random.randrange(maxsize)
@@ -39,11 +63,19 @@ class AlgoStrategy(gamelib.AlgoCore):
         PING = config["unitInformation"][3]["shorthand"]
         EMP = config["unitInformation"][4]["shorthand"]
         SCRAMBLER = config["unitInformation"][5]["shorthand"]
+        # Compile the unit range tables now instead of on the first turn
+        get_range_table(config)
+        self.unit_specs = get_unit_specs(config)
+        # Set ALGO_PROFILE to get a per-turn timing summary in the debug output
+        if enable_from_environment():
+            profiler.instrument(gamelib.GameState, ("can_spawn", "find_path_to_edge", "get_attackers", "get_target"))
+            profiler.instrument(AlgoStrategy, ("build_group_walls", "least_damage_spawn_location", "detect_enemy_unit"))
         self.cores = 0
         self.bits = 0
-        self.scored_on_locations = dict()
-        self.damaged_on_locations = dict()
+        # Where the enemy scored on us and where our walls took damage
+        self.heatmaps = HeatmapStore(self.HEATMAP_DECAY, self.HEATMAP_AMOUNT_FIELD)
         self.sp = False
+        self.scheduler = None
     
     def on_turn(self, turn_state):
         """
@@ -53,24 +85,30 @@ class AlgoStrategy(gamelib.AlgoCore):
         unit deployments, and transmitting your intended deployments to the
         game engine.
         """
-        if not len(self.scored_on_locations) == 0:
-            for k in self.scored_on_locations:
-                gamelib.debug_write(f'My edge at {k} for {self.scored_on_locations[k]} dmg')
-            #self.scored_on_locations = dict()
-        if not len(self.damaged_on_locations) == 0:
-            for k in self.damaged_on_locations:
-                dmg = self.damaged_on_locations[k]
-                if dmg > 0:
-                    gamelib.debug_write(f'My wall at {k} for {dmg} dmg')
-            #self.damaged_on_locations = dict()
-        game_state = gamelib.GameState(self.config, turn_state)
+        for location, dmg in self.heatmaps.cells("breach", 1):
+            gamelib.debug_write(f'My edge at {location} for {dmg} dmg')
+        for location, dmg in self.heatmaps.cells("damage", 0):
+            if dmg > 0:
+                gamelib.debug_write(f'My wall at {location} for {dmg} dmg')
+        with profiler.stage("parse_state"):
+            game_state = gamelib.GameState(self.config, turn_state, array_board=True)
         #gamelib.debug_write('Performing turn {} of your custom algo strategy'.format(game_state.turn_number))
         #game_state.suppress_warnings(True)  #Comment or remove this line to enable warnings.
         self.cores = game_state.get_resource(game_state.CORES)
         self.bits = game_state.get_resource(game_state.BITS)
+        # The scheduler submits the turn, falling back to the stages finished so far if we run out of time
+        scheduler = TurnScheduler(game_state)
+        # Queued before the loops start watching the clock, so the fallback is always complete
+        scheduler.plan_fallback(self.minimal_plan)
+        self.scheduler = scheduler
         #self.starter_strategy(game_state)
-        self.basic_strategy(game_state)
-        game_state.submit_turn()
+        self.basic_strategy(game_state, scheduler)
+        scheduler.run()
+        # Let the next turn reuse this board's units
+        game_state.release_units()
+        self.scheduler = None
+        self.heatmaps.end_turn()
+        profiler.end_turn(game_state.turn_number)
 
     """
     NOTE: All the methods after this point are part of the sample starter-algo
@@ -81,44 +119,53 @@ class AlgoStrategy(gamelib.AlgoCore):
         cheapest_unit = FILTER
         cost = 0
         for unit in stationary_units:
-            unit_class = gamelib.GameUnit(unit, game_state.config)
-            if unit_class.cost < gamelib.GameUnit(cheapest_unit, game_state.config).cost:
+            spec = self.unit_specs[unit]
+            if spec.cost < self.unit_specs[cheapest_unit].cost:
                 cheapest_unit = unit
-                cost = unit_class.cost
+                cost = spec.cost
         return cheapest_unit, cost
 
-    def basic_strategy(self, game_state):
+    def basic_strategy(self, game_state, scheduler):
         if game_state.turn_number >= 1:
-            self.replace_defense(game_state)
+            scheduler.add_task('replace_defense', self.replace_defense)
 
         if game_state.turn_number == 0:
-            self.first_scrambler(game_state)
+            scheduler.add_task('first_scrambler', self.first_scrambler)
         else:
-            self.normal_attack(game_state)
+            scheduler.add_task('normal_attack', self.normal_attack)
+
+        scheduler.add_task('normal_defence', self.normal_defence)
+        scheduler.add_task('normal_encrypt', self.normal_encrypt)
 
+    def minimal_plan(self, game_state):
+        # The fallback plan if the first stage overruns, run on a fork so only our cores count needs restoring
+        cores = self.cores
         self.normal_defence(game_state)
-        self.normal_encrypt(game_state)
+        self.cores = cores
+
+    def out_of_time(self):
+        # Long loops check this and stop, so the scheduler can submit on time
+        return self.scheduler is not None and self.scheduler.expired()
+
+    def copy_locations(self, locations):
+        # build_group_walls mirrors the locations it is given in place, so it gets copies of the class constants
+        return [list(location) for location in locations]
 
     def normal_defence(self, game_state):
-        destructors_points = [[0, 13], [1, 12]]
-        filters_points = [[3, 12], [4, 11], [5, 10], [6, 9], [7, 8], [8, 7], [9, 6], [10, 5], [11, 4], [12, 3], [13, 2]]    
+        destructors_points = self.copy_locations(self.DEFENCE_DESTRUCTORS)
+        filters_points = self.copy_locations(self.DEFENCE_FILTERS)
         self.build_group_walls(game_state, FILTER, filters_points)    
         self.build_group_walls(game_state, FILTER, filters_points, True)
         self.build_group_walls(game_state, DESTRUCTOR, destructors_points)    
         self.build_group_walls(game_state, DESTRUCTOR, destructors_points, True)
         
     def normal_encrypt(self, game_state):
-        teal_destructors_points = [[1, 13], [3, 13]]
-        self.build_group_walls(game_state, DESTRUCTOR, teal_destructors_points)    
-        self.build_group_walls(game_state, DESTRUCTOR, teal_destructors_points, True)
-        yellow_destructors_points = [[4, 12], [5, 12]]
-        self.build_group_walls(game_state, DESTRUCTOR, yellow_destructors_points)    
-        self.build_group_walls(game_state, DESTRUCTOR, yellow_destructors_points, True)
-        yellow_destructors_points = [[4, 13], [6, 11], [7, 10]]
-        self.build_group_walls(game_state, DESTRUCTOR, yellow_destructors_points)    
-        self.build_group_walls(game_state, DESTRUCTOR, yellow_destructors_points, True)
-        if game_state.turn_number > 10:
-            encryptors_points = [[5, 11], [6, 10], [7, 9], [8, 8], [9, 7], [10, 6], [11, 5], [12, 4], [13, 3]]
+        for group in self.ENCRYPT_DESTRUCTOR_GROUPS:
+            destructors_points = self.copy_locations(group)
+            self.build_group_walls(game_state, DESTRUCTOR, destructors_points)    
+            self.build_group_walls(game_state, DESTRUCTOR, destructors_points, True)
+        if game_state.turn_number > self.ENCRYPTOR_TURN:
+            encryptors_points = self.copy_locations(self.ENCRYPTORS)
             encryptors_points = encryptors_points[::-1]
             self.build_group_walls(game_state, ENCRYPTOR, encryptors_points) 
             self.build_group_walls(game_state, ENCRYPTOR, encryptors_points, True)
@@ -131,7 +178,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         self.build_group_walls(game_state, FILTER, block_my_way, is_enempy_left_weak)
         game_state.attempt_remove([2, 12])
         game_state.attempt_remove([25, 12])
-        r = random.randint(10, 20)
+        r = random.randint(*self.ATTACK_BITS_RANGE)
         if self.bits > r:
             if is_enempy_left_weak:
                 self.all_in(game_state, PING, [25, 11])
@@ -152,25 +199,19 @@ class AlgoStrategy(gamelib.AlgoCore):
 
 
     def scrambler_stratgy(self, game_state):
-        sol = sorted(self.scored_on_locations, key=self.scored_on_locations.get, reverse=True)
         rand = random.randint(1, 2)
-        k = 0
-        for i in sol:
-            if self.scored_on_locations == 0:
-                continue
-            self.all_in(game_state, SCRAMBLER, [i // 100, i % 100], rand)
-            self.scored_on_locations[i] //= 2
-            k += 1
-            if k > 1:
-                break
+        for location in self.heatmaps.top_k("breach", 1, 2):
+            self.all_in(game_state, SCRAMBLER, location, rand)
+            self.heatmaps.set("breach", 1, location, self.heatmaps.get("breach", 1, location) // 2)
             
     def replace_defense(self, game_state):
         # Replace destructor
-        for k in self.damaged_on_locations:
-            location = [k // 100, k % 100]
+        for location, _ in self.heatmaps.cells("damage", 0):
+            if self.out_of_time():
+                break
             if game_state.contains_stationary_unit(location):
                 unit = game_state.contains_stationary_unit(location)
-                if unit.stability <= gamelib.GameUnit(unit.unit_type, game_state.config).stability / 4:
+                if unit.stability <= self.unit_specs[unit.unit_type].stability / 4:
                     game_state.attempt_remove(location)
             else:
                 if (location[0] == 25 or location[0] == 2) and location[1] == 12:
@@ -210,9 +251,9 @@ class AlgoStrategy(gamelib.AlgoCore):
         self.build_group_walls(game_state, DESTRUCTOR, locations)
 
         reverse = False
-        sol = sorted(self.scored_on_locations, key=self.scored_on_locations.get, reverse=True)
+        sol = self.heatmaps.top_k("breach", 1, 1)
         if len(sol) > 0:
-            if sol[0] // 100 > 13:
+            if sol[0][0] > 13:
                 reverse = True
 
         locations = []
@@ -240,35 +281,13 @@ class AlgoStrategy(gamelib.AlgoCore):
         for location in locations:
             rlocations.append([27 - location[0], location[1]])
         return rlocations
-    def encodelocation(self, location):
-        return location[0] * 100 + location[1]
-
-    def decodelocation(self, key):
-        return [key // 100, key % 100]
-
-    def eculid_distance(self, game_state, key1, key2):
-        loc1 = self.decodelocation(key1)
-        loc2 = self.decodelocation(key2)
-        return game_state.game_map.distance_between_locations(loc1, loc2)
-
     def advanced_defense(self, game_state):
         destructors = [[3, 13], [1, 12], [2, 12], [2, 11], [3, 11], [4, 9], [5, 9], [6, 9], [7, 9], [8, 9], [9, 9], [10, 9], [11, 9], [12, 9]]
         reversed_destructors = self.reverse_locations(destructors)
         all_locations = destructors + reversed_destructors
-        dictionary = dict()
-        for location in all_locations:
-            dictionary[self.encodelocation(location)] = 999999
-
-        for k in self.scored_on_locations:
-            for l in all_locations:
-                hashkey = self.encodelocation(l)
-                dictionary[hashkey] = min(self.eculid_distance(game_state, hashkey, k), dictionary[hashkey])
-        
-        sol = sorted(dictionary, key=dictionary.get)
-
-        spawn_locations = []
-        for location in sol:
-            spawn_locations.append(self.decodelocation(location))
+        # Closest to where the enemy scored on us first
+        field = game_state.get_distance_field([location for location, _ in self.heatmaps.cells("breach", 1)])
+        spawn_locations = rank_locations(field, all_locations)
         self.build_group_walls(game_state, DESTRUCTOR, spawn_locations)
 
 
@@ -284,6 +303,8 @@ class AlgoStrategy(gamelib.AlgoCore):
         num_success = 0
         wall_locations = []
         for location in locations:
+            if self.out_of_time():
+                break
             tmp = location
             if reverse:
                 tmp[0] = 27 - tmp[0]
@@ -403,7 +424,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         self.build_group_walls(game_state, basic_wall, locations)
 
     def build_wall(self, game_state, unit, location):
-        if not game_state.contains_stationary_unit(location) and game_state.game_map.in_arena_bounds(location):
+        if game_state.filter_legal_placements(unit, [location]):
             if game_state.type_cost(unit) <= self.cores:
                 success = game_state.attempt_spawn(unit, location)
                 self.cores -= success * game_state.type_cost(unit)
@@ -468,7 +489,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         We can track where the opponent scored by looking at events in action frames 
         as shown in the on_action_frame function
         """
-        for location in self.scored_on_locations:
+        for location, _ in self.heatmaps.cells("breach", 1):
             # Build destructor one space above so that it doesn't block our own edge spawn locations
             build_location = [location[0], location[1]+1]
             game_state.attempt_spawn(DESTRUCTOR, build_location)
@@ -501,7 +522,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         Build a line of the cheapest stationary unit so our EMP's can attack from long range.
         """
         # First let's figure out the cheapest unit
-        # We could just check the game rules, but this demonstrates how to use the GameUnit class
+        # We could just check the game rules, but this demonstrates how to use the unit specs
         cheapest_unit, cost = self.get_cheapest_wall(game_state)
 
         # Now let's build out a line of stationary units. This will prevent our EMPs from running into the enemy base.
@@ -520,26 +541,38 @@ class AlgoStrategy(gamelib.AlgoCore):
         estimate the path's damage risk.
         """
         damages = []
+        influence_map = game_state.get_influence_map()
         # Get the damage estimate each path will take
         for location in location_options:
+            if damages and self.out_of_time():
+                break
             path = game_state.find_path_to_edge(location)
-            damage = 0
-            for path_location in path:
-                # Get number of enemy destructors that can attack the final location and multiply by destructor damage
-                damage += len(game_state.get_attackers(path_location, 0)) * gamelib.GameUnit(DESTRUCTOR, game_state.config).damage
-            damages.append(damage)
+            # Sum the damage per frame of enemy destructors that can attack each location on the path
+            damages.append(influence_map.path_damage(path, 0))
         
-        # Now just return the location that takes the least damage
+        # Now just return the location that takes the least damage, of the ones we had time to check
         return location_options[damages.index(min(damages))]
 
     def detect_enemy_unit(self, game_state, unit_type=None, valid_x = None, valid_y = None):
+        occupancy = game_state.get_occupancy_index()
+        x_range = None if valid_x is None else self.consecutive_range(valid_x)
+        y_range = None if valid_y is None else self.consecutive_range(valid_y)
+        if (valid_x is None or x_range) and (valid_y is None or y_range):
+            return occupancy.count(1, unit_type, x_range, y_range)
         total_units = 0
-        for location in game_state.game_map:
-            if game_state.contains_stationary_unit(location):
-                for unit in game_state.game_map[location]:
-                    if unit.player_index == 1 and (unit_type is None or unit.unit_type == unit_type) and (valid_x is None or location[0] in valid_x) and (valid_y is None or location[1] in valid_y):
-                        total_units += 1
+        for x, y in occupancy.locations(1, unit_type):
+            if (valid_x is None or x in valid_x) and (valid_y is None or y in valid_y):
+                total_units += 1
         return total_units
+
+    def consecutive_range(self, values):
+        # (first, last) if values are consecutive integers, so they can be counted as a rectangle
+        if not values:
+            return None
+        first, last = min(values), max(values)
+        if len(set(values)) == last - first + 1:
+            return first, last
+        return None
         
     def filter_blocked_locations(self, locations, game_state):
         filtered = []
@@ -556,41 +589,12 @@ class AlgoStrategy(gamelib.AlgoCore):
         Full doc on format of a game frame at: https://docs.c1games.com/json-docs.html
         """
         # Let's record at what position we get scored on
-        state = json.loads(turn_string)
-        events = state["events"]
-        breaches = events["breach"]
-        damages = events["damage"]
-        self.event_collection(breaches, self.scored_on_locations)
-        self.event_collection(damages, self.damaged_on_locations, True)
-        '''
-        for breach in breaches:
-            location = breach[0]
-            unit_owner_self = True if breach[4] == 1 else False
-            # When parsing the frame data directly, 
-            # 1 is integer for yourself, 2 is opponent (StarterKit code uses 0, 1 as player_index instead)
-            if not unit_owner_self:
-                #gamelib.debug_write("Got scored on at: {}".format(location))
-                location = location[0] * 100 + location[1]
-                if not location in self.scored_on_locations:
-                    self.scored_on_locations[location] = breach[2]
-                else:
-                    self.scored_on_locations[location] += breach[2]
-        '''
+        # Only the event lists we use are decoded, and frames without any of them are skipped
+        events = decode_frame_events(turn_string, HEATMAP_EVENTS)
+        if events is None:
+            return
+        self.heatmaps.add_frame(events)
         
-    def event_collection(self, events, dictionary, is_wall = False):
-         for breach in events:
-            location = breach[0]
-            unit_owner_self = True if breach[4] == 1 else False
-            # When parsing the frame data directly, 
-            # 1 is integer for yourself, 2 is opponent (StarterKit code uses 0, 1 as player_index instead)
-            if (not unit_owner_self and not is_wall) or (is_wall and unit_owner_self and breach[2] in [0, 1, 2]):
-                #gamelib.debug_write("Got scored on at: {}".format(location))
-                location = location[0] * 100 + location[1]
-                if not location in dictionary:
-                    dictionary[location] = breach[2]
-                else:
-                    dictionary[location] += breach[2]       
-
     def distance_x(self, x1, x2):
         return abs(x1 - x2)
 
@@ -616,7 +620,7 @@ class AlgoStrategy(gamelib.AlgoCore):
             for path_location in path:
                 # Get number of enemy destructors that can attack the final location and multiply by destructor damage
                 #damage += len(game_state.get_attackers(path_location, 0)) * gamelib.GameUnit(DESTRUCTOR, game_state.config).damage
-                damage -= len(game_state.get_shielders(path_location, 0)) * gamelib.GameUnit(ENCRYPTOR, game_state.config).stability
+                damage -= len(game_state.get_shielders(path_location, 0)) * self.unit_specs[ENCRYPTOR].stability
                 #damage -= len(game_state.get_walls(path_location, 0)) * gamelib.GameUnit(FILTER, game_state.config).stability
             damages.append(damage)
         # Now just return the location that takes the least damage
@@ -625,4 +629,6 @@ class AlgoStrategy(gamelib.AlgoCore):
         return location_options[damages.index(min(damages))], min(damages)
 if __name__ == "__main__":
     algo = AlgoStrategy()
+    # Set ALGO_RECORD to a file path to record the match for gamelib.replay
+    record_from_environment(algo)
     algo.start()
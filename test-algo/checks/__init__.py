@@ -0,0 +1,21 @@
+"""
+Equivalence checks for the faster replacements of upstream gamelib logic.
+
+Each check compares a replacement against the code it stands in for, or
+against a full recomputation, on randomized boards. Run them from the
+algo's directory with a game config, which can be a json file or a
+recording whose first line is the config:
+
+    python -m checks config.json
+    python -m checks config.json path_field reroutes --seeds 60
+
+The checks are:
+
+    * targeting: GameState.get_targets against get_target (user-022)
+    * path_field: PathField against ShortestPathFinder (user-023)
+    * reroutes: derived PathFields and RerouteAnalysis against full recomputation and ShortestPathFinder (user-024)
+    * binary_replay: messages round tripped through the binary replay format (user-018)
+    * rollback: GameState rollback against a state that never saw the undone changes (user-011)
+
+The runner exits with a non-zero status on the first mismatch.
+"""
@@ -0,0 +1,38 @@
+import argparse
+import importlib
+import sys
+import time
+
+from gamelib.tournament import load_config
+
+from .boards import CheckFailed
+
+CHECKS = ("targeting", "path_field", "reroutes", "binary_replay", "rollback")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the equivalence checks on randomized boards.")
+    parser.add_argument("config", help="A json game config, or a recording whose first line is the config")
+    parser.add_argument("checks", nargs="*", help="The checks to run, out of {}. All of them if none are given".format(", ".join(CHECKS)))
+    parser.add_argument("--seeds", type=int, help="Number of random boards per check, each check's own default if not given")
+    args = parser.parse_args(argv)
+    for name in args.checks:
+        if name not in CHECKS:
+            parser.error("unknown check {}".format(name))
+
+    config = load_config(args.config)
+    for name in args.checks or CHECKS:
+        check = importlib.import_module("." + name, __package__)
+        seeds = check.SEEDS if args.seeds is None else args.seeds
+        start = time.perf_counter()
+        try:
+            summary = check.run(config, seeds)
+        except CheckFailed as failure:
+            print("{}: FAILED {}".format(name, failure))
+            return 1
+        print("{}: {} ({:.1f} s)".format(name, summary, time.perf_counter() - start))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
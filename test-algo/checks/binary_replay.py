@@ -0,0 +1,106 @@
+"""
+The binary replay format must give back the messages it was given.
+
+A synthetic match of turn states and action frames, carrying every event
+type including ones that don't fit a schema, is packed message by message,
+converted to a binary replay and exported back to a text recording. The
+messages must come back equal, except that unit lists come back in x then
+y order and stabilities come back as floats. Stabilities and amounts that
+don't fit a 32 bit float, and unit ids that aren't numbers, must survive
+too. find must land on every turn and frame.
+"""
+import json
+import os
+import tempfile
+
+from gamelib.binary_replay import BinaryReplay, convert_recording, decode_message, encode_message, export_recording
+
+from .boards import CheckFailed, random_state
+
+# Turns in the synthetic match, one per seed
+SEEDS = 30
+FRAMES_PER_TURN = 20
+
+
+def normalized(message):
+    """
+    Sorts the unit lists and makes every stability a float, the two things the format doesn't keep.
+    """
+    message = json.loads(message) if isinstance(message, str) else message
+    for key in ("p1Units", "p2Units"):
+        message[key] = [sorted([entry[0], entry[1], float(entry[2]), entry[3]] for entry in units) for units in message[key]]
+    return json.loads(json.dumps(message))
+
+
+def synthetic_match(config, turns):
+    """
+    One turn state per turn followed by its action frames, with a few events of every type.
+    """
+    messages = []
+    for turn in range(turns):
+        messages.append(random_state(config, turn, turn=turn, info=True))
+        for frame in range(FRAMES_PER_TURN):
+            state = json.loads(random_state(config, turn * 100 + frame, density=0.4, turn=turn))
+            state["turnInfo"] = [1, turn, frame]
+            state["events"] = {
+                "selfDestruct": [[[3, 10], [[4, 11], [5, 11]], 15.0, 3, "77", 1]],
+                "breach": [[[3, 10], 1.0, 3, "1", 2]],
+                "damage": [[[5, 11], 4.0, 2, "2", 1]] * 5 + [[[6, 11], 0.1, 2, "12", 1]],
+                "shield": [[[1, 2], [3, 4], 10.0, 1, "5", "6", 1]],
+                "move": [[[1, 2], [2, 2], [], 3, "9", 1]],
+                "spawn": [[[13, 0], 3, "10", 1]],
+                "death": [[[5, 5], 2, "11", 2, False]],
+                "attack": [[[1, 1], [2, 2], 4.0, 2, "3", "4", 2]],
+                "melee": [["not", "a", "schema"]],
+            }
+            if frame % 5 == 0:
+                state["p1Units"][0].append([13, 13, 33.3, "spawned-{}".format(frame)])
+                state["p2Units"][2].append([14, 14, 1 / 3, "4294967296"])
+            state["endStats"] = {"winner": 1}
+            messages.append(json.dumps(state))
+    return messages
+
+
+def check_match(config, messages, directory):
+    """
+    Packs the messages one by one and through a binary replay file, and reads them back every way the format offers.
+    """
+    for position, message in enumerate(messages):
+        if normalized(decode_message(encode_message(message))) != normalized(message):
+            raise CheckFailed("message {} changes when packed and unpacked".format(position))
+
+    recording_path = os.path.join(directory, "match.txt")
+    binary_path = os.path.join(directory, "match.c1rp")
+    exported_path = os.path.join(directory, "exported.txt")
+    with open(recording_path, "w") as recording:
+        recording.write(json.dumps(config) + "\n")
+        recording.write("\n".join(messages) + "\n")
+    convert_recording(recording_path, binary_path)
+
+    with BinaryReplay(binary_path) as replay:
+        if len(replay) != len(messages):
+            raise CheckFailed("the replay holds {} messages instead of {}".format(len(replay), len(messages)))
+        for position, message in enumerate(messages):
+            turn_info = json.loads(message)["turnInfo"]
+            if turn_info[0] not in (0, 1):
+                continue
+            found = replay.find(turn_info[1], None if turn_info[0] == 0 else turn_info[2])
+            if found < 0 or normalized(replay.message(found)) != normalized(message):
+                raise CheckFailed("find({}) lands on message {} instead of {}".format(turn_info, found, position))
+
+    export_recording(binary_path, exported_path)
+    with open(exported_path) as exported:
+        lines = [line for line in exported.read().splitlines() if line]
+    if json.loads(lines[0]) != config:
+        raise CheckFailed("the exported config differs")
+    for position, (line, message) in enumerate(zip(lines[1:], messages)):
+        if normalized(line) != normalized(message):
+            raise CheckFailed("exported message {} differs".format(position))
+    return "{} messages round trip, json {} bytes, binary {} bytes".format(
+        len(messages), os.path.getsize(recording_path), os.path.getsize(binary_path))
+
+
+def run(config, seeds):
+    messages = synthetic_match(config, seeds)
+    with tempfile.TemporaryDirectory() as directory:
+        return check_match(config, messages, directory)
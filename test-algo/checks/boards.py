@@ -0,0 +1,78 @@
+"""
+Random game states and helpers shared by the checks.
+"""
+import json
+import random
+
+ARENA_SIZE = 28
+HALF_ARENA = 14
+FIREWALL_INDICES = (0, 1, 2)
+MOBILE_TYPES = ("PI", "EI", "SI")
+REMOVE_INDEX = 6
+# Chance of an extra filter on each empty cell, cycled through by seed
+WALL_DENSITIES = (0.05, 0.2, 0.4)
+
+
+class CheckFailed(Exception):
+    """
+    Raised by a check with a description of the first mismatch it finds.
+    """
+
+
+def in_arena_bounds(x, y):
+    """
+    Same diamond as GameMap.in_arena_bounds, without needing a map.
+    """
+    if y < HALF_ARENA:
+        return HALF_ARENA - 1 - y <= x <= HALF_ARENA + y
+    return y - HALF_ARENA <= x <= ARENA_SIZE + HALF_ARENA - 1 - y
+
+
+def random_state(config, seed, density=0.3, turn=5, info=False):
+    """Builds a serialized game state with random firewalls on both halves
+
+    Args:
+        * config: The game config
+        * seed: Seed for the random layout
+        * density: Chance of a firewall on each cell
+        * turn: The turn number written to turnInfo
+        * info: If True, also place a few pings on your spawn points
+
+    Returns:
+        The state as a json string, as sent by the engine
+
+    """
+    rnd = random.Random(seed)
+    units = [[[] for _ in config["unitInformation"]] for _ in range(2)]
+    unit_id = 1
+    for x in range(ARENA_SIZE):
+        for y in range(ARENA_SIZE):
+            if not in_arena_bounds(x, y) or rnd.random() > density:
+                continue
+            player_index = 0 if y < HALF_ARENA else 1
+            type_index = rnd.choice([0, 0, 1, 2, 2])
+            stability = config["unitInformation"][type_index]["stability"] * rnd.choice([1, 1, 0.5, 0.25])
+            units[player_index][type_index].append([x, y, stability, str(unit_id)])
+            unit_id += 1
+            if rnd.random() < 0.1:
+                units[player_index][REMOVE_INDEX].append([x, y, 0, str(unit_id)])
+                unit_id += 1
+    if info:
+        for _ in range(5):
+            x, y = rnd.choice([[13, 0], [14, 0], [3, 10], [24, 10]])
+            units[0][3].append([x, y, 15.0, str(unit_id)])
+            unit_id += 1
+    events = {name: [] for name in ("selfDestruct", "breach", "damage", "shield", "move", "spawn", "death", "attack", "melee")}
+    state = {"p1Units": units[0], "p2Units": units[1], "turnInfo": [0, turn, -1],
+             "p1Stats": [30.0, 25.0, 12.3, 1234], "p2Stats": [28.0, 10.0, 7.0, 2000], "events": events}
+    return json.dumps(state)
+
+
+def add_random_walls(game_state, rnd, density):
+    """
+    Fills empty cells with filters for either player, dense enough on some boards to close off regions.
+    """
+    for location in list(game_state.game_map):
+        if rnd.random() < density and not game_state.game_map[location]:
+            game_state.game_map.add_unit("FF", location, rnd.randrange(2))
+    game_state.invalidate_path_cache()
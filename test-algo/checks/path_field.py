@@ -0,0 +1,35 @@
+"""
+PathField must give the same path as the upstream ShortestPathFinder from
+every open location of the board to each of the four edges, on random
+boards with extra walls, some of them dense enough to close off regions
+that can't reach the edge.
+"""
+import random
+
+from gamelib.game_state import GameState
+from gamelib.navigation import ShortestPathFinder
+
+from .boards import WALL_DENSITIES, CheckFailed, add_random_walls, random_state
+
+SEEDS = 6
+
+
+def run(config, seeds):
+    checked = 0
+    for seed in range(seeds):
+        game_state = GameState(config, random_state(config, seed, turn=seed), array_board=seed % 2 == 0)
+        add_random_walls(game_state, random.Random(seed), WALL_DENSITIES[seed % len(WALL_DENSITIES)])
+        for target_edge in range(4):
+            end_points = game_state.game_map.get_edge_locations(target_edge)
+            field = game_state.get_path_field(target_edge)
+            for location in list(game_state.game_map):
+                if game_state.contains_stationary_unit(location):
+                    if field.path(location) is not None:
+                        raise CheckFailed("seed {} edge {}: PathField found a path from the blocked location {}".format(seed, target_edge, location))
+                    continue
+                expected = ShortestPathFinder().navigate_multiple_endpoints(location, end_points, game_state)
+                path = field.path(location)
+                if path != expected:
+                    raise CheckFailed("seed {} edge {} start {}: PathField {}, ShortestPathFinder {}".format(seed, target_edge, location, path, expected))
+                checked += 1
+    return "{} start and edge pairs match ShortestPathFinder".format(checked)
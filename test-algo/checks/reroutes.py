@@ -0,0 +1,121 @@
+"""
+The what-if pathing used for single firewall changes.
+
+Fields derived with with_firewall and without_firewall, also from other
+derived fields, must equal a PathField computed from scratch for the new
+layout. The reroutes of get_firewall_reroutes and RerouteAnalysis, which
+only walk again the starts near a changed tile, must list exactly the
+starts whose ShortestPathFinder path changes, with that new path.
+"""
+import random
+
+from gamelib.game_state import GameState
+from gamelib.navigation import ShortestPathFinder
+from gamelib.path_field import ARENA_SIZE, PathField, RerouteAnalysis
+
+from .boards import WALL_DENSITIES, CheckFailed, add_random_walls, random_state
+
+SEEDS = 6
+DERIVED_PER_EDGE = 40
+SAMPLE_STEP = 7
+
+
+def toggle(field, location):
+    """
+    Derives the field with the firewall at location added or removed, along with the field computed from scratch.
+    """
+    bit = 1 << (location[0] * ARENA_SIZE + location[1])
+    if field.blocked & bit:
+        return field.without_firewall(location), PathField(field.blocked & ~bit, field.edge_locations)
+    return field.with_firewall(location), PathField(field.blocked | bit, field.edge_locations)
+
+
+def check_derived(field, cells, rnd):
+    """
+    Derives fields for random single changes, and a second change on top of each, and compares them with full recomputation.
+    """
+    for _ in range(DERIVED_PER_EDGE):
+        location = rnd.choice(cells)
+        derived, expected = toggle(field, location)
+        if derived.path_lengths != expected.path_lengths:
+            raise CheckFailed("path lengths after toggling {}".format(location))
+        changed = {index for index, length in enumerate(expected.path_lengths) if length != field.path_lengths[index]}
+        index = location[0] * ARENA_SIZE + location[1]
+        if derived.changed_cells | {index} != changed | {index}:
+            raise CheckFailed("changed cells after toggling {}".format(location))
+        second = rnd.choice(cells)
+        chained, expected = toggle(derived, second)
+        if chained.path_lengths != expected.path_lengths:
+            raise CheckFailed("path lengths after toggling {} then {}".format(location, second))
+        for start in rnd.sample(cells, 30):
+            if chained.path(start) != expected.path(start):
+                raise CheckFailed("path from {} after toggling {} then {}".format(start, location, second))
+
+
+def navigator_paths(game_state, starts):
+    return {tuple(start): ShortestPathFinder().navigate_multiple_endpoints(
+                start, game_state.game_map.get_edge_locations(game_state.get_target_edge(start)), game_state)
+            for start in starts}
+
+
+def check_reroutes(game_state, starts, old_paths, location, changes, add):
+    """
+    Makes the firewall change at location on the board, paths every start with ShortestPathFinder and compares with changes.
+    """
+    if add:
+        game_state.game_map.add_unit("FF", location, 0)
+    else:
+        saved = [(unit.unit_type, unit.player_index) for unit in game_state.game_map[location]]
+        game_state.game_map.remove_unit(location)
+    game_state.invalidate_path_cache()
+    new_paths = navigator_paths(game_state, starts)
+    if add:
+        game_state.game_map.remove_unit(location)
+    else:
+        for unit_type, player_index in saved:
+            game_state.game_map.add_unit(unit_type, location, player_index)
+    game_state.invalidate_path_cache()
+
+    change = "added" if add else "removed"
+    for start, expected in new_paths.items():
+        if expected != old_paths[start]:
+            if changes.get(start, "missing") != expected:
+                raise CheckFailed("firewall {} at {}: start {} should change to {}, got {}".format(change, location, start, expected, changes.get(start, "missing")))
+        elif start in changes:
+            raise CheckFailed("firewall {} at {}: start {} does not change but is listed".format(change, location, start))
+
+
+def run(config, seeds):
+    derived = 0
+    rerouted = 0
+    for seed in range(seeds):
+        rnd = random.Random(seed)
+        game_state = GameState(config, random_state(config, seed, turn=seed), array_board=seed % 2 == 0)
+        add_random_walls(game_state, rnd, WALL_DENSITIES[seed % len(WALL_DENSITIES)])
+        cells = list(game_state.game_map)
+        game_map = game_state.game_map
+        starts = [location for location in game_map.get_edge_locations(game_map.TOP_LEFT) + game_map.get_edge_locations(game_map.TOP_RIGHT)
+                  if not game_state.contains_stationary_unit(location)]
+        try:
+            for target_edge in range(4):
+                check_derived(game_state.get_path_field(target_edge), cells, rnd)
+                derived += DERIVED_PER_EDGE
+
+            old_paths = navigator_paths(game_state, starts)
+            reroutes = game_state.get_firewall_reroutes(starts)
+            for location, changes in sorted(reroutes.items())[::SAMPLE_STEP]:
+                check_reroutes(game_state, starts, old_paths, list(location), changes, True)
+                rerouted += 1
+
+            # Removals go through RerouteAnalysis directly, one edge at a time
+            firewalls = [location for location in cells if game_state.contains_stationary_unit(location) and location[1] < game_state.HALF_ARENA]
+            for location in firewalls[::SAMPLE_STEP]:
+                changes = {}
+                for target_edge in (game_map.BOTTOM_LEFT, game_map.BOTTOM_RIGHT):
+                    edge_starts = [start for start in starts if game_state.get_target_edge(start) == target_edge]
+                    changes.update(RerouteAnalysis(game_state.get_path_field(target_edge), edge_starts).remove_firewall(location))
+                check_reroutes(game_state, starts, old_paths, location, changes, False)
+                rerouted += 1
+        except CheckFailed as failure:
+            raise CheckFailed("seed {}: {}".format(seed, failure))
+    return "{} derived fields match full recomputation, {} reroutes match ShortestPathFinder".format(derived, rerouted)
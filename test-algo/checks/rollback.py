@@ -0,0 +1,120 @@
+"""
+Rollback must put a GameState back exactly as it was.
+
+A random program of spawns and removals runs inside nested savepoints that
+are randomly committed or rolled back. The same changes, minus the rolled
+back ones, are applied to a second GameState without savepoints. Both must
+agree on the board, the resources, the build and deploy stacks, where
+units can be placed, the paths from the edges and the influence map,
+including the caches the first state built before the changes it undid.
+Rolling back while a fork is alive must leave the fork's board alone.
+"""
+import random
+
+from gamelib.game_state import GameState
+
+from .boards import FIREWALL_INDICES, MOBILE_TYPES, CheckFailed, random_state
+
+SEEDS = 20
+STEPS = 80
+
+
+def snapshot(game_state):
+    """
+    Everything rollback has to restore, read through the public interface so cached values are included.
+    """
+    game_map = game_state.game_map
+    cells = list(game_map)
+    units = [[(unit.unit_type, unit.player_index, unit.stability, unit.pending_removal) for unit in game_map[location]] for location in cells]
+    resources = [game_state.get_resource(resource, player_index) for resource in (game_state.BITS, game_state.CORES) for player_index in (0, 1)]
+    placeable = [(game_state.can_spawn("FF", location), game_state.can_spawn("PI", location)) for location in cells]
+    starts = [location for location in game_map.get_edge_locations(game_map.TOP_LEFT) + game_map.get_edge_locations(game_map.TOP_RIGHT)
+              if not game_state.contains_stationary_unit(location)]
+    paths = [game_state.find_path_to_edge(location) for location in starts]
+    influence = game_state.get_influence_map()
+    return (units, resources, list(game_state._build_stack), list(game_state._deploy_stack), placeable, paths,
+            [list(values) for values in influence.damage], [list(values) for values in influence.shield])
+
+
+def random_change(game_state, rnd, firewalls):
+    """
+    Returns a random spawn or removal as a (method name, args) pair.
+    """
+    half = game_state.HALF_ARENA
+    roll = rnd.random()
+    if roll < 0.5:
+        location = [rnd.randrange(game_state.ARENA_SIZE), rnd.randrange(half)]
+        return "attempt_spawn", (firewalls[rnd.randrange(len(firewalls))], [location])
+    if roll < 0.75:
+        edge = rnd.choice([game_state.game_map.BOTTOM_LEFT, game_state.game_map.BOTTOM_RIGHT])
+        return "attempt_spawn", (rnd.choice(MOBILE_TYPES), [rnd.choice(game_state.game_map.get_edge_locations(edge))], rnd.randint(1, 3))
+    return "attempt_remove", ([[rnd.randrange(game_state.ARENA_SIZE), rnd.randrange(half)]],)
+
+
+def check_program(config, serialized, array_board, rnd):
+    """
+    Runs one random program, checking the journaled state against the reference after every rollback and outermost commit.
+    """
+    game_state = GameState(config, serialized, array_board=array_board)
+    reference = GameState(config, serialized, array_board=array_board)
+    for state in (game_state, reference):
+        state.suppress_warnings(True)
+    firewalls = [config["unitInformation"][index]["shorthand"] for index in FIREWALL_INDICES]
+    # Build the caches first so rollback has to restore them rather than rebuild them
+    snapshot(game_state)
+    # The changes of each open savepoint, applied to the reference once the outermost one commits
+    pending = []
+    for step in range(STEPS):
+        roll = rnd.random()
+        if roll < 0.15:
+            game_state.begin()
+            pending.append((snapshot(game_state), []))
+        elif roll < 0.25 and pending:
+            before, _ = pending.pop()
+            if rnd.random() < 0.3:
+                # The fork must keep the board it was made with
+                fork = game_state.fork()
+                fork_units = snapshot(fork)[0]
+                game_state.rollback()
+                if snapshot(fork)[0] != fork_units:
+                    raise CheckFailed("step {}: rollback changed a fork".format(step))
+            else:
+                game_state.rollback()
+            if snapshot(game_state) != before:
+                raise CheckFailed("step {}: rollback did not restore the state".format(step))
+        elif roll < 0.32 and pending:
+            _, changes = pending.pop()
+            game_state.commit()
+            if pending:
+                pending[-1][1].extend(changes)
+            else:
+                for name, args in changes:
+                    getattr(reference, name)(*args)
+                if snapshot(game_state) != snapshot(reference):
+                    raise CheckFailed("step {}: committed state differs from the reference".format(step))
+        else:
+            name, args = random_change(game_state, rnd, firewalls)
+            getattr(game_state, name)(*args)
+            if pending:
+                pending[-1][1].append((name, args))
+            else:
+                getattr(reference, name)(*args)
+    while pending:
+        before, _ = pending.pop()
+        game_state.rollback()
+        if snapshot(game_state) != before:
+            raise CheckFailed("end: rollback did not restore the state")
+    if game_state.in_transaction():
+        raise CheckFailed("end: a savepoint is still open")
+    if snapshot(game_state) != snapshot(reference):
+        raise CheckFailed("end: state differs from the reference")
+
+
+def run(config, seeds):
+    for seed in range(seeds):
+        for array_board in (False, True):
+            try:
+                check_program(config, random_state(config, seed, turn=seed), array_board, random.Random(seed))
+            except CheckFailed as failure:
+                raise CheckFailed("seed {} array board {}: {}".format(seed, array_board, failure))
+    return "{} random programs of {} steps roll back exactly".format(seeds * 2, STEPS)
@@ -0,0 +1,45 @@
+"""
+GameState.get_targets, which resolves targets through a TargetResolver,
+must pick the same unit as the upstream get_target for every attacker, on
+random boards of both kinds with stacks of mobile units.
+"""
+import random
+
+from gamelib.game_state import GameState
+
+from .boards import MOBILE_TYPES, CheckFailed, random_state
+
+SEEDS = 40
+
+
+def sprinkle_mobile_units(game_state, rnd, count):
+    """
+    Adds mobile units of both players on empty cells, some with reduced stability to exercise the tie-breaks.
+    """
+    for _ in range(count):
+        location = [rnd.randrange(game_state.ARENA_SIZE), rnd.randrange(game_state.ARENA_SIZE)]
+        if not game_state.game_map.in_arena_bounds(location) or game_state.contains_stationary_unit(location):
+            continue
+        game_state.game_map.add_unit(rnd.choice(MOBILE_TYPES), location, rnd.randrange(2))
+        if rnd.random() < 0.5:
+            units = game_state.game_map[location]
+            units[-1].stability = rnd.choice([1, 2, 3, 4.5])
+            # Array board cells are read only tuples, the change only sticks once written back
+            if isinstance(units, tuple):
+                game_state.game_map[location] = units
+    game_state.invalidate_path_cache()
+
+
+def run(config, seeds):
+    checked = 0
+    for seed in range(seeds):
+        for array_board in (False, True):
+            game_state = GameState(config, random_state(config, seed, turn=seed), array_board=array_board)
+            sprinkle_mobile_units(game_state, random.Random(seed), 60)
+            attackers = [unit for location in list(game_state.game_map) for unit in game_state.game_map[location]]
+            for attacker, target in zip(attackers, game_state.get_targets(attackers)):
+                expected = game_state.get_target(attacker)
+                if target is not expected:
+                    raise CheckFailed("seed {} array board {}: {} targets {}, get_target picks {}".format(seed, array_board, attacker, target, expected))
+                checked += 1
+    return "{} attackers match get_target".format(checked)
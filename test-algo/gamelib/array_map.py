@@ -0,0 +1,360 @@
+from .game_map import GameMap
+from .unit_pool import get_unit_pool
+
+# Indices into config["unitInformation"], matching UNIT_TYPE_TO_INDEX in game_state
+FIREWALL_INDICES = (0, 1, 2)
+REMOVE_INDEX = 6
+UNIT_ARRAYS = ("unit_types", "owners", "stabilities", "pending_removal", "mobile_units")
+
+
+class ArrayGameMap(GameMap):
+    """A GameMap that stores units in fixed size arrays instead of per-cell lists.
+
+    Stationary units are held in parallel arrays indexed by x * ARENA_SIZE + y
+    (unit type index, owner, stability and pending removal). Mobile units can
+    stack, so they live in a side table keyed by the same index.
+
+    Indexing the map with game_map[x, y] returns a tuple of GameUnits, built on
+    first access and cached until the cell changes. It is a read only view, so
+    change the board through add_unit, remove_unit or by assigning a new list of
+    units with game_map[x, y] = units. Changing the units themselves, such as
+    their stability, is not seen by the map either.
+
+    The GameUnits are CompactUnits taken from the config's UnitPool. Call
+    release_units once they are no longer referenced to hand them back.
+
+    The unit lists of a serialized state can be handed over with defer_units, in
+    which case they are only decoded the first time the arrays are used.
+
+    fork returns a copy that shares the arrays with this map. Whichever of the
+    two changes the board first takes its own copy of the arrays.
+
+    Attributes:
+        * unit_types (list): Type index of the stationary unit at each cell, -1 if empty
+        * owners (list): Player index owning the stationary unit at each cell, -1 if empty
+        * stabilities (list): Stability of the stationary unit at each cell
+        * pending_removal (list): True if the stationary unit at each cell is flagged for removal
+        * mobile_units (dict): Maps a cell index to a list of [type index, player index, stability] entries
+
+    """
+
+    def __init__(self, config):
+        """ Setup empty arrays for an arena described by config
+
+        Args:
+            * config (JSON): A json object containing information about the game
+
+        """
+        super().__init__(config)
+        self._unit_loader = None
+        self.__reset_arrays()
+        self._cells = {}
+        self._pool = get_unit_pool(config)
+        self._shorthands = [unit_info.get("shorthand") for unit_info in config["unitInformation"]]
+        self._type_index = {shorthand: i for i, shorthand in enumerate(self._shorthands)}
+
+    def __reset_arrays(self):
+        cells = self.ARENA_SIZE * self.ARENA_SIZE
+        self.unit_types = [-1] * cells
+        self.owners = [-1] * cells
+        self.stabilities = [0.0] * cells
+        self.pending_removal = [False] * cells
+        self.mobile_units = {}
+        self._shared_arrays = False
+
+    def __getattr__(self, name):
+        """
+        Only called for missing attributes, which is how the arrays of a deferred board get loaded on first use.
+        """
+        loader = self.__dict__.get("_unit_loader")
+        if loader is None or name not in UNIT_ARRAYS:
+            raise AttributeError(name)
+        self._unit_loader = None
+        self.__reset_arrays()
+        loader()
+        return getattr(self, name)
+
+    def defer_units(self, loader):
+        """Postpones filling the arrays until they are first used
+
+        Args:
+            * loader: A callable taking no arguments that fills the map, typically by calling load_units
+
+        """
+        for name in UNIT_ARRAYS:
+            self.__dict__.pop(name, None)
+        self._cells.clear()
+        self._unit_loader = loader
+
+    def fork(self):
+        """Creates a copy of the map that shares its arrays until either map is changed
+
+        Returns:
+            A new ArrayGameMap with the same units
+
+        """
+        # Load a deferred board now so both maps see the same units
+        self.unit_types
+        child = ArrayGameMap.__new__(ArrayGameMap)
+        child.__dict__.update(self.__dict__)
+        child._cells = {}
+        child._shared_arrays = True
+        self._shared_arrays = True
+        return child
+
+    def __own_arrays(self):
+        """
+        Copies the arrays before the first change made after a fork.
+        """
+        if self._shared_arrays:
+            self.unit_types = list(self.unit_types)
+            self.owners = list(self.owners)
+            self.stabilities = list(self.stabilities)
+            self.pending_removal = list(self.pending_removal)
+            self.mobile_units = {index: list(entries) for index, entries in self.mobile_units.items()}
+            self._shared_arrays = False
+
+    def __getitem__(self, location):
+        if len(location) == 2 and self.in_arena_bounds(location):
+            x, y = location
+            index = x * self.ARENA_SIZE + y
+            cell = self._cells.get(index)
+            if cell is None:
+                cell = self.__build_cell(index, x, y)
+            return cell
+        self._invalid_coordinates(location)
+
+    def __setitem__(self, location, units):
+        """
+        Replaces the units at a location, copying them into the arrays since those are the board.
+        Later changes to the units or the list are not seen by the map.
+        """
+        if not (len(location) == 2 and self.in_arena_bounds(location)):
+            self._invalid_coordinates(location)
+            return
+        self.remove_unit(location)
+        index = location[0] * self.ARENA_SIZE + location[1]
+        for unit in units:
+            type_index = self._type_index[unit.unit_type]
+            if type_index in FIREWALL_INDICES:
+                self.unit_types[index] = type_index
+                self.owners[index] = unit.player_index
+                self.stabilities[index] = unit.stability
+                self.pending_removal[index] = unit.pending_removal
+            else:
+                self.mobile_units.setdefault(index, []).append([type_index, unit.player_index, unit.stability])
+
+    def __build_cell(self, index, x, y):
+        """
+        Materializes the GameUnits stored at a cell and caches them as a tuple.
+        """
+        cell = []
+        acquire = self._pool.acquire
+        type_index = self.unit_types[index]
+        if type_index >= 0:
+            unit = acquire(self._shorthands[type_index], self.owners[index], self.stabilities[index], x, y)
+            unit.pending_removal = self.pending_removal[index]
+            cell.append(unit)
+        for type_index, player_index, stability in self.mobile_units.get(index, ()):
+            cell.append(acquire(self._shorthands[type_index], player_index, stability, x, y))
+        cell = tuple(cell)
+        self._cells[index] = cell
+        return cell
+
+    def load_units(self, units, player_index):
+        """Fills the arrays from the unit lists of a serialized game state
+
+        Args:
+            * units: The p1Units or p2Units list, one list of [x, y, stability, id] entries per unit type
+            * player_index: The player owning the units, 0 for you 1 for the enemy
+
+        """
+        for type_index, unit_entries in enumerate(units):
+            for uinfo in unit_entries:
+                x, y = int(uinfo[0]), int(uinfo[1])
+                index = x * self.ARENA_SIZE + y
+                # This depends on RM always being the last type to be processed
+                if type_index == REMOVE_INDEX:
+                    if self.unit_types[index] >= 0:
+                        self.pending_removal[index] = True
+                elif type_index in FIREWALL_INDICES:
+                    self.unit_types[index] = type_index
+                    self.owners[index] = player_index
+                    self.stabilities[index] = float(uinfo[2])
+                else:
+                    self.mobile_units.setdefault(index, []).append([type_index, player_index, float(uinfo[2])])
+        self._cells.clear()
+
+    def add_unit(self, unit_type, location, player_index=0):
+        """Add a single GameUnit to the map at the given location.
+
+        Args:
+            * unit_type: The type of the new unit
+            * location: The location of the new unit
+            * player_index: The index of the player that owns the unit, 0 for you 1 for the enemy
+
+        """
+        if not self.in_arena_bounds(location):
+            self._invalid_coordinates(location)
+            return
+        if player_index < 0 or player_index > 1:
+            self.warn("Player index {} is invalid. Player index should be 0 (yourself) or 1 (your opponent).".format(player_index))
+
+        self.__own_arrays()
+        x, y = location
+        index = x * self.ARENA_SIZE + y
+        type_index = self._type_index[unit_type]
+        stability = self._pool.unit_specs.stabilities[type_index]
+        if type_index in FIREWALL_INDICES:
+            self.unit_types[index] = type_index
+            self.owners[index] = player_index
+            self.stabilities[index] = stability
+            self.pending_removal[index] = False
+            self.mobile_units.pop(index, None)
+            self._cells[index] = (self._pool.acquire(unit_type, player_index, None, x, y),)
+        else:
+            self.mobile_units.setdefault(index, []).append([type_index, player_index, stability])
+            cell = self._cells.get(index)
+            if cell is not None:
+                self._cells[index] = cell + (self._pool.acquire(unit_type, player_index, None, x, y),)
+
+    def add_units(self, unit_type, location, num, player_index=0):
+        """Add a stack of information units to the map at the given location in one step.
+
+        Args:
+            * unit_type: The type of the new units, which must not be stationary
+            * location: The location of the new units
+            * num: The number of units to add
+            * player_index: The index of the player that owns the units, 0 for you 1 for the enemy
+
+        """
+        if not self.in_arena_bounds(location):
+            self._invalid_coordinates(location)
+            return
+        self.__own_arrays()
+        x, y = location
+        index = x * self.ARENA_SIZE + y
+        type_index = self._type_index[unit_type]
+        stability = self._pool.unit_specs.stabilities[type_index]
+        self.mobile_units.setdefault(index, []).extend([type_index, player_index, stability] for _ in range(num))
+        # Rebuilt on next access instead of materializing every unit now
+        self._cells.pop(index, None)
+
+    def remove_unit(self, location):
+        """Remove all units on the map in the given location.
+
+        Args:
+            * location: The location that you will empty of units
+
+        """
+        if not self.in_arena_bounds(location):
+            self._invalid_coordinates(location)
+            return
+
+        self.__own_arrays()
+        x, y = location
+        index = x * self.ARENA_SIZE + y
+        self.unit_types[index] = -1
+        self.owners[index] = -1
+        self.stabilities[index] = 0.0
+        self.pending_removal[index] = False
+        self.mobile_units.pop(index, None)
+        self._cells.pop(index, None)
+
+    def release_units(self):
+        """Hands the GameUnits in this map's cells back to the UnitPool.
+        The board itself is kept, the units are rebuilt from the arrays if it is used again.
+        Units returned by earlier game_map[x, y] lookups must not be used afterwards.
+
+        Only the units of the cells this map currently holds are released. Cells dropped
+        after a change, and the cells of forks, are left to the garbage collector, so units
+        something else may still hold are never handed out twice.
+
+        """
+        units = [unit for cell in self._cells.values() for unit in cell]
+        self._cells.clear()
+        self._pool.release(units)
+
+    def save_cell(self, location):
+        """Captures everything stored at a location so it can be put back with restore_cell
+
+        Args:
+            * location: The location to save
+
+        Returns:
+            An opaque record of the cell
+
+        """
+        index = location[0] * self.ARENA_SIZE + location[1]
+        mobile = self.mobile_units.get(index)
+        return (self.unit_types[index], self.owners[index], self.stabilities[index], self.pending_removal[index],
+                None if mobile is None else list(mobile))
+
+    def restore_cell(self, location, saved):
+        """Puts back the units of a location captured with save_cell
+
+        Args:
+            * location: The location to restore
+            * saved: The record returned by save_cell for the same location
+
+        """
+        self.__own_arrays()
+        index = location[0] * self.ARENA_SIZE + location[1]
+        self.unit_types[index], self.owners[index], self.stabilities[index], self.pending_removal[index], mobile = saved
+        if mobile is None:
+            self.mobile_units.pop(index, None)
+        else:
+            self.mobile_units[index] = list(mobile)
+        self._cells.pop(index, None)
+
+    def stationary_type_index(self, location):
+        """Gets the type index of the stationary unit at a location
+
+        Args:
+            * location: The location to check
+
+        Returns:
+            The config index of the stationary unit's type, or -1 if there is none
+
+        """
+        return self.unit_types[location[0] * self.ARENA_SIZE + location[1]]
+
+    def stationary_locations(self, player_index=None, unit_type=None):
+        """Gets the locations of all stationary units matching the filters in one pass over the arrays
+
+        Args:
+            * player_index: Only return units owned by this player, 0 for you 1 for the enemy. All players if None.
+            * unit_type: Only return units of this type. All stationary types if None.
+
+        Returns:
+            A list of [x, y] locations
+
+        """
+        size = self.ARENA_SIZE
+        unit_types = self.unit_types
+        owners = self.owners
+        if unit_type is None:
+            indices = [i for i, t in enumerate(unit_types) if t >= 0 and (player_index is None or owners[i] == player_index)]
+        else:
+            type_index = self._type_index[unit_type]
+            indices = [i for i, t in enumerate(unit_types) if t == type_index and (player_index is None or owners[i] == player_index)]
+        return [[i // size, i % size] for i in indices]
+
+    def count_stationary(self, player_index=None, unit_type=None):
+        """Counts the stationary units matching the filters in one pass over the arrays
+
+        Args:
+            * player_index: Only count units owned by this player, 0 for you 1 for the enemy. All players if None.
+            * unit_type: Only count units of this type. All stationary types if None.
+
+        Returns:
+            The number of matching units
+
+        """
+        owners = self.owners
+        if unit_type is None:
+            if player_index is None:
+                return sum(1 for t in self.unit_types if t >= 0)
+            return sum(1 for o in owners if o == player_index)
+        type_index = self._type_index[unit_type]
+        return sum(1 for i, t in enumerate(self.unit_types) if t == type_index and (player_index is None or owners[i] == player_index))
@@ -0,0 +1,548 @@
+import json
+import mmap
+import struct
+
+from .frame_events import EVENT_TYPES
+
+MAGIC = b"C1RP"
+VERSION = 2
+ARENA_SIZE = 28
+LAYER_BYTES = (ARENA_SIZE * ARENA_SIZE + 7) // 8
+
+# Event fields: L location, T list of locations, Q list of small ints, f amount, b unit type, i unit id, p player, o flag
+EVENT_SCHEMAS = {
+    "selfDestruct": "LTfbip",
+    "breach": "Lfbip",
+    "damage": "Lfbip",
+    "shield": "LLfbiip",
+    "move": "LLQbip",
+    "spawn": "Lbip",
+    "death": "Lbipo",
+    "attack": "LLfbiip",
+}
+_FALLBACK = 255
+_LAYER = 0
+_LIST = 1
+# Added to the layout of a unit type, or set for an event type, when its numbers need 64 bit floats
+_WIDE = 2
+
+_HEADER = struct.Struct("<4sHIQ")
+_INDEX_ENTRY = struct.Struct("<QIBhh")
+_U8 = struct.Struct("<B")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_I32 = struct.Struct("<i")
+_F32 = struct.Struct("<f")
+_F64 = struct.Struct("<d")
+_LOCATION = struct.Struct("<BB")
+_UNIT_PACKERS = {
+    _LAYER: struct.Struct("<fI"),
+    _LIST: struct.Struct("<BBfI"),
+    _LAYER + _WIDE: struct.Struct("<dI"),
+    _LIST + _WIDE: struct.Struct("<BBdI"),
+}
+_ENCODING_ERRORS = (struct.error, ValueError, TypeError, IndexError, OverflowError)
+
+
+def _fits_f32(value):
+    """
+    Checks whether a number comes back unchanged from a 32 bit float.
+    """
+    try:
+        return _F32.unpack(_F32.pack(value))[0] == value
+    except (struct.error, OverflowError):
+        return False
+
+
+def _unit_id(value):
+    """
+    Ids are decimal strings, the round trip must give back the same string.
+    """
+    if not isinstance(value, str) or str(int(value)) != value:
+        raise ValueError("Unit id {} is not a decimal string".format(value))
+    return int(value)
+
+
+class _Encoder:
+    """
+    Packs one turn state or action frame into bytes.
+    """
+    def __init__(self):
+        self.out = bytearray()
+
+    def u8(self, value):
+        self.out += _U8.pack(value)
+
+    def u16(self, value):
+        self.out += _U16.pack(value)
+
+    def blob(self, value):
+        data = json.dumps(value, separators=(",", ":")).encode()
+        self.out += _U32.pack(len(data))
+        self.out += data
+
+    def numbers(self, values):
+        """
+        Stats lists. One bit per value remembers whether it was an int.
+        """
+        self.u8(len(values))
+        flags = 0
+        for i, value in enumerate(values):
+            if isinstance(value, int):
+                flags |= 1 << i
+        self.out += _U32.pack(flags)
+        for value in values:
+            self.out += _F64.pack(value)
+
+    def ints(self, values):
+        self.u8(len(values))
+        for value in values:
+            self.out += _I32.pack(value)
+
+    def units(self, units):
+        self.u8(len(units))
+        for unit_entries in units:
+            start = len(self.out)
+            try:
+                self.unit_type(unit_entries)
+            except _ENCODING_ERRORS:
+                del self.out[start:]
+                self.u8(_FALLBACK)
+                self.blob(unit_entries)
+
+    def unit_type(self, unit_entries):
+        cells = [int(entry[0]) * ARENA_SIZE + int(entry[1]) for entry in unit_entries]
+        wide = 0 if all(_fits_f32(entry[2]) for entry in unit_entries) else _WIDE
+        # A bit layer costs LAYER_BYTES, a list 2 bytes of location per unit. Layers can't hold stacked units.
+        if len(set(cells)) == len(cells) and 2 * len(cells) > LAYER_BYTES:
+            self.u8(_LAYER + wide)
+            packer = _UNIT_PACKERS[_LAYER + wide]
+            mask = 0
+            for cell in cells:
+                mask |= 1 << cell
+            self.out += mask.to_bytes(LAYER_BYTES, "little")
+            for _, entry in sorted(zip(cells, unit_entries), key=lambda pair: pair[0]):
+                self.out += packer.pack(entry[2], _unit_id(entry[3]))
+        else:
+            self.u8(_LIST + wide)
+            packer = _UNIT_PACKERS[_LIST + wide]
+            self.u16(len(unit_entries))
+            for entry in unit_entries:
+                self.out += packer.pack(int(entry[0]), int(entry[1]), entry[2], _unit_id(entry[3]))
+
+    def events(self, events):
+        self.u8(len(events))
+        for event_type, event_list in events.items():
+            schema = EVENT_SCHEMAS.get(event_type)
+            start = len(self.out)
+            if schema is not None:
+                try:
+                    amounts = [value for event in event_list for code, value in zip(schema, event) if code == "f"]
+                    wide = not all(_fits_f32(value) for value in amounts)
+                    self.u8(EVENT_TYPES.index(event_type))
+                    self.u16(len(event_list))
+                    self.u8(_WIDE if wide else 0)
+                    for event in event_list:
+                        self.event(schema, event, wide)
+                    continue
+                except _ENCODING_ERRORS:
+                    del self.out[start:]
+            self.u8(_FALLBACK)
+            self.blob([event_type, event_list])
+
+    def event(self, schema, event, wide):
+        if len(event) != len(schema):
+            raise ValueError("Event {} does not match its schema".format(event))
+        out = self.out
+        for code, value in zip(schema, event):
+            if code == "L":
+                out += _LOCATION.pack(*value)
+            elif code == "T":
+                out += _U8.pack(len(value))
+                for location in value:
+                    out += _LOCATION.pack(*location)
+            elif code == "Q":
+                out += _U8.pack(len(value))
+                for number in value:
+                    out += _I32.pack(number)
+            elif code == "f":
+                out += (_F64 if wide else _F32).pack(value)
+            elif code == "i":
+                out += _U32.pack(_unit_id(value))
+            elif code == "o":
+                out += _U8.pack(1 if value else 0)
+            else:
+                out += _U8.pack(value)
+
+
+class _Decoder:
+    """
+    Reads one record packed by _Encoder, starting at an offset of a buffer.
+    """
+    def __init__(self, buffer, offset):
+        self.buffer = buffer
+        self.offset = offset
+
+    def unpack(self, packer):
+        values = packer.unpack_from(self.buffer, self.offset)
+        self.offset += packer.size
+        return values
+
+    def u8(self):
+        return self.unpack(_U8)[0]
+
+    def u16(self):
+        return self.unpack(_U16)[0]
+
+    def blob(self):
+        length = self.unpack(_U32)[0]
+        data = bytes(self.buffer[self.offset:self.offset + length])
+        self.offset += length
+        return json.loads(data)
+
+    def numbers(self):
+        count = self.u8()
+        flags = self.unpack(_U32)[0]
+        values = []
+        for i in range(count):
+            value = self.unpack(_F64)[0]
+            values.append(int(value) if flags >> i & 1 else value)
+        return values
+
+    def ints(self):
+        return [self.unpack(_I32)[0] for _ in range(self.u8())]
+
+    def units(self):
+        units = []
+        for _ in range(self.u8()):
+            layout = self.u8()
+            if layout == _FALLBACK:
+                units.append(self.blob())
+                continue
+            packer = _UNIT_PACKERS[layout]
+            entries = []
+            if layout & ~_WIDE == _LAYER:
+                mask = int.from_bytes(self.buffer[self.offset:self.offset + LAYER_BYTES], "little")
+                self.offset += LAYER_BYTES
+                cells = []
+                while mask:
+                    lowest = mask & -mask
+                    cells.append(lowest.bit_length() - 1)
+                    mask ^= lowest
+                end = self.offset + len(cells) * packer.size
+                for cell, (stability, unit_id) in zip(cells, packer.iter_unpack(self.buffer[self.offset:end])):
+                    entries.append([cell // ARENA_SIZE, cell % ARENA_SIZE, stability, str(unit_id)])
+                self.offset = end
+            else:
+                count = self.u16()
+                end = self.offset + count * packer.size
+                for x, y, stability, unit_id in packer.iter_unpack(self.buffer[self.offset:end]):
+                    entries.append([x, y, stability, str(unit_id)])
+                self.offset = end
+            units.append(entries)
+        return units
+
+    def events(self):
+        events = {}
+        for _ in range(self.u8()):
+            type_index = self.u8()
+            if type_index == _FALLBACK:
+                event_type, event_list = self.blob()
+                events[event_type] = event_list
+                continue
+            event_type = EVENT_TYPES[type_index]
+            schema = EVENT_SCHEMAS[event_type]
+            count = self.u16()
+            amount = _F64 if self.u8() & _WIDE else _F32
+            events[event_type] = [self.event(schema, amount) for _ in range(count)]
+        return events
+
+    def event(self, schema, amount):
+        event = []
+        for code in schema:
+            if code == "L":
+                event.append(list(self.unpack(_LOCATION)))
+            elif code == "T":
+                event.append([list(self.unpack(_LOCATION)) for _ in range(self.u8())])
+            elif code == "Q":
+                event.append([self.unpack(_I32)[0] for _ in range(self.u8())])
+            elif code == "f":
+                event.append(self.unpack(amount)[0])
+            elif code == "i":
+                event.append(str(self.unpack(_U32)[0]))
+            elif code == "o":
+                event.append(bool(self.u8()))
+            else:
+                event.append(self.u8())
+        return event
+
+
+def encode_message(message):
+    """Packs a turn state or action frame
+
+    Args:
+        * message: The message as a json string or an already parsed dict
+
+    Returns:
+        The packed bytes
+
+    """
+    if isinstance(message, str):
+        message = json.loads(message)
+    encoder = _Encoder()
+    encoder.ints(message["turnInfo"])
+    encoder.numbers(message["p1Stats"])
+    encoder.numbers(message["p2Stats"])
+    encoder.units(message["p1Units"])
+    encoder.units(message["p2Units"])
+    encoder.events(message.get("events", {}))
+    known = ("turnInfo", "p1Stats", "p2Stats", "p1Units", "p2Units", "events")
+    encoder.blob({key: value for key, value in message.items() if key not in known})
+    return bytes(encoder.out)
+
+
+def decode_message(buffer, offset=0):
+    """Unpacks a message packed by encode_message
+
+    Args:
+        * buffer: A bytes like object holding the packed message
+        * offset: Where the message starts in buffer
+
+    Returns:
+        The message as a dict shaped like the engine's json
+
+    """
+    decoder = _Decoder(buffer, offset)
+    message = {"turnInfo": decoder.ints()}
+    message["p1Stats"] = decoder.numbers()
+    message["p2Stats"] = decoder.numbers()
+    message["p1Units"] = decoder.units()
+    message["p2Units"] = decoder.units()
+    message["events"] = decoder.events()
+    message.update(decoder.blob())
+    return message
+
+
+class BinaryReplayWriter:
+    """Writes a match to the binary replay format.
+
+    The file holds a header, the config as json, the packed messages and an
+    index with the offset, state type, turn and frame of every message. The
+    index goes at the end so messages can be streamed in as the match goes.
+
+    Unit lists are stored per type, either as a bit-packed 28x28 layer
+    followed by each unit's stability and id, or as a list of units when the
+    type is sparse or units stack. Events are stored as fixed size records.
+    A unit type or event type that doesn't fit, such as a non-numeric id, is
+    stored as json instead.
+
+    Stabilities and event amounts are stored as 32 bit floats when every
+    value of the unit type or event type fits one exactly, and as 64 bit
+    floats otherwise, so they come back unchanged. They do come back as
+    floats, 60 is read as 60.0, and unit lists come back in x then y order.
+
+    """
+
+    def __init__(self, path, config):
+        """ Creates the file and writes the config
+
+        Args:
+            * path: The file to write, it is overwritten
+            * config: The game config, as a dict or json string
+
+        """
+        self._file = open(path, "wb")
+        self._index = []
+        self._file.write(_HEADER.pack(MAGIC, VERSION, 0, 0))
+        data = (config if isinstance(config, str) else json.dumps(config)).encode()
+        self._file.write(_U32.pack(len(data)))
+        self._file.write(data)
+
+    def write(self, message):
+        """Appends a turn state or action frame
+
+        Args:
+            * message: The message as a json string or parsed dict
+
+        """
+        if isinstance(message, str):
+            message = json.loads(message)
+        data = encode_message(message)
+        turn_info = message["turnInfo"]
+        frame = turn_info[2] if len(turn_info) > 2 else -1
+        self._index.append((self._file.tell(), len(data), int(turn_info[0]), int(turn_info[1]), int(frame)))
+        self._file.write(data)
+
+    def close(self):
+        """Writes the index and closes the file
+
+        """
+        index_offset = self._file.tell()
+        for entry in self._index:
+            self._file.write(_INDEX_ENTRY.pack(*entry))
+        self._file.seek(0)
+        self._file.write(_HEADER.pack(MAGIC, VERSION, len(self._index), index_offset))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+
+class BinaryReplay:
+    """Random access to a binary replay through a memory map.
+
+    Opening a replay only reads the header and index. A message is unpacked
+    when it is asked for, so jumping to any turn or frame costs the same no
+    matter how long the match is.
+
+    Attributes:
+        * config (dict): The game config of the match
+
+    """
+
+    def __init__(self, path):
+        """ Maps the file and reads its index
+
+        Args:
+            * path: A file written by BinaryReplayWriter
+
+        """
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, index_offset = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not a version {} binary replay".format(path, VERSION))
+        config_length = _U32.unpack_from(self._map, _HEADER.size)[0]
+        config_start = _HEADER.size + _U32.size
+        self.config = json.loads(self._map[config_start:config_start + config_length])
+        self._index = [_INDEX_ENTRY.unpack_from(self._map, index_offset + i * _INDEX_ENTRY.size) for i in range(count)]
+        self._turn_starts = {}
+        for i, (_, _, state_type, turn, _) in enumerate(self._index):
+            if state_type == 0:
+                self._turn_starts.setdefault(turn, i)
+
+    def __len__(self):
+        return len(self._index)
+
+    def info(self, position):
+        """Gets the index entry of a message without unpacking it
+
+        Args:
+            * position: The position of the message in the match
+
+        Returns:
+            (state_type, turn, frame) of the message
+
+        """
+        return self._index[position][2:]
+
+    def message(self, position):
+        """Unpacks a message
+
+        Args:
+            * position: The position of the message in the match
+
+        Returns:
+            The message as a dict shaped like the engine's json
+
+        """
+        return decode_message(self._map, self._index[position][0])
+
+    def message_json(self, position):
+        """Unpacks a message into the json string the engine would have sent
+
+        Args:
+            * position: The position of the message in the match
+
+        Returns:
+            A json string that can be passed to GameState or on_action_frame
+
+        """
+        return json.dumps(self.message(position))
+
+    def find(self, turn, frame=None):
+        """Finds the position of a turn state or action frame
+
+        Args:
+            * turn: The turn number
+            * frame: The action frame number, or None for the turn state
+
+        Returns:
+            The position of the message, or -1 if the match has no such message
+
+        """
+        start = self._turn_starts.get(turn)
+        if start is None:
+            return -1
+        if frame is None:
+            return start
+        for position in range(start + 1, len(self._index)):
+            _, _, state_type, message_turn, message_frame = self._index[position]
+            if message_turn != turn or state_type == 0:
+                break
+            if message_frame == frame:
+                return position
+        return -1
+
+    def close(self):
+        """Unmaps and closes the file
+
+        """
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+
+def is_binary_replay(path):
+    """Checks whether a file starts with the binary replay magic
+
+    Args:
+        * path: The file to check
+
+    Returns:
+        True for binary replays
+
+    """
+    with open(path, "rb") as replay_file:
+        return replay_file.read(len(MAGIC)) == MAGIC
+
+
+def convert_recording(recording_path, binary_path):
+    """Converts a text recording made with ALGO_RECORD to a binary replay
+
+    Args:
+        * recording_path: The text recording, the config followed by one message per line
+        * binary_path: The binary replay to write
+
+    """
+    with open(recording_path) as recording:
+        lines = (line.strip() for line in recording)
+        config = next(line for line in lines if line)
+        with BinaryReplayWriter(binary_path, config) as writer:
+            for line in lines:
+                if line:
+                    writer.write(line)
+
+
+def export_recording(binary_path, recording_path):
+    """Converts a binary replay back to a text recording
+
+    Args:
+        * binary_path: The binary replay to read
+        * recording_path: The text recording to write
+
+    """
+    with BinaryReplay(binary_path) as replay, open(recording_path, "w") as recording:
+        recording.write(json.dumps(replay.config) + "\n")
+        for position in range(len(replay)):
+            recording.write(replay.message_json(position) + "\n")
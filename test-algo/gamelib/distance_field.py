@@ -0,0 +1,156 @@
+import math
+from collections import deque
+
+ARENA_SIZE = 28
+HALF_ARENA = ARENA_SIZE // 2
+UNREACHABLE = float("inf")
+
+
+def _in_arena_bounds(x, y):
+    if y < HALF_ARENA:
+        return HALF_ARENA - 1 - y <= x <= HALF_ARENA + y
+    return y - HALF_ARENA <= x <= ARENA_SIZE - 1 - (y - HALF_ARENA)
+
+
+_IN_ARENA = [_in_arena_bounds(x, y) for x in range(ARENA_SIZE) for y in range(ARENA_SIZE)]
+
+
+def _lower_envelope(squared, output, start, step):
+    """
+    One dimensional squared distance transform (Felzenszwalb and Huttenlocher) of the ARENA_SIZE values
+    squared[start], squared[start + step], ..., written to the same positions of output.
+    """
+    sites = [q for q in range(ARENA_SIZE) if squared[start + q * step] != UNREACHABLE]
+    if not sites:
+        for q in range(ARENA_SIZE):
+            output[start + q * step] = UNREACHABLE
+        return
+    heights = [squared[start + q * step] + q * q for q in sites]
+    envelope = [0]
+    boundaries = [-UNREACHABLE, UNREACHABLE]
+    for i in range(1, len(sites)):
+        q = sites[i]
+        while True:
+            p = envelope[-1]
+            crossing = (heights[i] - heights[p]) / (2 * (q - sites[p]))
+            if crossing > boundaries[-2]:
+                break
+            envelope.pop()
+            boundaries.pop()
+        boundaries[-1] = crossing
+        envelope.append(i)
+        boundaries.append(UNREACHABLE)
+    k = 0
+    for q in range(ARENA_SIZE):
+        while boundaries[k + 1] < q:
+            k += 1
+        p = sites[envelope[k]]
+        output[start + q * step] = (q - p) * (q - p) + squared[start + p * step]
+
+
+def euclidean_distance_field(seeds):
+    """Computes the distance from every cell to the nearest seed
+
+    The distance is the one of GameMap.distance_between_locations, computed for the
+    whole grid at once with a separable exact distance transform.
+
+    Args:
+        * seeds: A list of [x, y] locations
+
+    Returns:
+        A list of ARENA_SIZE * ARENA_SIZE distances indexed by x * ARENA_SIZE + y,
+        all UNREACHABLE if there are no seeds
+
+    """
+    cells = ARENA_SIZE * ARENA_SIZE
+    # Squared distance to the nearest seed in the same column, columns are contiguous in the flat array
+    column = [UNREACHABLE] * cells
+    for x, y in seeds:
+        column[x * ARENA_SIZE + y] = 0
+    for x in range(ARENA_SIZE):
+        start = x * ARENA_SIZE
+        nearest = UNREACHABLE
+        for y in range(ARENA_SIZE):
+            if column[start + y] == 0:
+                nearest = y
+            elif nearest != UNREACHABLE:
+                column[start + y] = y - nearest
+        nearest = UNREACHABLE
+        for y in range(ARENA_SIZE - 1, -1, -1):
+            if column[start + y] == 0:
+                nearest = y
+            elif nearest != UNREACHABLE and nearest - y < column[start + y]:
+                column[start + y] = nearest - y
+        for y in range(ARENA_SIZE):
+            if column[start + y] != UNREACHABLE:
+                column[start + y] *= column[start + y]
+    # Then combine the columns along each row
+    field = [UNREACHABLE] * cells
+    for y in range(ARENA_SIZE):
+        _lower_envelope(column, field, y, ARENA_SIZE)
+    return [math.sqrt(squared) for squared in field]
+
+
+def path_distance_field(seeds, blocked=0):
+    """Computes the number of steps from every cell to the nearest seed, moving like an information unit
+
+    Units move up, down, left or right, stay inside the arena and cannot enter
+    blocked cells. A seed on a blocked cell still starts the search.
+
+    Args:
+        * seeds: A list of [x, y] locations
+        * blocked: A bitmask with bit x * ARENA_SIZE + y set for every blocked cell
+
+    Returns:
+        A list of ARENA_SIZE * ARENA_SIZE step counts indexed by x * ARENA_SIZE + y,
+        UNREACHABLE for cells no seed can reach and cells outside the arena
+
+    """
+    field = [UNREACHABLE] * (ARENA_SIZE * ARENA_SIZE)
+    frontier = deque()
+    for x, y in seeds:
+        index = x * ARENA_SIZE + y
+        if field[index] != 0:
+            field[index] = 0
+            frontier.append(index)
+    while frontier:
+        index = frontier.popleft()
+        steps = field[index] + 1
+        x, y = divmod(index, ARENA_SIZE)
+        for neighbor, inside in ((index - ARENA_SIZE, x > 0), (index + ARENA_SIZE, x < ARENA_SIZE - 1),
+                                 (index - 1, y > 0), (index + 1, y < ARENA_SIZE - 1)):
+            if inside and field[neighbor] == UNREACHABLE and _IN_ARENA[neighbor] and not (blocked >> neighbor) & 1:
+                field[neighbor] = steps
+                frontier.append(neighbor)
+    return field
+
+
+def rank_locations(field, locations):
+    """Sorts locations from the nearest to the farthest
+
+    Locations at the same distance keep their order.
+
+    Args:
+        * field: A field from euclidean_distance_field or path_distance_field
+        * locations: The [x, y] locations to sort
+
+    Returns:
+        A new sorted list of the locations
+
+    """
+    return sorted(locations, key=lambda location: field[location[0] * ARENA_SIZE + location[1]])
+
+
+def locations_within(field, locations, max_distance):
+    """Filters locations by distance
+
+    Args:
+        * field: A field from euclidean_distance_field or path_distance_field
+        * locations: The [x, y] locations to filter
+        * max_distance: The largest distance to keep
+
+    Returns:
+        The locations at most max_distance from the nearest seed, in their original order
+
+    """
+    return [location for location in locations if field[location[0] * ARENA_SIZE + location[1]] <= max_distance]
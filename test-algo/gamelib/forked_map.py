@@ -0,0 +1,105 @@
+import copy
+
+from .game_map import GameMap
+from .unit_pool import CompactUnit
+
+
+class ForkedGameMap(GameMap):
+    """A copy-on-write view of another GameMap.
+
+    Cells are read from the parent map until they are first accessed through
+    the fork. Once accessed, the fork keeps its own copy of the cell holding
+    copies of the parent's units. This lets game_map[x, y] keep returning a list
+    the caller can change. Cells the fork never looks at are never copied.
+
+    Changes to parent cells the fork has not accessed yet show through. The
+    parent GameState copies a cell into its live forks before attempt_spawn or
+    rollback change it, so only direct changes to the parent map do.
+
+    Attributes:
+        * parent (:obj: GameMap): The map this fork was created from
+
+    """
+
+    def __init__(self, parent):
+        """ Creates a fork of parent without copying any cells
+
+        Args:
+            * parent: The GameMap to fork
+
+        """
+        self.__dict__.update(parent.__dict__)
+        self.parent = parent
+        self._cells = {}
+
+    def fork(self):
+        """Creates a copy-on-write fork of this map
+
+        Returns:
+            A new ForkedGameMap whose parent is this map
+
+        """
+        return ForkedGameMap(self)
+
+    def __getitem__(self, location):
+        if len(location) == 2 and self.in_arena_bounds(location):
+            x, y = location
+            index = x * self.ARENA_SIZE + y
+            cell = self._cells.get(index)
+            if cell is None:
+                cell = [copy.copy(unit) for unit in self.parent[x, y]]
+                self._cells[index] = cell
+            return cell
+        self._invalid_coordinates(location)
+
+    def __setitem__(self, location, units):
+        if len(location) == 2 and self.in_arena_bounds(location):
+            x, y = location
+            self._cells[x * self.ARENA_SIZE + y] = list(units)
+            return
+        self._invalid_coordinates(location)
+
+    def changed_cells(self):
+        """Gets the cells this fork has copied from its parent, which are the only ones that can differ
+
+        Returns:
+            A list of [x, y] locations
+
+        """
+        return [[index // self.ARENA_SIZE, index % self.ARENA_SIZE] for index in sorted(self._cells)]
+
+    def add_unit(self, unit_type, location, player_index=0):
+        """Add a single GameUnit to the map at the given location.
+
+        Args:
+            * unit_type: The type of the new unit
+            * location: The location of the new unit
+            * player_index: The index of the player that owns the unit, 0 for you 1 for the enemy
+
+        """
+        if not self.in_arena_bounds(location):
+            self._invalid_coordinates(location)
+            return
+        if player_index < 0 or player_index > 1:
+            self.warn("Player index {} is invalid. Player index should be 0 (yourself) or 1 (your opponent).".format(player_index))
+
+        x, y = location
+        new_unit = CompactUnit(unit_type, self.config, player_index, None, x, y)
+        if not new_unit.stationary:
+            self[x, y].append(new_unit)
+        else:
+            self._cells[x * self.ARENA_SIZE + y] = [new_unit]
+
+    def remove_unit(self, location):
+        """Remove all units on the map in the given location.
+
+        Args:
+            * location: The location that you will empty of units
+
+        """
+        if not self.in_arena_bounds(location):
+            self._invalid_coordinates(location)
+            return
+
+        x, y = location
+        self._cells[x * self.ARENA_SIZE + y] = []
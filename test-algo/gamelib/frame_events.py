@@ -0,0 +1,76 @@
+import json
+
+EVENT_TYPES = ("selfDestruct", "breach", "damage", "shield", "move", "spawn", "death", "attack", "melee")
+
+_json_decoder = json.JSONDecoder()
+
+
+def _value_start(frame_string, key, start):
+    """
+    Returns the index where the value of "key" begins, searching from start, or -1 if the key is missing.
+    """
+    position = frame_string.find('"{}"'.format(key), start)
+    if position < 0:
+        return -1
+    position = frame_string.index(":", position + len(key) + 2) + 1
+    while frame_string[position] in " \t\r\n":
+        position += 1
+    return position
+
+
+def _is_empty_list(frame_string, position):
+    position += 1
+    while frame_string[position] in " \t\r\n":
+        position += 1
+    return frame_string[position] == "]"
+
+
+def decode_frame_events(frame_string, event_types=EVENT_TYPES):
+    """Decodes only the requested event lists of an action frame
+
+    The unit lists and stats of the frame are never decoded, and empty event lists
+    are recognized without calling the json decoder.
+
+    Args:
+        * frame_string: An action frame as passed to on_action_frame
+        * event_types: The names of the event lists we want, for example ("breach", "damage")
+
+    Returns:
+        A dict mapping each requested event type to its list of events, or None if
+        none of the requested lists have any events so the frame can be skipped.
+
+    """
+    events_start = _value_start(frame_string, "events", 0)
+    if events_start < 0:
+        return None
+    events = {}
+    found = False
+    for event_type in event_types:
+        position = _value_start(frame_string, event_type, events_start)
+        if position < 0 or _is_empty_list(frame_string, position):
+            events[event_type] = []
+        else:
+            events[event_type] = _json_decoder.raw_decode(frame_string, position)[0]
+            found = True
+    return events if found else None
+
+
+def frame_has_events(frame_string, event_types=EVENT_TYPES):
+    """Checks whether an action frame has any events of the given types without decoding them
+
+    Args:
+        * frame_string: An action frame as passed to on_action_frame
+        * event_types: The names of the event lists to check
+
+    Returns:
+        True if at least one of the event lists is not empty
+
+    """
+    events_start = _value_start(frame_string, "events", 0)
+    if events_start < 0:
+        return False
+    for event_type in event_types:
+        position = _value_start(frame_string, event_type, events_start)
+        if position >= 0 and not _is_empty_list(frame_string, position):
+            return True
+    return False
@@ -1,10 +1,58 @@
 import math
 import json
+import sys
+import copy
+import weakref
 
 from .navigation import ShortestPathFinder
 from .util import send_command, debug_write
 from .unit import GameUnit
 from .game_map import GameMap
+from .array_map import ArrayGameMap
+from .forked_map import ForkedGameMap
+from .influence import InfluenceMap
+from .occupancy import OccupancyIndex
+from .targeting import TargetResolver
+from .path_field import PathField, RerouteAnalysis
+from .range_table import get_range_table
+from .distance_field import euclidean_distance_field, path_distance_field
+from .unit_spec import get_unit_specs
+from .unit_pool import CompactUnit, get_unit_pool
+
+_json_decoder = json.JSONDecoder()
+
+def _decode_field(state_line, key):
+    """
+    Decodes a single top level value of a serialized game state without decoding the rest of the string.
+    """
+    start = state_line.find('"{}"'.format(key))
+    if start < 0:
+        return json.loads(state_line)[key]
+    start = state_line.index(":", start + len(key) + 2) + 1
+    while state_line[start] in " \t\r\n":
+        start += 1
+    return _json_decoder.raw_decode(state_line, start)[0]
+
+_territory_mask = None
+_edge_mask = None
+
+def _static_placement_masks(game_map):
+    """
+    Bitmasks of the cells on our side of the arena and of our two edges. They only depend on the arena, so they are built once.
+    """
+    global _territory_mask, _edge_mask
+    if _territory_mask is None:
+        size = game_map.ARENA_SIZE
+        territory = 0
+        for x in range(size):
+            for y in range(game_map.HALF_ARENA):
+                if game_map.in_arena_bounds([x, y]):
+                    territory |= 1 << (x * size + y)
+        edges = 0
+        for x, y in game_map.get_edge_locations(game_map.BOTTOM_LEFT) + game_map.get_edge_locations(game_map.BOTTOM_RIGHT):
+            edges |= 1 << (x * size + y)
+        _territory_mask, _edge_mask = territory, edges
+    return _territory_mask, _edge_mask
 
 def is_stationary(unit_type):
     return unit_type in FIREWALL_TYPES
@@ -29,20 +77,24 @@ class GameState:
         * CORES (int): A constant representing the cores resource
          
         * game_map (:obj: GameMap): The current GameMap. To retrieve a list of GameUnits at a location, use game_map[x, y]
+        * array_board (bool): True if game_map is an ArrayGameMap backed by flat arrays
+        * unit_specs (:obj: UnitSpecRegistry): The stats of every unit type, compiled once per config
         * turn_number (int): The current turn number. Starts at 0.
         * my_health (int): Your current remaining health
         * my_time (int): The time you took to submit your previous turn
         * enemy_health (int): Your opponents current remaining health
         * enemy_time (int): Your opponents current remaining time
+        * parent (:obj: GameState): The GameState this one was forked from, None if it was parsed from a string
 
     """
 
-    def __init__(self, config, serialized_string):
+    def __init__(self, config, serialized_string, array_board=False):
         """ Setup a turns variables using arguments passed
 
         Args:
             * config (JSON): A json object containing information about the game
             * serialized_string (string): A string containing information about the game state at the start of this turn
+            * array_board (bool): Store units in an ArrayGameMap instead of per-cell lists of GameUnits
 
         """
         self.serialized_string = serialized_string
@@ -74,10 +126,26 @@ class GameState:
         self.BITS = 0
         self.CORES = 1
 
-        self.game_map = GameMap(self.config)
+        self.array_board = array_board
+        self.game_map = ArrayGameMap(self.config) if array_board else GameMap(self.config)
         self._shortest_path_finder = ShortestPathFinder()
+        self._range_table = get_range_table(config)
+        self.unit_specs = get_unit_specs(config)
         self._build_stack = []
         self._deploy_stack = []
+        self._path_cache = {}
+        self._path_fields = (None, {})
+        self._layout_fingerprint = None
+        self._influence_map = None
+        self._occupancy_index = None
+        self._shared_turn_data = False
+        self._forks = None
+        self._journal = None
+        self._savepoints = []
+        self._placement_masks = None
+        self._pooled_units = []
+        self._submitted = False
+        self.parent = None
         self._player_resources = [
                 {'cores': 0, 'bits': 0},  # player 0, which is you
                 {'cores': 0, 'bits': 0}]  # player 1, which is the opponent
@@ -87,14 +155,25 @@ class GameState:
         """
         Fills in map based on the serialized game state so that self.game_map[x,y] is a list of GameUnits at that location.
         state_line is the game state as a json string.
+
+        On an array board only the turn info and stats are decoded here. The unit lists are decoded
+        straight into the arrays of the ArrayGameMap the first time the board is used.
         """
-        state = json.loads(state_line)
+        if self.array_board:
+            state = None
+            turn_info = _decode_field(state_line, "turnInfo")
+            p1_stats = _decode_field(state_line, "p1Stats")
+            p2_stats = _decode_field(state_line, "p2Stats")
+        else:
+            state = json.loads(state_line)
+            turn_info = state["turnInfo"]
+            p1_stats = state["p1Stats"]
+            p2_stats = state["p2Stats"]
 
-        turn_info = state["turnInfo"]
         self.turn_number = int(turn_info[1])
 
-        p1_health, p1_cores, p1_bits, p1_time = map(float, state["p1Stats"][:4])
-        p2_health, p2_cores, p2_bits, p2_time = map(float, state["p2Stats"][:4])
+        p1_health, p1_cores, p1_bits, p1_time = map(float, p1_stats[:4])
+        p2_health, p2_cores, p2_bits, p2_time = map(float, p2_stats[:4])
 
         self.my_health = p1_health
         self.my_time = p1_time
@@ -105,17 +184,29 @@ class GameState:
             {'cores': p1_cores, 'bits': p1_bits},
             {'cores': p2_cores, 'bits': p2_bits}]
 
+        if self.array_board:
+            self.game_map.defer_units(lambda: self.__load_array_units(state_line))
+            return
+
         p1units = state["p1Units"]
         p2units = state["p2Units"]
 
         self.__create_parsed_units(p1units, 0)
         self.__create_parsed_units(p2units, 1)
 
+    def __load_array_units(self, state_line):
+        """
+        Decodes the unit lists of state_line into the ArrayGameMap without building any GameUnits.
+        """
+        self.game_map.load_units(_decode_field(state_line, "p1Units"), 0)
+        self.game_map.load_units(_decode_field(state_line, "p2Units"), 1)
+
     def __create_parsed_units(self, units, player_number):
         """
         Helper function for __parse_state to add units to the map.
         """
         typedef = self.config.get("unitInformation")
+        pool = get_unit_pool(self.config)
         for i, unit_types in enumerate(units):
             for uinfo in unit_types:
                 unit_type = typedef[i].get("shorthand")
@@ -128,7 +219,8 @@ class GameState:
                     if self.contains_stationary_unit([x,y]):
                         self.game_map[x,y][0].pending_removal = True
                 else:
-                    unit = GameUnit(unit_type, self.config, player_number, hp, x, y)
+                    unit = pool.acquire(unit_type, player_number, hp, x, y)
+                    self._pooled_units.append(unit)
                     self.game_map[x,y].append(unit)
 
     def __resource_required(self, unit_type):
@@ -144,21 +236,288 @@ class GameState:
         elif resource_type == self.CORES:
             resource_key = 'cores'
         held_resource = self.get_resource(resource_type, player_index)
+        self.__own_turn_data()
+        if self._journal is not None:
+            self._journal.append(("resource", player_index, resource_key, held_resource))
         self._player_resources[player_index][resource_key] = held_resource + amount
 
+    def fork(self):
+        """Creates a cheap copy of this GameState for trying out hypothetical boards.
+
+        The fork shares its board, resources and build/deploy stacks with this GameState,
+        and spawning in the fork never affects this GameState. Resources and stacks are
+        copied by whichever of the two changes them first. On an array board so are the
+        board arrays, so both GameStates can keep changing.
+
+        A list board fork reads the cells it has not touched yet straight from this
+        GameState's map. Before attempt_spawn or rollback change a cell here, every fork
+        still alive takes its own copy of that cell, so both GameStates stay writable.
+        Changes made to game_map directly skip this step and show through to the forks,
+        so don't make them while a fork is in use. Paths found by either are cached for both.
+
+        Returns:
+            A new GameState whose parent is this one
+
+        """
+        child = copy.copy(self)
+        if self.array_board:
+            child.game_map = self.game_map.fork()
+        else:
+            child.game_map = ForkedGameMap(self.game_map)
+            if self._forks is None:
+                self._forks = weakref.WeakSet()
+            self._forks.add(child)
+        child._forks = None
+        child._layout_fingerprint = None
+        child._placement_masks = None
+        child._path_fields = (None, {})
+        child._influence_map = None
+        child._occupancy_index = None
+        child._journal = None
+        child._savepoints = []
+        child._pooled_units = []
+        child._submitted = False
+        child.parent = self
+        child._shared_turn_data = True
+        self._shared_turn_data = True
+        return child
+
+    def __detach_forks(self, x, y):
+        """
+        Gives every fork still reading this list board its own copy of cell [x, y] before this GameState changes it.
+        """
+        if self._forks:
+            for fork in list(self._forks):
+                fork.game_map[x, y]
+
+    def __own_turn_data(self):
+        """
+        Copies the resources and build/deploy stacks before the first change made after a fork.
+        """
+        if self._shared_turn_data:
+            self._player_resources = [dict(resources) for resources in self._player_resources]
+            self._build_stack = list(self._build_stack)
+            self._deploy_stack = list(self._deploy_stack)
+            self._shared_turn_data = False
+
+    def diff(self, other=None):
+        """Compares this GameState with another one, by default the one it was forked from
+
+        Args:
+            * other: The GameState to compare against. Defaults to parent.
+
+        Returns:
+            A dict with
+                * spawned: (unit_type, x, y, player_index) of the units on this board but not on other
+                * removed: (unit_type, x, y, player_index) of the units on other but not on this board
+                * resources: For each player, a dict with the change in 'cores' and 'bits'
+                * build_stack: Entries added to the build stack since other
+                * deploy_stack: (unit_type, x, y, num) entries added to the deploy stack since other
+
+        """
+        if other is None:
+            other = self.parent
+        if other is None:
+            self.warn("diff needs a GameState to compare with, this one was not forked.")
+            return
+
+        spawned = []
+        removed = []
+        for x, y in self.__cells_to_compare(other):
+            units = [(unit.unit_type, x, y, unit.player_index) for unit in self.game_map[x, y]]
+            other_units = [(unit.unit_type, x, y, unit.player_index) for unit in other.game_map[x, y]]
+            for unit in other_units:
+                if unit in units:
+                    units.remove(unit)
+                else:
+                    removed.append(unit)
+            spawned.extend(units)
+
+        resources = []
+        for mine, theirs in zip(self._player_resources, other._player_resources):
+            resources.append({key: mine[key] - theirs[key] for key in ('cores', 'bits')})
+
+        def added(stack, other_stack):
+            if stack[:len(other_stack)] == other_stack:
+                return stack[len(other_stack):]
+            return list(stack)
+
+        return {
+            "spawned": spawned,
+            "removed": removed,
+            "resources": resources,
+            "build_stack": added(self._build_stack, other._build_stack),
+            "deploy_stack": added(self._deploy_stack, other._deploy_stack),
+        }
+
+    def __cells_to_compare(self, other):
+        """
+        Helper for diff. Narrows the comparison down to cells that can differ when one board is a fork of the other.
+        """
+        game_map = self.game_map
+        other_map = other.game_map
+        if isinstance(game_map, ArrayGameMap) and isinstance(other_map, ArrayGameMap):
+            size = self.ARENA_SIZE
+            indices = set()
+            for name in ("unit_types", "owners", "mobile_units"):
+                array = getattr(game_map, name)
+                other_array = getattr(other_map, name)
+                if array is other_array:
+                    continue
+                if name == "mobile_units":
+                    indices.update(index for index in set(array) | set(other_array) if array.get(index) != other_array.get(index))
+                else:
+                    indices.update(index for index, value in enumerate(array) if value != other_array[index])
+            return [[index // size, index % size] for index in sorted(indices)]
+        if isinstance(game_map, ForkedGameMap) and game_map.parent is other_map:
+            return game_map.changed_cells()
+        if isinstance(other_map, ForkedGameMap) and other_map.parent is game_map:
+            return other_map.changed_cells()
+        return [location for location in game_map]
+
+    def begin(self):
+        """Opens a savepoint. Everything attempt_spawn and attempt_remove change after this
+        can be undone with rollback, or kept with commit. Savepoints can be nested.
+
+        Returns:
+            The number of savepoints now open
+
+        """
+        if self._journal is None:
+            self._journal = []
+        self._savepoints.append(len(self._journal))
+        return len(self._savepoints)
+
+    def commit(self):
+        """Keeps the changes made since the last begin and closes that savepoint
+
+        """
+        if not self._savepoints:
+            self.warn("commit called without a matching begin.")
+            return
+        self._savepoints.pop()
+        if not self._savepoints:
+            self._journal = None
+
+    def rollback(self):
+        """Undoes the changes made since the last begin and closes that savepoint.
+        The journal is replayed backwards, so the cost depends on the number of changes and not on the board size.
+
+        """
+        if not self._savepoints:
+            self.warn("rollback called without a matching begin.")
+            return
+        start = self._savepoints.pop()
+        journal = self._journal
+        self.__own_turn_data()
+        while len(journal) > start:
+            entry = journal.pop()
+            kind = entry[0]
+            if kind == "resource":
+                _, player_index, resource_key, amount = entry
+                self._player_resources[player_index][resource_key] = amount
+            elif kind == "stack":
+                getattr(self, entry[1]).pop()
+            elif kind == "cell":
+                _, x, y, saved = entry
+                if self.array_board:
+                    self.game_map.restore_cell([x, y], saved)
+                else:
+                    self.__detach_forks(x, y)
+                    self.game_map.remove_unit([x, y])
+                    self.game_map[x, y].extend(saved)
+            elif kind == "layout":
+                self._layout_fingerprint = entry[1]
+            elif kind == "placement":
+                self._placement_masks = entry[1]
+            elif kind == "influence":
+                _, unit_type, x, y = entry
+                if self._influence_map is not None:
+                    self._influence_map.remove_unit(unit_type, [x, y], 0)
+            elif kind == "influence_map":
+                self._influence_map = None
+            elif kind == "occupancy":
+                _, unit_type, x, y = entry
+                if self._occupancy_index is not None:
+                    self._occupancy_index.remove_unit(unit_type, [x, y], 0)
+            elif kind == "occupancy_index":
+                self._occupancy_index = None
+        if not self._savepoints:
+            self._journal = None
+
+    def in_transaction(self):
+        """Checks whether a savepoint opened with begin is still open
+
+        Returns:
+            True if changes are currently being journaled
+
+        """
+        return bool(self._savepoints)
+
+    def __journal_spawn(self, unit_type, x, y):
+        """
+        Records what attempt_spawn is about to change at [x, y] so rollback can undo it.
+        Entries are undone in reverse order, so the cell is restored after the stacks and influence.
+        """
+        journal = self._journal
+        if self.array_board:
+            journal.append(("cell", x, y, self.game_map.save_cell([x, y])))
+        else:
+            journal.append(("cell", x, y, list(self.game_map[x, y])))
+        journal.append(("placement", self._placement_masks))
+        if is_stationary(unit_type):
+            journal.append(("layout", self._layout_fingerprint))
+            if self._influence_map is not None:
+                journal.append(("influence", unit_type, x, y))
+            if self._occupancy_index is not None:
+                journal.append(("occupancy", unit_type, x, y))
+            journal.append(("stack", "_build_stack"))
+        else:
+            journal.append(("stack", "_deploy_stack"))
+
+    def release_units(self):
+        """Hands the units of this board back to the shared UnitPool so the next turn can reuse them.
+        Call it once you are done with the GameState, typically after submit_turn.
+
+        The pool hands released units out again, so no unit from an earlier lookup may be used
+        afterwards: game_map[x, y] lists, contains_stationary_unit, get_attackers, get_target and
+        the like. Only units still on this board are released. Forks, simulations and units that
+        were taken off the board keep theirs.
+
+        """
+        if self.array_board:
+            self.game_map.release_units()
+        else:
+            game_map = self.game_map
+            on_board = [unit for unit in self._pooled_units if any(held is unit for held in game_map[unit.x, unit.y])]
+            get_unit_pool(self.config).release(on_board)
+            self._pooled_units = []
+
     def _invalid_player_index(self, index):
         self.warn("Invalid player index {} passed, player index should always be 0 (yourself) or 1 (your opponent)".format(index))
     
     def _invalid_unit(self, unit):
         self.warn("Invalid unit {}".format(unit))
 
+    def _after_submit(self, unit):
+        self.warn("The turn was already submitted, {} was not queued".format(unit))
+
     def submit_turn(self):
         """Submit and end your turn.
         Must be called at the end of your turn or the algo will hang.
         
         """
-        build_string = json.dumps(self._build_stack)
-        deploy_string = json.dumps(self._deploy_stack)
+        self._submit_stacks(self._build_stack, self._deploy_stack)
+
+    def _submit_stacks(self, build_stack, deploy_stack):
+        """
+        Sends the given build and deploy stacks to the engine. Used by submit_turn and by
+        TurnScheduler to submit an earlier snapshot of the stacks. Once sent, attempt_spawn
+        and attempt_remove stop changing this GameState, since nothing they queue is sent.
+        """
+        self._submitted = True
+        build_string = json.dumps(build_stack)
+        deploy_string = json.dumps([[unit_type, x, y] for unit_type, x, y, num in deploy_stack for _ in range(num)])
         send_command(build_string)
         send_command(deploy_string)
 
@@ -249,8 +608,7 @@ class GameState:
             self._invalid_unit(unit_type)
             return
 
-        unit_def = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[unit_type]]
-        return unit_def.get('cost')
+        return self.unit_specs[unit_type].cost
 
     def can_spawn(self, unit_type, location, num=1):
         """Check if we can spawn a unit at a location. 
@@ -280,8 +638,11 @@ class GameState:
         affordable = self.number_affordable(unit_type) >= num
         stationary = is_stationary(unit_type)
         blocked = self.contains_stationary_unit(location) or (stationary and len(self.game_map[location[0],location[1]]) > 0)
+        # The mask is only trusted for the static rules, the cell is checked above in case game_map was changed directly
+        if affordable and not blocked and (num == 1 or not stationary) and self.__placement_mask_for(stationary) >> (int(location[0]) * self.ARENA_SIZE + int(location[1])) & 1:
+            return True
         correct_territory = location[1] < self.HALF_ARENA
-        on_edge = location in (self.game_map.get_edge_locations(self.game_map.BOTTOM_LEFT) + self.game_map.get_edge_locations(self.game_map.BOTTOM_RIGHT))
+        on_edge = bool(_static_placement_masks(self.game_map)[1] >> (int(location[0]) * self.ARENA_SIZE + int(location[1])) & 1)
 
         if self.enable_warnings:
             fail_reason = ""
@@ -318,25 +679,66 @@ class GameState:
         if num < 1:
             self.warn("Attempted to spawn fewer than one units! ({})".format(num))
             return
+        if self._submitted:
+            self._after_submit(unit_type)
+            return 0
       
         if type(locations[0]) == int:
             locations = [locations]
         spawned_units = 0
         for location in locations:
+            if not is_stationary(unit_type):
+                spawned_units += self.__deploy_stack_of(unit_type, location, num)
+                continue
             for i in range(num):
                 if self.can_spawn(unit_type, location, 1):
                     x, y = map(int, location)
                     cost = self.type_cost(unit_type)
                     resource_type = self.__resource_required(unit_type)
                     self.__set_resource(resource_type, 0 - cost)
+                    if self._journal is not None:
+                        self.__journal_spawn(unit_type, x, y)
+                    self.__detach_forks(x, y)
                     self.game_map.add_unit(unit_type, location, 0)
-                    if is_stationary(unit_type):
-                        self._build_stack.append((unit_type, x, y))
-                    else:
-                        self._deploy_stack.append((unit_type, x, y))
+                    self.__own_turn_data()
+                    self._build_stack.append((unit_type, x, y))
+                    if self._layout_fingerprint is not None:
+                        self._layout_fingerprint |= 1 << (x * self.ARENA_SIZE + y)
+                    if self._placement_masks is not None:
+                        cleared = ~(1 << (x * self.ARENA_SIZE + y))
+                        self._placement_masks = (self._placement_masks[0] & cleared, self._placement_masks[1] & cleared)
+                    if self._influence_map is not None:
+                        self._influence_map.add_unit(unit_type, [x, y], 0)
+                    if self._occupancy_index is not None:
+                        self._occupancy_index.add_unit(unit_type, [x, y], 0)
                     spawned_units += 1
         return spawned_units
 
+    def __deploy_stack_of(self, unit_type, location, num):
+        """
+        Helper for attempt_spawn. Information units stack, so the location is checked once and the number
+        we can afford is worked out up front. The whole stack is a single (unit_type, x, y, num) deploy entry.
+        """
+        count = min(num, self.number_affordable(unit_type))
+        if not self.can_spawn(unit_type, location, max(count, 1)):
+            return 0
+        x, y = map(int, location)
+        self.__set_resource(self.BITS, 0 - count * self.type_cost(unit_type))
+        if self._journal is not None:
+            self.__journal_spawn(unit_type, x, y)
+        if self.array_board:
+            self.game_map.add_units(unit_type, [x, y], count, 0)
+        else:
+            self.__detach_forks(x, y)
+            for _ in range(count):
+                self.game_map.add_unit(unit_type, [x, y], 0)
+        self.__own_turn_data()
+        self._deploy_stack.append((unit_type, x, y, count))
+        if self._placement_masks is not None:
+            # Firewalls can't be built on top of information units
+            self._placement_masks = (self._placement_masks[0] & ~(1 << (x * self.ARENA_SIZE + y)), self._placement_masks[1])
+        return count
+
     def attempt_remove(self, locations):
         """Attempts to remove existing friendly firewalls in the given locations.
 
@@ -347,12 +749,18 @@ class GameState:
             The number of firewalls successfully flagged for removal
 
         """
+        if self._submitted:
+            self._after_submit(REMOVE)
+            return 0
         if type(locations[0]) == int:
             locations = [locations]
         removed_units = 0
         for location in locations:
             if location[1] < self.HALF_ARENA and self.contains_stationary_unit(location):
                 x, y = map(int, location)
+                self.__own_turn_data()
+                if self._journal is not None:
+                    self._journal.append(("stack", "_build_stack"))
                 self._build_stack.append((REMOVE, x, y))
                 removed_units += 1
             #else:
@@ -380,6 +788,10 @@ class GameState:
             * start_location: The location of a hypothetical unit
             * target_edge: The edge the unit wants to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc. Will auto calculate if None.
 
+        Paths are cached by firewall layout, start location and target edge, so asking
+        for the same path again is free until a firewall is spawned. If you edit game_map
+        directly, call invalidate_path_cache afterwards.
+
         Returns:
             A list of locations corresponding to the path the unit would take 
             to get from it's starting location to the best available end location
@@ -392,8 +804,200 @@ class GameState:
         if target_edge is None:
             target_edge = self.get_target_edge(start_location)
 
-        end_points = self.game_map.get_edge_locations(target_edge)
-        return self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self)
+        key = (self.__get_layout_fingerprint(), int(start_location[0]), int(start_location[1]), target_edge)
+        path = self._path_cache.get(key)
+        if path is None:
+            if self.game_map.in_arena_bounds(start_location):
+                path = self.get_path_field(target_edge).path(start_location)
+            else:
+                end_points = self.game_map.get_edge_locations(target_edge)
+                path = self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self)
+            if path is None:
+                return None
+            # Cached as tuples so callers that edit the locations they get back can't change later results
+            path = tuple((location[0], location[1]) for location in path)
+            self._path_cache[key] = path
+        return [[x, y] for x, y in path]
+
+    def get_path_field(self, target_edge):
+        """Gets the paths to an edge from every location at once
+
+        The field is computed with one search over the board and reused until the firewall
+        layout changes, so checking every location along an edge costs about as much as one path.
+
+        Args:
+            * target_edge: The edge the units want to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc.
+
+        Returns:
+            A PathField, whose path method returns what find_path_to_edge would
+
+        """
+        fingerprint = self.__get_layout_fingerprint()
+        layout, fields = self._path_fields
+        if layout != fingerprint:
+            fields = {}
+            self._path_fields = (fingerprint, fields)
+        field = fields.get(target_edge)
+        if field is None:
+            field = PathField(fingerprint, self.game_map.get_edge_locations(target_edge))
+            fields[target_edge] = field
+        return field
+
+    def get_firewall_reroutes(self, start_locations=None, locations=None):
+        """Finds how a single firewall on each candidate location would reroute information units
+
+        Each candidate is tried on its own against the current layout. The path fields
+        are repaired around the candidate instead of being recomputed, and only the
+        starts whose path runs next to a changed tile are walked again.
+
+        Args:
+            * start_locations: The spawn locations to follow, the open locations of the enemy's edges if None
+            * locations: The candidate locations, every location we could build a firewall on right now if None
+
+        Returns:
+            A dict mapping each candidate (x, y) to a dict of {start (x, y): new path} for the starts whose
+            path would change. The new path is None if the firewall blocks the start itself.
+
+        """
+        if start_locations is None:
+            start_locations = [location for location in self.game_map.get_edge_locations(self.game_map.TOP_LEFT) + self.game_map.get_edge_locations(self.game_map.TOP_RIGHT)
+                               if not self.contains_stationary_unit(location)]
+        if locations is None:
+            mask = self.__placement_mask_for(True)
+            locations = [[index // self.ARENA_SIZE, index % self.ARENA_SIZE] for index in range(self.ARENA_SIZE * self.ARENA_SIZE) if mask >> index & 1]
+        starts_by_edge = {}
+        for location in start_locations:
+            starts_by_edge.setdefault(self.get_target_edge(location), []).append(location)
+        reroutes = {(int(location[0]), int(location[1])): {} for location in locations}
+        for target_edge, starts in starts_by_edge.items():
+            analysis = RerouteAnalysis(self.get_path_field(target_edge), starts)
+            for location, changes in analysis.add_firewall_each(locations).items():
+                reroutes[location].update(changes)
+        return reroutes
+
+    def __get_layout_fingerprint(self):
+        """
+        Returns a bitmask with bit x * ARENA_SIZE + y set for every blocked location.
+        Computed on first use and kept up to date by attempt_spawn.
+        """
+        if self._layout_fingerprint is None:
+            fingerprint = 0
+            if self.array_board:
+                for index, type_index in enumerate(self.game_map.unit_types):
+                    if type_index >= 0:
+                        fingerprint |= 1 << index
+            else:
+                for location in self.game_map:
+                    if self.contains_stationary_unit(location):
+                        fingerprint |= 1 << (location[0] * self.ARENA_SIZE + location[1])
+            self._layout_fingerprint = fingerprint
+        return self._layout_fingerprint
+
+    def invalidate_path_cache(self):
+        """Drops all cached paths and recomputes the firewall layout fingerprint, placement masks, influence map and occupancy index on next use.
+        Only needed after changing game_map directly instead of through attempt_spawn.
+
+        """
+        self._path_cache.clear()
+        self._path_fields = (None, {})
+        self._layout_fingerprint = None
+        self._placement_masks = None
+        self._influence_map = None
+        self._occupancy_index = None
+
+    def __placement_mask_for(self, stationary):
+        """
+        Returns the bitmask of cells where a firewall (stationary True) or an information unit could be placed,
+        ignoring resources. Both masks are built on first use and kept up to date by attempt_spawn.
+        """
+        if self._placement_masks is None:
+            territory, edges = _static_placement_masks(self.game_map)
+            blocked = self.__get_layout_fingerprint()
+            occupied = blocked
+            if self.array_board:
+                for index, units in self.game_map.mobile_units.items():
+                    if units:
+                        occupied |= 1 << index
+            else:
+                for x, y in self.game_map:
+                    if self.game_map[x, y]:
+                        occupied |= 1 << (x * self.ARENA_SIZE + y)
+            self._placement_masks = (territory & ~occupied, edges & ~blocked)
+        return self._placement_masks[0 if stationary else 1]
+
+    def get_placement_mask(self, unit_type):
+        """Gets the cells where a unit of the given type can be placed right now, as a bitmask
+
+        The mask is kept up to date by attempt_spawn and attempt_remove. Unlike can_spawn it does
+        not look at the board, so call invalidate_path_cache after changing game_map directly.
+
+        Args:
+            * unit_type: The type of the unit
+
+        Returns:
+            An int with bit x * ARENA_SIZE + y set for every location where can_spawn(unit_type, [x, y]) is True
+
+        """
+        if unit_type not in ALL_UNITS:
+            self._invalid_unit(unit_type)
+            return 0
+        if self.number_affordable(unit_type) < 1:
+            return 0
+        return self.__placement_mask_for(is_stationary(unit_type))
+
+    def get_legal_placements(self, unit_type):
+        """Gets every location where a unit of the given type can be placed right now
+
+        Args:
+            * unit_type: The type of the unit
+
+        Returns:
+            A list of [x, y] locations, ordered by x then y
+
+        """
+        mask = self.get_placement_mask(unit_type)
+        locations = []
+        while mask:
+            lowest = mask & -mask
+            index = lowest.bit_length() - 1
+            locations.append([index // self.ARENA_SIZE, index % self.ARENA_SIZE])
+            mask ^= lowest
+        return locations
+
+    def filter_legal_placements(self, unit_type, locations):
+        """Keeps the candidate locations where a unit of the given type can be placed right now
+
+        Unlike calling can_spawn on each candidate this checks a single bitmask and never warns.
+
+        Args:
+            * unit_type: The type of the unit
+            * locations: The candidate locations
+
+        Returns:
+            The candidates that pass, in their original order
+
+        """
+        mask = self.get_placement_mask(unit_type)
+        size = self.ARENA_SIZE
+        return [location for location in locations
+                if 0 <= location[0] < size and 0 <= location[1] < size and mask >> (int(location[0]) * size + int(location[1])) & 1]
+
+    def get_distance_field(self, seeds, path_distance=False):
+        """Gets the distance from every cell to the nearest of several seed locations, in one pass over the grid
+
+        Args:
+            * seeds: The [x, y] locations to measure from
+            * path_distance: If True, count the steps an information unit would take around the current firewalls
+              instead of the straight line distance
+
+        Returns:
+            A list indexed by x * ARENA_SIZE + y. Sort or filter candidates with
+            gamelib.distance_field.rank_locations and locations_within.
+
+        """
+        if path_distance:
+            return path_distance_field(seeds, self.__get_layout_fingerprint())
+        return euclidean_distance_field(seeds)
 
     def contains_stationary_unit(self, location):
         """Check if a location is blocked
@@ -409,6 +1013,10 @@ class GameState:
             #self.warn('Checked for stationary unit outside of arena bounds')
             return False
         x, y = map(int, location)
+        if self.array_board:
+            if self.game_map.unit_types[x * self.ARENA_SIZE + y] < 0:
+                return False
+            return self.game_map[x,y][0]
         for unit in self.game_map[x,y]:
             if unit.stationary:
                 return unit
@@ -444,12 +1052,12 @@ class GameState:
 
         """
 
-        if not isinstance(attacking_unit, GameUnit):
+        if not isinstance(attacking_unit, (GameUnit, CompactUnit)):
             self.warn("Passed a {} to get_target as attacking_unit. Expected a GameUnit.".format(type(attacking_unit)))
             return
 
         attacker_location = [attacking_unit.x, attacking_unit.y]
-        possible_locations = self.game_map.get_locations_in_range(attacker_location, attacking_unit.range)
+        possible_locations = self._range_table.locations_in_range(attacker_location, attacking_unit.range)
         target = None
         target_stationary = True
         target_distance = sys.maxsize
@@ -511,6 +1119,49 @@ class GameState:
                     target_x_distance = unit_x_distance
         return target
 
+    def get_targets(self, attackers):
+        """Returns the targets of many units at once, each exactly what get_target would return.
+        The board is summarized once, so this is much cheaper than calling get_target for every unit.
+
+        Args:
+            * attackers: A list of GameUnits on this board
+
+        Returns:
+            A list with the GameUnit each attacker would choose to attack, None where there is nothing in range
+
+        """
+        return TargetResolver(self).resolve_all(attackers)
+
+    def get_influence_map(self):
+        """Gets the destructor threat and encryptor shield grids for the current board.
+        The grids are built on first use and updated as units are spawned with attempt_spawn,
+        so prefer them to get_attackers when scoring many locations.
+
+        Returns:
+            An InfluenceMap for this GameState
+
+        """
+        if self._influence_map is None:
+            self._influence_map = InfluenceMap(self)
+            if self._journal is not None:
+                self._journal.append(("influence_map", None))
+        return self._influence_map
+
+    def get_occupancy_index(self):
+        """Gets the index of where each player's firewalls are, by type.
+        The index is built on first use and updated as firewalls are spawned with attempt_spawn,
+        so prefer it to scanning game_map when counting firewalls in a region.
+
+        Returns:
+            An OccupancyIndex for this GameState
+
+        """
+        if self._occupancy_index is None:
+            self._occupancy_index = OccupancyIndex(self)
+            if self._journal is not None:
+                self._journal.append(("occupancy_index", None))
+        return self._occupancy_index
+
     def get_shielders(self, location, player_index):
         """Gets the destructors threatening a given location
 
@@ -532,7 +1183,9 @@ class GameState:
         """
         Get locations in the range of DESTRUCTOR units
         """
-        possible_locations= self.game_map.get_locations_in_range(location, self.config["unitInformation"][UNIT_TYPE_TO_INDEX[EMP]]["range"])
+        possible_locations = self._range_table.locations_in_range(location, self.unit_specs[EMP].range)
+        if self.array_board:
+            return self.__array_units_of_type(possible_locations, UNIT_TYPE_TO_INDEX[ENCRYPTOR], player_index)
         for location in possible_locations:
             for unit in self.game_map[location]:
                 if unit.unit_type == ENCRYPTOR and unit.player_index != player_index:
@@ -560,9 +1213,26 @@ class GameState:
         """
         Get locations in the range of DESTRUCTOR units
         """
-        possible_locations= self.game_map.get_locations_in_range(location, self.config["unitInformation"][UNIT_TYPE_TO_INDEX[DESTRUCTOR]]["range"])
+        possible_locations = self._range_table.locations_in_range(location, self.unit_specs[DESTRUCTOR].range)
+        if self.array_board:
+            return self.__array_units_of_type(possible_locations, UNIT_TYPE_TO_INDEX[DESTRUCTOR], player_index)
         for location in possible_locations:
             for unit in self.game_map[location]:
                 if unit.unit_type == DESTRUCTOR and unit.player_index != player_index:
                     attackers.append(unit)
         return attackers
+
+    def __array_units_of_type(self, locations, type_index, player_index):
+        """
+        Helper for get_attackers and get_shielders on an array board.
+        Returns the stationary units of type_index at the given locations that are not owned by player_index.
+        """
+        unit_types = self.game_map.unit_types
+        owners = self.game_map.owners
+        size = self.ARENA_SIZE
+        units = []
+        for x, y in locations:
+            index = x * size + y
+            if unit_types[index] == type_index and owners[index] != player_index:
+                units.append(self.game_map[x, y][0])
+        return units
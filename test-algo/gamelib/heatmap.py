@@ -0,0 +1,285 @@
+ARENA_SIZE = 28
+HEATMAP_KINDS = ("breach", "damage", "death")
+# The event lists each kind is built from, see decode_frame_events
+HEATMAP_EVENTS = ("breach", "damage", "death")
+# Indices into config["unitInformation"], matching UNIT_TYPE_TO_INDEX in game_state
+FIREWALL_INDICES = (0, 1, 2)
+# Positions in breach and damage events
+DAMAGE_FIELD = 1
+UNIT_TYPE_FIELD = 2
+
+
+class Heatmap:
+    """One player's totals for one kind of event, stored in a flat array.
+
+    Cells are indexed by x * ARENA_SIZE + y. Besides the values we remember
+    the cells that have been touched in the order they were first touched, so
+    queries only look at those and ties are broken by that order.
+
+    Attributes:
+        * values (list): The total of each cell
+        * touched (list): The indices of the cells that have been added to, in first-touched order
+
+    """
+
+    def __init__(self):
+        """ Creates an empty heatmap
+
+        """
+        self.values = [0.0] * (ARENA_SIZE * ARENA_SIZE)
+        self.touched = []
+        self._seen = bytearray(ARENA_SIZE * ARENA_SIZE)
+
+    def add(self, index, amount):
+        """Adds an amount to a cell
+
+        Args:
+            * index: The flat index of the cell
+            * amount: The amount to add
+
+        """
+        if not self._seen[index]:
+            self._seen[index] = 1
+            self.touched.append(index)
+        self.values[index] += amount
+
+    def scale(self, factor):
+        """Multiplies every touched cell by factor
+
+        Args:
+            * factor: The multiplier, for example the decay per turn
+
+        """
+        values = self.values
+        for index in self.touched:
+            values[index] *= factor
+
+    def clear(self):
+        """Resets every cell to 0 and forgets the touched cells
+
+        """
+        values = self.values
+        for index in self.touched:
+            values[index] = 0.0
+            self._seen[index] = 0
+        self.touched = []
+
+
+class HeatmapStore:
+    """Per-player heatmaps of where units breached, walls took damage and units died.
+
+    Each kind of event (breach, damage, death) has one Heatmap per player,
+    indexed like GameState player indices: 0 for you, 1 for your opponent.
+    A heatmap belongs to the owner of the unit the event is about, so the
+    places the enemy scored on us are in the enemy's breach map and the damage
+    our walls took is in our damage map. Only damage to firewalls is recorded.
+
+    Feed it the decoded events of each action frame with add_frame and call
+    end_turn once per turn to apply the decay. With the default decay of 1.0
+    the totals never fade. Breach and damage events add the event field at
+    amount_field, the damage by default, and death events add 1.
+
+    Attributes:
+        * decay (float): The factor every total is multiplied by in end_turn
+        * amount_field (int): The position of the breach and damage event field added to the totals
+
+    """
+
+    def __init__(self, decay=1.0, amount_field=DAMAGE_FIELD):
+        """ Creates empty heatmaps
+
+        Args:
+            * decay: The factor every total is multiplied by at the end of each turn
+            * amount_field: The position of the breach and damage event field added to the totals,
+              DAMAGE_FIELD or UNIT_TYPE_FIELD
+
+        """
+        self.decay = decay
+        self.amount_field = amount_field
+        self._maps = {kind: (Heatmap(), Heatmap()) for kind in HEATMAP_KINDS}
+
+    def heatmap(self, kind, player_index):
+        """Gets the Heatmap of one kind of event for one player
+
+        Args:
+            * kind: breach, damage or death
+            * player_index: 0 for you, 1 for your opponent
+
+        Returns:
+            The Heatmap
+
+        """
+        return self._maps[kind][player_index]
+
+    def add_frame(self, events):
+        """Adds the events of one action frame
+
+        Args:
+            * events: The dict returned by decode_frame_events, event lists that are missing are skipped
+
+        """
+        field = self.amount_field
+        breaches = events.get("breach")
+        if breaches:
+            maps = self._maps["breach"]
+            for event in breaches:
+                location = event[0]
+                maps[event[4] - 1].add(location[0] * ARENA_SIZE + location[1], event[field])
+        damages = events.get("damage")
+        if damages:
+            maps = self._maps["damage"]
+            for event in damages:
+                if event[UNIT_TYPE_FIELD] in FIREWALL_INDICES:
+                    location = event[0]
+                    maps[event[4] - 1].add(location[0] * ARENA_SIZE + location[1], event[field])
+        deaths = events.get("death")
+        if deaths:
+            maps = self._maps["death"]
+            for event in deaths:
+                location = event[0]
+                maps[event[3] - 1].add(location[0] * ARENA_SIZE + location[1], 1)
+
+    def add(self, kind, player_index, location, amount=1):
+        """Adds an amount to one cell
+
+        Args:
+            * kind: breach, damage or death
+            * player_index: 0 for you, 1 for your opponent
+            * location: The [x, y] location of the cell
+            * amount: The amount to add
+
+        """
+        self._maps[kind][player_index].add(location[0] * ARENA_SIZE + location[1], amount)
+
+    def end_turn(self):
+        """Applies one turn of decay to every heatmap
+
+        """
+        if self.decay == 1.0:
+            return
+        for maps in self._maps.values():
+            for heatmap in maps:
+                heatmap.scale(self.decay)
+
+    def clear(self):
+        """Resets every heatmap
+
+        """
+        for maps in self._maps.values():
+            for heatmap in maps:
+                heatmap.clear()
+
+    def get(self, kind, player_index, location):
+        """Gets the total of one cell
+
+        Args:
+            * kind: breach, damage or death
+            * player_index: 0 for you, 1 for your opponent
+            * location: The [x, y] location of the cell
+
+        Returns:
+            The total at location
+
+        """
+        return self._maps[kind][player_index].values[location[0] * ARENA_SIZE + location[1]]
+
+    def set(self, kind, player_index, location, value):
+        """Overwrites the total of one cell, for example to discount a cell we already reacted to
+
+        Args:
+            * kind: breach, damage or death
+            * player_index: 0 for you, 1 for your opponent
+            * location: The [x, y] location of the cell
+            * value: The new total
+
+        """
+        heatmap = self._maps[kind][player_index]
+        index = location[0] * ARENA_SIZE + location[1]
+        heatmap.add(index, 0)
+        heatmap.values[index] = value
+
+    def cells(self, kind, player_index):
+        """Gets the touched cells in the order they were first touched
+
+        Args:
+            * kind: breach, damage or death
+            * player_index: 0 for you, 1 for your opponent
+
+        Returns:
+            A list of ([x, y], total), including cells whose total has since dropped to 0
+
+        """
+        heatmap = self._maps[kind][player_index]
+        values = heatmap.values
+        return [([index // ARENA_SIZE, index % ARENA_SIZE], values[index]) for index in heatmap.touched]
+
+    def top_k(self, kind, player_index, k=None):
+        """Gets the touched cells with the highest totals
+
+        Ties keep the order the cells were first touched in.
+
+        Args:
+            * kind: breach, damage or death
+            * player_index: 0 for you, 1 for your opponent
+            * k: The number of cells to return, all touched cells if None
+
+        Returns:
+            A list of [x, y] locations, highest total first
+
+        """
+        heatmap = self._maps[kind][player_index]
+        ordered = sorted(heatmap.touched, key=heatmap.values.__getitem__, reverse=True)
+        if k is not None:
+            ordered = ordered[:k]
+        return [[index // ARENA_SIZE, index % ARENA_SIZE] for index in ordered]
+
+    def total(self, kind, player_index):
+        """Gets the sum of every cell
+
+        Args:
+            * kind: breach, damage or death
+            * player_index: 0 for you, 1 for your opponent
+
+        Returns:
+            The sum of the heatmap
+
+        """
+        heatmap = self._maps[kind][player_index]
+        values = heatmap.values
+        return sum(values[index] for index in heatmap.touched)
+
+    def region_total(self, kind, player_index, x_range, y_range):
+        """Gets the sum of a rectangle of cells
+
+        Args:
+            * kind: breach, damage or death
+            * player_index: 0 for you, 1 for your opponent
+            * x_range: (first, last) x coordinates, inclusive
+            * y_range: (first, last) y coordinates, inclusive
+
+        Returns:
+            The sum of the cells in the rectangle
+
+        """
+        values = self._maps[kind][player_index].values
+        x_first, x_last = max(0, x_range[0]), min(ARENA_SIZE - 1, x_range[1])
+        y_first, y_last = max(0, y_range[0]), min(ARENA_SIZE - 1, y_range[1])
+        if x_first > x_last or y_first > y_last:
+            return 0.0
+        # Columns are contiguous in the flat array, so each one is a single slice
+        return sum(sum(values[x * ARENA_SIZE + y_first:x * ARENA_SIZE + y_last + 1]) for x in range(x_first, x_last + 1))
+
+    def locations_total(self, kind, player_index, locations):
+        """Gets the sum of a list of cells
+
+        Args:
+            * kind: breach, damage or death
+            * player_index: 0 for you, 1 for your opponent
+            * locations: The [x, y] locations to add up
+
+        Returns:
+            The sum of the cells
+
+        """
+        values = self._maps[kind][player_index].values
+        return sum(values[x * ARENA_SIZE + y] for x, y in locations)
@@ -0,0 +1,152 @@
+from .range_table import get_range_table
+from .unit_spec import get_unit_specs
+
+# Indices into config["unitInformation"], matching UNIT_TYPE_TO_INDEX in game_state
+ENCRYPTOR_INDEX = 1
+DESTRUCTOR_INDEX = 2
+
+
+class InfluenceMap:
+    """Per-cell destructor threat and encryptor shield grids for both players.
+
+    Grids are flat lists indexed by x * ARENA_SIZE + y, one per player. Each grid
+    holds the influence of the units that player owns. For example
+    destructor_hits[1] counts the enemy destructors that can hit each cell. Build
+    one with GameState.get_influence_map, which keeps it up to date as you spawn
+    units.
+
+    Attributes:
+        * destructor_hits (list): destructor_hits[player_index][index] is the number of that player's destructors in range of the cell
+        * damage (list): damage[player_index][index] is the damage per frame that player's destructors deal to a unit on the cell
+        * shield (list): shield[player_index][index] is the shield that player's encryptors give a friendly unit on the cell
+
+    """
+
+    def __init__(self, game_state):
+        """ Builds the grids from the units currently on the board
+
+        Args:
+            * game_state: The GameState whose board we want to analyze
+
+        """
+        self.game_map = game_state.game_map
+        self.range_table = get_range_table(game_state.config)
+        self.ARENA_SIZE = game_state.ARENA_SIZE
+        self.unit_specs = get_unit_specs(game_state.config)
+        destructor = self.unit_specs.specs[DESTRUCTOR_INDEX]
+        encryptor = self.unit_specs.specs[ENCRYPTOR_INDEX]
+        self.DESTRUCTOR = destructor.shorthand
+        self.ENCRYPTOR = encryptor.shorthand
+        self.destructor_range = destructor.range
+        # Destructors only threaten information units here, so this is their damage to information units
+        self.destructor_damage = destructor.damage_i
+        self.encryptor_range = encryptor.range
+        self.encryptor_shield = encryptor.shield_amount
+
+        size = self.ARENA_SIZE
+        cells = size * size
+        self.destructor_hits = [[0] * cells, [0] * cells]
+        self.damage = [[0] * cells, [0] * cells]
+        self.shield = [[0] * cells, [0] * cells]
+
+        if game_state.array_board:
+            owners = self.game_map.owners
+            for index, type_index in enumerate(self.game_map.unit_types):
+                if type_index >= 0:
+                    self.add_unit(self.unit_specs.specs[type_index].shorthand, [index // size, index % size], owners[index])
+        else:
+            for location in self.game_map:
+                for unit in self.game_map[location]:
+                    if unit.stationary:
+                        self.add_unit(unit.unit_type, location, unit.player_index)
+
+    def add_unit(self, unit_type, location, player_index):
+        """Adds the influence of a new unit. Units other than destructors and encryptors are ignored.
+
+        Args:
+            * unit_type: The type of the unit
+            * location: The location of the unit
+            * player_index: The player that owns the unit, 0 for you 1 for the enemy
+
+        """
+        self.__apply(unit_type, location, player_index, 1)
+
+    def remove_unit(self, unit_type, location, player_index):
+        """Removes the influence of a unit that left the board. Units other than destructors and encryptors are ignored.
+
+        Args:
+            * unit_type: The type of the unit
+            * location: The location of the unit
+            * player_index: The player that owned the unit, 0 for you 1 for the enemy
+
+        """
+        self.__apply(unit_type, location, player_index, -1)
+
+    def __apply(self, unit_type, location, player_index, sign):
+        if unit_type == self.DESTRUCTOR:
+            hits = self.destructor_hits[player_index]
+            damage = self.damage[player_index]
+            for index in self.range_table.cell_indices_in_range(location, self.destructor_range):
+                hits[index] += sign
+                damage[index] = hits[index] * self.destructor_damage
+        elif unit_type == self.ENCRYPTOR:
+            shield = self.shield[player_index]
+            for index in self.range_table.cell_indices_in_range(location, self.encryptor_range):
+                shield[index] += sign * self.encryptor_shield
+
+    def attacker_count(self, location, player_index):
+        """Gets the number of destructors threatening a given location
+
+        Args:
+            * location: The location of a hypothetical defender
+            * player_index: The index corresponding to the defending player, 0 for you 1 for the enemy
+
+        Returns:
+            The number of destructors that would attack a unit controlled by the given player at the given location
+
+        """
+        return self.destructor_hits[1 - player_index][location[0] * self.ARENA_SIZE + location[1]]
+
+    def damage_at(self, location, player_index):
+        """Gets the damage per frame a unit takes from destructors at a given location
+
+        Args:
+            * location: The location of a hypothetical defender
+            * player_index: The index corresponding to the defending player, 0 for you 1 for the enemy
+
+        Returns:
+            The damage per frame dealt by the opponent's destructors at the location
+
+        """
+        return self.damage[1 - player_index][location[0] * self.ARENA_SIZE + location[1]]
+
+    def shield_at(self, location, player_index):
+        """Gets the shield a unit would receive from friendly encryptors at a given location
+
+        Args:
+            * location: The location of a hypothetical unit
+            * player_index: The index corresponding to the player owning the unit, 0 for you 1 for the enemy
+
+        Returns:
+            The total shield granted by the player's encryptors in range of the location
+
+        """
+        return self.shield[player_index][location[0] * self.ARENA_SIZE + location[1]]
+
+    def path_damage(self, path, player_index):
+        """Estimates the damage a unit takes walking a path, one frame of destructor fire per location
+
+        Args:
+            * path: A list of locations, as returned by GameState.find_path_to_edge
+            * player_index: The index corresponding to the player owning the unit, 0 for you 1 for the enemy
+
+        Returns:
+            The sum of the opponent's destructor damage grid over the path
+
+        """
+        size = self.ARENA_SIZE
+        damage = self.damage[1 - player_index]
+        total = 0
+        for x, y in path:
+            total += damage[x * size + y]
+        return total
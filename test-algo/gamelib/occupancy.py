@@ -0,0 +1,156 @@
+from .unit_spec import get_unit_specs, FIREWALL_INDICES
+
+
+class OccupancyIndex:
+    """Where each player's firewalls are, by type, with summed-area tables for region counts.
+
+    For every player and firewall type we keep a flat count grid indexed by
+    x * ARENA_SIZE + y and the set of occupied cells. Rectangle counts are
+    answered from a summed-area table, which is rebuilt on the first query
+    after a change, so counting the firewalls in a band or corner is four
+    lookups. Build one with GameState.get_occupancy_index, which keeps it up
+    to date as you spawn firewalls.
+
+    Units flagged for removal are still counted, they stay on the board until the turn ends.
+
+    """
+
+    def __init__(self, game_state):
+        """ Builds the index from the firewalls currently on the board
+
+        Args:
+            * game_state: The GameState whose board we want to index
+
+        """
+        self.unit_specs = get_unit_specs(game_state.config)
+        self.ARENA_SIZE = game_state.ARENA_SIZE
+        cells = self.ARENA_SIZE * self.ARENA_SIZE
+        self._grids = [{type_index: [0] * cells for type_index in FIREWALL_INDICES} for _ in range(2)]
+        self._occupied = [{type_index: set() for type_index in FIREWALL_INDICES} for _ in range(2)]
+        self._tables = {}
+
+        game_map = game_state.game_map
+        if game_state.array_board:
+            owners = game_map.owners
+            for index, type_index in enumerate(game_map.unit_types):
+                if type_index >= 0:
+                    self.__apply(type_index, index, owners[index], 1)
+        else:
+            size = self.ARENA_SIZE
+            for location in game_map:
+                for unit in game_map[location]:
+                    if unit.stationary:
+                        self.__apply(self.unit_specs.index_of(unit.unit_type), location[0] * size + location[1], unit.player_index, 1)
+
+    def add_unit(self, unit_type, location, player_index):
+        """Adds a new firewall. Information units are ignored.
+
+        Args:
+            * unit_type: The type of the unit
+            * location: The location of the unit
+            * player_index: The player that owns the unit, 0 for you 1 for the enemy
+
+        """
+        spec = self.unit_specs[unit_type]
+        if spec.stationary:
+            self.__apply(spec.index, location[0] * self.ARENA_SIZE + location[1], player_index, 1)
+
+    def remove_unit(self, unit_type, location, player_index):
+        """Removes a firewall that left the board. Information units are ignored.
+
+        Args:
+            * unit_type: The type of the unit
+            * location: The location of the unit
+            * player_index: The player that owned the unit, 0 for you 1 for the enemy
+
+        """
+        spec = self.unit_specs[unit_type]
+        if spec.stationary:
+            self.__apply(spec.index, location[0] * self.ARENA_SIZE + location[1], player_index, -1)
+
+    def __apply(self, type_index, index, player_index, sign):
+        grid = self._grids[player_index][type_index]
+        grid[index] += sign
+        if grid[index] > 0:
+            self._occupied[player_index][type_index].add(index)
+        else:
+            self._occupied[player_index][type_index].discard(index)
+        self._tables.pop((player_index, type_index), None)
+        self._tables.pop((player_index, None), None)
+
+    def __table(self, player_index, type_index):
+        """
+        Returns the summed-area table of one type, or of all firewalls if type_index is None.
+        table[(x + 1) * (ARENA_SIZE + 1) + y + 1] is the count of cells with coordinates at most x and y.
+        """
+        key = (player_index, type_index)
+        table = self._tables.get(key)
+        if table is None:
+            size = self.ARENA_SIZE
+            stride = size + 1
+            if type_index is None:
+                grids = list(self._grids[player_index].values())
+            else:
+                grids = [self._grids[player_index][type_index]]
+            table = [0] * (stride * stride)
+            for x in range(size):
+                running = 0
+                column = x * size
+                row = (x + 1) * stride
+                for y in range(size):
+                    for grid in grids:
+                        running += grid[column + y]
+                    table[row + y + 1] = table[row - stride + y + 1] + running
+            self._tables[key] = table
+        return table
+
+    def count(self, player_index, unit_type=None, x_range=None, y_range=None):
+        """Counts a player's firewalls in a rectangle
+
+        Args:
+            * player_index: 0 for you, 1 for the enemy
+            * unit_type: The type to count, every firewall if None
+            * x_range: (first, last) x coordinates, inclusive, the whole arena if None
+            * y_range: (first, last) y coordinates, inclusive, the whole arena if None
+
+        Returns:
+            The number of firewalls in the rectangle
+
+        """
+        if unit_type is not None and not self.unit_specs[unit_type].stationary:
+            return 0
+        type_index = None if unit_type is None else self.unit_specs.index_of(unit_type)
+        size = self.ARENA_SIZE
+        x_first, x_last = (0, size - 1) if x_range is None else (max(0, x_range[0]), min(size - 1, x_range[1]))
+        y_first, y_last = (0, size - 1) if y_range is None else (max(0, y_range[0]), min(size - 1, y_range[1]))
+        if x_first > x_last or y_first > y_last:
+            return 0
+        if x_range is None and y_range is None:
+            if type_index is None:
+                return sum(len(cells) for cells in self._occupied[player_index].values())
+            return len(self._occupied[player_index][type_index])
+        table = self.__table(player_index, type_index)
+        stride = size + 1
+        top = (x_last + 1) * stride
+        bottom = x_first * stride
+        return table[top + y_last + 1] - table[top + y_first] - table[bottom + y_last + 1] + table[bottom + y_first]
+
+    def locations(self, player_index, unit_type=None):
+        """Gets the locations of a player's firewalls without scanning the board
+
+        Args:
+            * player_index: 0 for you, 1 for the enemy
+            * unit_type: The type to look for, every firewall if None
+
+        Returns:
+            A list of [x, y] locations, sorted by x then y
+
+        """
+        if unit_type is None:
+            indices = set().union(*self._occupied[player_index].values())
+        elif not self.unit_specs[unit_type].stationary:
+            return []
+        else:
+            indices = self._occupied[player_index][self.unit_specs.index_of(unit_type)]
+        size = self.ARENA_SIZE
+        return [[index // size, index % size] for index in sorted(indices)]
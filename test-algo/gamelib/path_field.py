@@ -0,0 +1,457 @@
+import heapq
+from collections import deque
+
+from .range_table import _in_arena_bounds
+
+ARENA_SIZE = 28
+HALF_ARENA = ARENA_SIZE // 2
+# Directions of the previous move, as in ShortestPathFinder
+HORIZONTAL = 1
+VERTICAL = 2
+
+_IN_ARENA = [_in_arena_bounds(x, y) for x in range(ARENA_SIZE) for y in range(ARENA_SIZE)]
+
+
+def _passable(x, y, blocked):
+    return 0 <= x < ARENA_SIZE and 0 <= y < ARENA_SIZE and _IN_ARENA[x * ARENA_SIZE + y] and not (blocked >> (x * ARENA_SIZE + y)) & 1
+
+
+class PathField:
+    """The path to one target edge from every start location, for one firewall layout.
+
+    ShortestPathFinder searches the start's region for its most ideal tile
+    (a tile of the edge if one is reachable, otherwise the tile deepest in
+    the edge's direction), measures the distance from that tile to every
+    other tile, then walks down the distances from the start. Only the walk
+    depends on the start: the distances depend on the region the start is in.
+    So one breadth first search from the edge covers every region touching
+    it, one more per other region starts at its most ideal tile, and a path
+    is then a walk down that field. The walk uses the same tie-breaks as
+    ShortestPathFinder and the next move from each tile is cached.
+
+    with_firewall and without_firewall derive the field for the layout with
+    one cell changed, repairing only the distances that change.
+
+    Get one with GameState.get_path_field, which reuses it until the firewall layout changes.
+
+    Attributes:
+        * edge_locations (list): The locations of the target edge
+        * blocked (int): A bitmask with bit x * ARENA_SIZE + y set for every blocked location
+        * path_lengths (list): The distance from each tile to the end of its path, -1 for blocked tiles and tiles outside the arena
+        * changed_cells (set): The indices of the tiles whose path length differs from the field this one was derived from, empty if it was not derived
+
+    """
+
+    def __init__(self, blocked, edge_locations):
+        """ Computes the distances to the edge for every region of the board
+
+        Args:
+            * blocked: A bitmask with bit x * ARENA_SIZE + y set for every blocked location
+            * edge_locations: The locations of the target edge, as returned by GameMap.get_edge_locations
+
+        """
+        self.blocked = blocked
+        self.edge_locations = edge_locations
+        first_x, first_y = edge_locations[0]
+        self._direction = (1 if first_x >= HALF_ARENA else -1, 1 if first_y >= HALF_ARENA else -1)
+        self._edge_indices = {x * ARENA_SIZE + y for x, y in edge_locations}
+        self._next_moves = {}
+        self.changed_cells = set()
+
+        cells = ARENA_SIZE * ARENA_SIZE
+        # Label the regions, remembering the most ideal tile of the ones the edge can't be reached from
+        self._regions = regions = [-1] * cells
+        self._region_sources = []
+        for index in range(cells):
+            if regions[index] < 0 and _passable(index // ARENA_SIZE, index % ARENA_SIZE, blocked):
+                members = self.__flood(index, len(self._region_sources))
+                if self._edge_indices.isdisjoint(members):
+                    self._region_sources.append(max(members, key=self.__idealness))
+                else:
+                    self._region_sources.append(None)
+
+        path_lengths = [-1] * cells
+        # Every region the edge is reachable from ends its paths on the edge
+        frontier = deque()
+        for index in self._edge_indices:
+            if regions[index] >= 0:
+                path_lengths[index] = 0
+                frontier.append(index)
+        self.__spread(path_lengths, frontier)
+        # The other regions end their paths on their most ideal tile
+        for source in self._region_sources:
+            if source is not None:
+                path_lengths[source] = 0
+                self.__spread(path_lengths, deque([source]))
+        self.path_lengths = path_lengths
+
+    def __neighbors(self, index, blocked):
+        x, y = divmod(index, ARENA_SIZE)
+        return [nx * ARENA_SIZE + ny for nx, ny in ((x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)) if _passable(nx, ny, blocked)]
+
+    def __flood(self, start, label, cells=None):
+        """
+        Gives label to the region holding start, or to the part of it within cells if given, and returns its tiles.
+        """
+        regions = self._regions
+        regions[start] = label
+        members = [start]
+        frontier = deque([start])
+        while frontier:
+            for neighbor in self.__neighbors(frontier.popleft(), self.blocked):
+                if regions[neighbor] != label and (cells is None or neighbor in cells):
+                    regions[neighbor] = label
+                    members.append(neighbor)
+                    frontier.append(neighbor)
+        return members
+
+    def __spread(self, path_lengths, frontier):
+        while frontier:
+            index = frontier.popleft()
+            length = path_lengths[index] + 1
+            for neighbor in self.__neighbors(index, self.blocked):
+                if path_lengths[neighbor] < 0:
+                    path_lengths[neighbor] = length
+                    frontier.append(neighbor)
+
+    def __idealness(self, index):
+        """
+        Idealness of a tile off the edge, as in ShortestPathFinder._get_idealness. It is unique per tile.
+        """
+        x, y = divmod(index, ARENA_SIZE)
+        direction_x, direction_y = self._direction
+        idealness = 28 * y if direction_y == 1 else 28 * (27 - y)
+        return idealness + (x if direction_x == 1 else 27 - x)
+
+    def __derive(self, blocked):
+        field = PathField.__new__(PathField)
+        field.blocked = blocked
+        field.edge_locations = self.edge_locations
+        field._direction = self._direction
+        field._edge_indices = self._edge_indices
+        field._next_moves = {}
+        field.path_lengths = list(self.path_lengths)
+        field._regions = list(self._regions)
+        field._region_sources = list(self._region_sources)
+        return field
+
+    def with_firewall(self, location):
+        """Gets the field for this layout with a firewall added
+
+        Only the tiles that lose every shortest route are searched again. Tiles the firewall
+        cuts off from the edge or from their most ideal tile become regions of their own.
+
+        Args:
+            * location: The location of the new firewall
+
+        Returns:
+            A new PathField, or this one if the location is already blocked or outside the arena
+
+        """
+        x, y = int(location[0]), int(location[1])
+        if not _passable(x, y, self.blocked):
+            return self
+        cell = x * ARENA_SIZE + y
+        old = self.path_lengths
+        field = self.__derive(self.blocked | (1 << cell))
+        lengths = field.path_lengths
+        lengths[cell] = -1
+        field._regions[cell] = -1
+
+        # Tiles whose every neighbour one step closer is the new firewall or another such tile, nearest first
+        affected = set()
+        frontier = deque(neighbor for neighbor in field.__neighbors(cell, field.blocked) if old[neighbor] == old[cell] + 1)
+        queued = set(frontier)
+        while frontier:
+            index = frontier.popleft()
+            length = old[index]
+            neighbors = field.__neighbors(index, field.blocked)
+            if any(old[neighbor] == length - 1 and neighbor not in affected for neighbor in neighbors):
+                continue
+            affected.add(index)
+            for neighbor in neighbors:
+                if old[neighbor] == length + 1 and neighbor not in queued:
+                    queued.add(neighbor)
+                    frontier.append(neighbor)
+
+        # Route them around the firewall through the tiles that kept their distance
+        for index in affected:
+            lengths[index] = -1
+        heap = []
+        for index in affected:
+            entries = [lengths[neighbor] for neighbor in field.__neighbors(index, field.blocked) if lengths[neighbor] >= 0]
+            if entries:
+                heap.append((min(entries) + 1, index))
+        heapq.heapify(heap)
+        while heap:
+            length, index = heapq.heappop(heap)
+            if lengths[index] >= 0:
+                continue
+            lengths[index] = length
+            for neighbor in field.__neighbors(index, field.blocked):
+                if lengths[neighbor] < 0 and neighbor in affected:
+                    heapq.heappush(heap, (length + 1, neighbor))
+
+        # What is left was cut off, each piece ends its paths on its own most ideal tile
+        cut_off = {index for index in affected if lengths[index] < 0}
+        for index in sorted(cut_off):
+            if lengths[index] < 0:
+                members = field.__flood(index, len(field._region_sources), cut_off)
+                source = max(members, key=self.__idealness)
+                field._region_sources.append(source)
+                lengths[source] = 0
+                field.__spread(lengths, deque([source]))
+
+        field.changed_cells = {index for index in affected if lengths[index] != old[index]}
+        field.changed_cells.add(cell)
+        return field
+
+    def without_firewall(self, location):
+        """Gets the field for this layout with a firewall removed
+
+        Distances are only lowered outward from the freed tile. Regions it joins to
+        the edge or to a more ideal tile are searched again.
+
+        Args:
+            * location: The location of the removed firewall
+
+        Returns:
+            A new PathField, or this one if the location is not blocked or is outside the arena
+
+        """
+        x, y = int(location[0]), int(location[1])
+        cell = x * ARENA_SIZE + y
+        if not (0 <= x < ARENA_SIZE and 0 <= y < ARENA_SIZE and _IN_ARENA[cell] and (self.blocked >> cell) & 1):
+            return self
+        old = self.path_lengths
+        field = self.__derive(self.blocked & ~(1 << cell))
+        lengths = field.path_lengths
+        regions = field._regions
+        sources = field._region_sources
+        neighbors = field.__neighbors(cell, field.blocked)
+        labels = {regions[neighbor] for neighbor in neighbors}
+
+        # Work out which region the joined one continues and which ones start over
+        edge_labels = sorted(label for label in labels if sources[label] is None)
+        if cell in self._edge_indices or edge_labels:
+            if edge_labels:
+                target = edge_labels[0]
+            else:
+                target = len(sources)
+                sources.append(None)
+            restart = {label for label in labels if sources[label] is not None}
+            source = cell if cell in self._edge_indices else None
+        else:
+            source = cell
+            for label in labels:
+                if self.__idealness(sources[label]) > self.__idealness(source):
+                    source = sources[label]
+            if source == cell:
+                target = len(sources)
+                sources.append(cell)
+                restart = set(labels)
+            else:
+                target = regions[source]
+                restart = labels - {target}
+                source = None
+
+        touched = {cell}
+        if labels - {target}:
+            for index in range(ARENA_SIZE * ARENA_SIZE):
+                if regions[index] in labels and regions[index] != target:
+                    if regions[index] in restart:
+                        lengths[index] = -1
+                        touched.add(index)
+                    regions[index] = target
+        regions[cell] = target
+
+        if source == cell:
+            lengths[cell] = 0
+        else:
+            lengths[cell] = min(lengths[neighbor] for neighbor in neighbors if lengths[neighbor] >= 0) + 1
+        heap = [(lengths[cell], cell)]
+        while heap:
+            length, index = heapq.heappop(heap)
+            if length != lengths[index]:
+                continue
+            for neighbor in field.__neighbors(index, field.blocked):
+                if lengths[neighbor] < 0 or lengths[neighbor] > length + 1:
+                    lengths[neighbor] = length + 1
+                    touched.add(neighbor)
+                    heapq.heappush(heap, (length + 1, neighbor))
+
+        field.changed_cells = {index for index in touched if lengths[index] != old[index]}
+        return field
+
+    def path(self, start_location):
+        """Gets the path a unit at a given location would take to the edge
+
+        Args:
+            * start_location: The location of a hypothetical unit
+
+        Returns:
+            The same list of locations as find_path_to_edge, or None if the start is blocked
+
+        """
+        x, y = int(start_location[0]), int(start_location[1])
+        if not _passable(x, y, self.blocked):
+            return None
+        path_lengths = self.path_lengths
+        path = [start_location]
+        previous = 0
+        while path_lengths[x * ARENA_SIZE + y] != 0:
+            key = (x * ARENA_SIZE + y, previous)
+            move = self._next_moves.get(key)
+            if move is None:
+                move = self.__next_move(x, y, previous)
+                self._next_moves[key] = move
+            previous = VERTICAL if move[0] == x else HORIZONTAL
+            x, y = move
+            path.append([x, y])
+        return path
+
+    def path_length(self, start_location):
+        """Gets the number of moves from a location to the end of its path
+
+        Args:
+            * start_location: The location of a hypothetical unit
+
+        Returns:
+            The number of moves, or -1 if the start is blocked
+
+        """
+        x, y = int(start_location[0]), int(start_location[1])
+        if not _passable(x, y, self.blocked):
+            return -1
+        return self.path_lengths[x * ARENA_SIZE + y]
+
+    def reaches_edge(self, start_location):
+        """Checks whether a unit at a location would reach the edge instead of stopping short of it
+
+        Args:
+            * start_location: The location of a hypothetical unit
+
+        Returns:
+            True if the path from start_location ends on the edge
+
+        """
+        path = self.path(start_location)
+        return path is not None and path[-1] in self.edge_locations
+
+    def __next_move(self, x, y, previous):
+        """
+        ShortestPathFinder._choose_next_move: the neighbour with the lowest path length,
+        with ties broken by _better_direction.
+        """
+        path_lengths = self.path_lengths
+        ideal = (x, y)
+        best_length = path_lengths[x * ARENA_SIZE + y]
+        for neighbor in ((x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)):
+            if not _passable(neighbor[0], neighbor[1], self.blocked):
+                continue
+            length = path_lengths[neighbor[0] * ARENA_SIZE + neighbor[1]]
+            if length > best_length:
+                continue
+            if length == best_length and not self.__better_direction((x, y), neighbor, ideal, previous):
+                continue
+            ideal = neighbor
+            best_length = length
+        return ideal
+
+    def __better_direction(self, previous_tile, new_tile, previous_best, previous_move):
+        if previous_move == HORIZONTAL and not new_tile[0] == previous_best[0]:
+            return previous_tile[1] != new_tile[1]
+        if previous_move == VERTICAL and not new_tile[1] == previous_best[1]:
+            return previous_tile[0] != new_tile[0]
+        if previous_move == 0:
+            return previous_tile[1] != new_tile[1]
+        direction_x, direction_y = self._direction
+        if new_tile[1] == previous_best[1]:
+            return (direction_x == 1 and new_tile[0] > previous_best[0]) or (direction_x == -1 and new_tile[0] < previous_best[0])
+        if new_tile[0] == previous_best[0]:
+            return (direction_y == 1 and new_tile[1] > previous_best[1]) or (direction_y == -1 and new_tile[1] < previous_best[1])
+        return True
+
+
+class RerouteAnalysis:
+    """Finds which paths change when a single firewall is added or removed.
+
+    The paths of the start locations are found once. For each change the
+    field is repaired with with_firewall or without_firewall, and only the
+    starts whose path passes next to a tile whose distance changed are
+    walked again, since a step only depends on the distances around it.
+
+    Attributes:
+        * field (:obj: PathField): The field of the current layout
+        * start_locations (list): The locations whose paths we follow
+        * paths (list): The current path from each start, None for blocked starts
+
+    """
+
+    def __init__(self, field, start_locations):
+        """ Finds the current paths
+
+        Args:
+            * field: The PathField of the current layout, from GameState.get_path_field
+            * start_locations: The locations whose paths we follow, for example the enemy's edges
+
+        """
+        self.field = field
+        self.start_locations = [[int(location[0]), int(location[1])] for location in start_locations]
+        self.paths = [field.path(location) for location in self.start_locations]
+        self._starts_by_cell = {}
+        for position, (start, path) in enumerate(zip(self.start_locations, self.paths)):
+            for x, y in path or [start]:
+                self._starts_by_cell.setdefault(x * ARENA_SIZE + y, set()).add(position)
+
+    def __changes(self, field):
+        if field is self.field:
+            return {}
+        near = set()
+        for index in field.changed_cells:
+            near.update((index, index - 1, index + 1, index - ARENA_SIZE, index + ARENA_SIZE))
+        positions = set()
+        for index in near:
+            positions.update(self._starts_by_cell.get(index, ()))
+        changes = {}
+        for position in sorted(positions):
+            path = field.path(self.start_locations[position])
+            if path != self.paths[position]:
+                changes[tuple(self.start_locations[position])] = path
+        return changes
+
+    def add_firewall(self, location):
+        """Gets the paths a firewall at location would change
+
+        Args:
+            * location: The location of the hypothetical firewall
+
+        Returns:
+            A dict mapping each start (x, y) whose path changes to its new path, None if the firewall blocks the start itself
+
+        """
+        return self.__changes(self.field.with_firewall(location))
+
+    def remove_firewall(self, location):
+        """Gets the paths removing the firewall at location would change
+
+        Args:
+            * location: The location of the firewall
+
+        Returns:
+            A dict mapping each start (x, y) whose path changes to its new path
+
+        """
+        return self.__changes(self.field.without_firewall(location))
+
+    def add_firewall_each(self, locations):
+        """Tries a firewall on each location in turn, each time on the current layout
+
+        Args:
+            * locations: The candidate locations
+
+        Returns:
+            A dict mapping each candidate (x, y) to the dict returned by add_firewall
+
+        """
+        return {(int(location[0]), int(location[1])): self.add_firewall(location) for location in locations}
@@ -0,0 +1,176 @@
+import os
+import time
+import traceback
+import weakref
+from concurrent import futures
+
+from .simulator import simulate
+from .util import debug_write
+
+
+def _evaluate_plan(config, serialized_string, build_stack, deploy_stack, plan, enemy_deploys, max_frames):
+    """
+    Worker side of PlanEvaluator. Rebuilds the GameState, replays the units already placed this turn,
+    applies the plan and simulates the action phase.
+    """
+    from .game_state import GameState
+
+    game_state = GameState(config, serialized_string, array_board=True)
+    game_state.suppress_warnings(True)
+    remove = config["unitInformation"][6]["shorthand"]
+    for unit_type, x, y in build_stack:
+        if unit_type == remove:
+            game_state.attempt_remove([x, y])
+        else:
+            game_state.attempt_spawn(unit_type, [x, y])
+    for unit_type, x, y, num in deploy_stack:
+        game_state.attempt_spawn(unit_type, [x, y], num)
+
+    bits_before = game_state.get_resource(game_state.BITS)
+    for unit_type, location, num in plan:
+        game_state.attempt_spawn(unit_type, location, num)
+    bits_spent = bits_before - game_state.get_resource(game_state.BITS)
+
+    simulation = simulate(game_state, enemy_deploys, max_frames)
+    return {
+        "breaches": simulation.breaches[0],
+        "damage_dealt": simulation.damage_dealt[0],
+        "bits_spent": bits_spent,
+        "enemy_health": simulation.health[1],
+        "units_lost": simulation.units_lost[0],
+        "frames": simulation.frame,
+    }
+
+
+def _shutdown_pool(pool):
+    """
+    Stops a worker pool without waiting for the plans it is still simulating.
+    """
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+class PlanEvaluator:
+    """Scores candidate deploy plans by simulating each one in a pool of worker processes.
+
+    A plan is a list of (unit_type, location, num) deploys, the same arguments you
+    would pass to GameState.attempt_spawn. Every plan is applied on top of the units
+    already placed this turn and played out with the local simulator. The simulation
+    is deterministic, so one rollout per plan gives its expected outcome.
+
+    The workers rebuild the board from the GameState's serialized_string and replay
+    its build and deploy stacks, so only changes made through attempt_spawn and
+    attempt_remove reach the simulation. That includes the ones made in a fork, but
+    changes made to game_map directly, in the GameState or a fork, are not seen.
+
+    The pool is created on first use and reused across turns. At most one plan per
+    worker is submitted at a time, and plans still running when a deadline passes
+    keep their worker until they finish. Later calls only use the free workers, so
+    a slow turn never leaves a growing backlog for the next ones. Call shutdown when
+    the game ends. The pool is also shut down when the evaluator is garbage
+    collected or the process exits.
+
+    """
+
+    def __init__(self, processes=None, max_frames=500):
+        """ Configures the evaluator
+
+        Args:
+            * processes: The number of worker processes. Defaults to the number of CPUs minus one, and 1 evaluates in process.
+            * max_frames: The maximum number of frames to simulate per plan
+
+        """
+        if processes is None:
+            processes = max(1, (os.cpu_count() or 1) - 1)
+        self.processes = processes
+        self.max_frames = max_frames
+        self._pool = None
+        self._finalizer = None
+        self._in_flight = set()
+
+    def evaluate(self, game_state, plans, deadline, enemy_deploys=None):
+        """Simulates every plan and reports its outcome
+
+        Args:
+            * game_state: The GameState the plans start from, it is not modified
+            * plans: A list of plans, each a list of (unit_type, location, num) deploys
+            * deadline: The time.time() value by which results are needed. Plans not finished by then are dropped,
+              as are plans that could not start because every worker was busy.
+            * enemy_deploys: A list of (unit_type, location, num) information units the opponent is expected to deploy
+
+        Returns:
+            A list with one entry per plan, None for plans that did not finish before the deadline or raised. A plan
+            that raised is reported with debug_write along with its traceback. Each entry is a dict with the breaches,
+            damage_dealt (to enemy firewalls), bits_spent, enemy_health, units_lost and frames of the simulated action phase.
+
+        """
+        args = (game_state.config, game_state.serialized_string, game_state._build_stack, game_state._deploy_stack)
+        results = [None] * len(plans)
+        if self.processes <= 1:
+            for i, plan in enumerate(plans):
+                if time.time() >= deadline:
+                    break
+                try:
+                    results[i] = _evaluate_plan(*args, plan, enemy_deploys, self.max_frames)
+                except Exception:
+                    debug_write("Plan {} failed:\n{}".format(i, traceback.format_exc()))
+            return results
+
+        if self._pool is None:
+            self._pool = futures.ProcessPoolExecutor(max_workers=self.processes)
+            self._finalizer = weakref.finalize(self, _shutdown_pool, self._pool)
+        in_flight = self._in_flight
+        pending = {}
+        next_plan = 0
+        while True:
+            # Plans left running by earlier calls still hold their workers
+            in_flight.difference_update([future for future in in_flight if future.done()])
+            while next_plan < len(plans) and len(in_flight) < self.processes:
+                future = self._pool.submit(_evaluate_plan, *args, plans[next_plan], enemy_deploys, self.max_frames)
+                pending[future] = next_plan
+                in_flight.add(future)
+                next_plan += 1
+            timeout = deadline - time.time()
+            if timeout <= 0 or (next_plan == len(plans) and all(future.done() for future in pending)):
+                break
+            futures.wait(in_flight, timeout=timeout, return_when=futures.FIRST_COMPLETED)
+        for future, i in pending.items():
+            if not future.done() or future.cancelled():
+                continue
+            error = future.exception()
+            if error is None:
+                results[i] = future.result()
+            else:
+                debug_write("Plan {} failed in a worker:\n{}".format(i, "".join(traceback.format_exception(type(error), error, error.__traceback__))))
+        return results
+
+    def best_plan(self, game_state, plans, deadline, enemy_deploys=None):
+        """Picks the plan with the most breaches, then the most damage dealt, then the fewest bits spent
+
+        Args:
+            * game_state: The GameState the plans start from, it is not modified
+            * plans: A list of plans, each a list of (unit_type, location, num) deploys
+            * deadline: The time.time() value by which a decision is needed
+            * enemy_deploys: A list of (unit_type, location, num) information units the opponent is expected to deploy
+
+        Returns:
+            The best plan and its result, or (None, None) if no plan finished in time
+
+        """
+        best = (None, None)
+        for plan, result in zip(plans, self.evaluate(game_state, plans, deadline, enemy_deploys)):
+            if result is None:
+                continue
+            key = (result["breaches"], result["damage_dealt"], -result["bits_spent"])
+            if best[1] is None or key > (best[1]["breaches"], best[1]["damage_dealt"], -best[1]["bits_spent"]):
+                best = (plan, result)
+        return best
+
+    def shutdown(self):
+        """Stops the worker processes
+
+        """
+        if self._pool is not None:
+            self._finalizer()
+            self._pool = None
+            self._finalizer = None
+            self._in_flight = set()
@@ -0,0 +1,180 @@
+import math
+
+ARENA_SIZE = 28
+HALF_ARENA = ARENA_SIZE // 2
+
+_compiled_config = None
+_compiled_table = None
+
+
+def _in_arena_bounds(x, y):
+    if y < HALF_ARENA:
+        return HALF_ARENA - 1 - y <= x <= HALF_ARENA + y
+    return y - HALF_ARENA <= x <= ARENA_SIZE - 1 - (y - HALF_ARENA)
+
+
+class RangeTable:
+    """Precomputed in-range locations for unit ranges.
+
+    For each radius we keep the relative offsets of every location within range,
+    ordered like GameMap.get_locations_in_range, together with their distance from
+    the centre. The offsets are then clipped to the arena diamond once per centre
+    and cached, so a lookup is a dictionary access.
+
+    Locations are [x, y] lists shared between lookups, do not modify them.
+
+    Attributes:
+        * offsets (dict): Maps a radius to a list of (dx, dy, distance) tuples
+
+    """
+
+    def __init__(self, config):
+        """ Compiles the tables for every unit range in config
+
+        Args:
+            * config (JSON): A json object containing information about the game
+
+        """
+        self.offsets = {}
+        self._locations = [[x, y] for x in range(ARENA_SIZE) for y in range(ARENA_SIZE)]
+        self._in_arena = [_in_arena_bounds(x, y) for x in range(ARENA_SIZE) for y in range(ARENA_SIZE)]
+        self._clipped = {}
+        self._distances = {}
+        for unit_info in config["unitInformation"]:
+            if "range" in unit_info:
+                self.__compile(unit_info["range"])
+
+    def __compile(self, radius):
+        """
+        Builds the offsets for a radius and clips them for every centre in the arena.
+        """
+        search_radius = math.ceil(radius)
+        offsets = []
+        for dx in range(-search_radius, search_radius + 1):
+            for dy in range(-search_radius, search_radius + 1):
+                # A unit with a given range affects all locations who's centers are within that range + 0.51
+                distance = math.sqrt(dx ** 2 + dy ** 2)
+                if distance < radius + 0.51:
+                    offsets.append((dx, dy, distance))
+        self.offsets[radius] = offsets
+        for index, in_arena in enumerate(self._in_arena):
+            if in_arena:
+                self.__clip(radius, index)
+
+    def __clip(self, radius, index):
+        x, y = divmod(index, ARENA_SIZE)
+        cells = []
+        for dx, dy, _ in self.offsets[radius]:
+            i, j = x + dx, y + dy
+            if 0 <= i < ARENA_SIZE and 0 <= j < ARENA_SIZE and self._in_arena[i * ARENA_SIZE + j]:
+                cells.append(i * ARENA_SIZE + j)
+        self._clipped[radius, index] = cells
+        return cells
+
+    def cell_indices_in_range(self, location, radius):
+        """Gets the cell indices (x * ARENA_SIZE + y) of all locations in range of a location
+
+        Args:
+            * location: The center of the range
+            * radius: The radius of the range
+
+        Returns:
+            A list of cell indices, do not modify it
+
+        """
+        x, y = int(location[0]), int(location[1])
+        if not (0 <= x < ARENA_SIZE and 0 <= y < ARENA_SIZE):
+            if radius not in self.offsets:
+                self.__compile(radius)
+            return list(self.__offset_cells(x, y, radius))
+        cells = self._clipped.get((radius, x * ARENA_SIZE + y))
+        if cells is None:
+            if radius not in self.offsets:
+                self.__compile(radius)
+            cells = self._clipped.get((radius, x * ARENA_SIZE + y)) or self.__clip(radius, x * ARENA_SIZE + y)
+        return cells
+
+    def __offset_cells(self, x, y, radius):
+        """
+        Cells in range of a centre outside the array bounds. Not cached.
+        """
+        for dx, dy, _ in self.offsets[radius]:
+            i, j = x + dx, y + dy
+            if 0 <= i < ARENA_SIZE and 0 <= j < ARENA_SIZE and self._in_arena[i * ARENA_SIZE + j]:
+                yield i * ARENA_SIZE + j
+
+    def locations_in_range(self, location, radius):
+        """Gets locations in a circular area around a location, like GameMap.get_locations_in_range
+
+        Args:
+            * location: The center of our search area
+            * radius: The radius of our search area
+
+        Returns:
+            The locations that are within our search area
+
+        """
+        locations = self._locations
+        return [locations[index] for index in self.cell_indices_in_range(location, radius)]
+
+    def cell_distances_in_range(self, location, radius):
+        """Gets the cells in range of a location together with their distance from it
+
+        Args:
+            * location: The center of the range
+            * radius: The radius of the range
+
+        Returns:
+            A list of (cell index, distance) in the order of cell_indices_in_range, do not modify it
+
+        """
+        x, y = int(location[0]), int(location[1])
+        key = (radius, x, y)
+        cells = self._distances.get(key)
+        if cells is None:
+            if radius not in self.offsets:
+                self.__compile(radius)
+            cells = []
+            for dx, dy, distance in self.offsets[radius]:
+                i, j = x + dx, y + dy
+                if 0 <= i < ARENA_SIZE and 0 <= j < ARENA_SIZE and self._in_arena[i * ARENA_SIZE + j]:
+                    cells.append((i * ARENA_SIZE + j, distance))
+            self._distances[key] = cells
+        return cells
+
+    def cell_indices_in_range_batch(self, centres, radius):
+        """Gets the in-range cells for many centres at once
+
+        Args:
+            * centres: A list of locations
+            * radius: The radius around each centre
+
+        Returns:
+            Two parallel lists (centre_indices, cell_indices). centre_indices[k] is the position in centres of the
+            centre whose range contains cell_indices[k].
+
+        """
+        centre_indices = []
+        cell_indices = []
+        for centre_index, centre in enumerate(centres):
+            cells = self.cell_indices_in_range(centre, radius)
+            centre_indices.extend([centre_index] * len(cells))
+            cell_indices.extend(cells)
+        return centre_indices, cell_indices
+
+
+def get_range_table(config):
+    """Gets the RangeTable for a config, compiling it on first use
+
+    Args:
+        * config (JSON): A json object containing information about the game
+
+    Returns:
+        The RangeTable shared by everything using this config
+
+    """
+    global _compiled_config, _compiled_table
+    if _compiled_config is not config:
+        _compiled_table = RangeTable(config)
+        _compiled_config = config
+    return _compiled_table
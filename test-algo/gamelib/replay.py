@@ -0,0 +1,263 @@
+"""
+Recording matches and replaying them offline.
+
+A recording is a text file with one engine message per line, in the order
+the algo received them: the config first, then every turn state and action
+frame. That is exactly what the engine writes to the algo's stdin, so a
+recording can also be piped straight into an algo.
+
+To record a match, set the ALGO_RECORD environment variable to a file path
+before the engine starts the algo. To replay it:
+
+    python -m gamelib.replay match.txt
+
+from the algo's directory. Every turn is run through a fresh AlgoStrategy,
+and the turn commands and per-turn latency are reported.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+from . import game_state as game_state_module
+from .binary_replay import BinaryReplay, is_binary_replay
+
+RECORD_ENVIRONMENT_VARIABLE = "ALGO_RECORD"
+
+
+class MatchRecorder:
+    """Writes every message an algo receives to a recording file.
+
+    attach wraps the algo's on_game_start, on_turn and on_action_frame, so the
+    messages are saved before the algo sees them. Lines are flushed as they are
+    written, so a crashed or timed out algo still leaves a usable recording.
+
+    """
+
+    def __init__(self, path):
+        """ Opens the recording file
+
+        Args:
+            * path: The file to write, it is overwritten
+
+        """
+        self.path = path
+        self._file = open(path, "w")
+
+    def attach(self, algo):
+        """Starts recording the messages passed to an algo
+
+        Args:
+            * algo: An AlgoCore instance, typically your AlgoStrategy
+
+        Returns:
+            The algo, for chaining
+
+        """
+        on_game_start = algo.on_game_start
+        on_turn = algo.on_turn
+        on_action_frame = algo.on_action_frame
+
+        def recorded_game_start(config):
+            self.write(json.dumps(config))
+            on_game_start(config)
+
+        def recorded_turn(turn_state):
+            self.write(turn_state)
+            on_turn(turn_state)
+
+        def recorded_action_frame(turn_string):
+            self.write(turn_string)
+            on_action_frame(turn_string)
+
+        algo.on_game_start = recorded_game_start
+        algo.on_turn = recorded_turn
+        algo.on_action_frame = recorded_action_frame
+        return algo
+
+    def write(self, message):
+        """Appends one message to the recording
+
+        Args:
+            * message: A config, turn state or action frame string
+
+        """
+        self._file.write(message.strip() + "\n")
+        self._file.flush()
+
+    def close(self):
+        """Closes the recording file
+
+        """
+        self._file.close()
+
+
+def record_from_environment(algo):
+    """Attaches a MatchRecorder if the ALGO_RECORD environment variable names a file
+
+    Args:
+        * algo: An AlgoCore instance
+
+    Returns:
+        The MatchRecorder, or None if recording is off
+
+    """
+    path = os.environ.get(RECORD_ENVIRONMENT_VARIABLE)
+    if not path:
+        return None
+    recorder = MatchRecorder(path)
+    recorder.attach(algo)
+    return recorder
+
+
+def load_recording(path):
+    """Reads a recording
+
+    Args:
+        * path: A file written by MatchRecorder, or a binary replay from gamelib.binary_replay
+
+    Returns:
+        (config, messages), the parsed config and a list of (state_type, message) for the turn states and
+        action frames. state_type is 0 for a turn state, 1 for an action frame and 2 for the end of the game.
+
+    """
+    if is_binary_replay(path):
+        with BinaryReplay(path) as replay:
+            return replay.config, [(replay.info(position)[0], replay.message_json(position)) for position in range(len(replay))]
+    with open(path) as recording:
+        lines = [line.strip() for line in recording if line.strip()]
+    if not lines:
+        raise ValueError("{} is an empty recording".format(path))
+    config = json.loads(lines[0])
+    messages = []
+    for line in lines[1:]:
+        turn_info = game_state_module._decode_field(line, "turnInfo")
+        messages.append((int(turn_info[0]), line))
+    return config, messages
+
+
+def replay_match(path, algo_class, seed=None, action_frames=True):
+    """Replays a recording through a new algo in this process
+
+    The commands the algo sends are captured instead of written to stdout.
+
+    Args:
+        * path: A file written by MatchRecorder
+        * algo_class: The AlgoCore subclass to replay, called without arguments
+        * seed: Seed for the random module after the algo is created, so replays are repeatable
+        * action_frames: Whether to pass the recorded action frames to on_action_frame
+
+    Returns:
+        A list with one dict per turn holding the turn number, the build and deploy commands,
+        the seconds spent in on_turn and the seconds spent in the action frames that followed it
+
+    """
+    config, messages = load_recording(path)
+    algo = algo_class()
+    if seed is not None:
+        random.seed(seed)
+
+    commands = []
+    send_command = game_state_module.send_command
+    game_state_module.send_command = commands.append
+    turns = []
+    try:
+        algo.on_game_start(config)
+        for state_type, message in messages:
+            if state_type == 0:
+                del commands[:]
+                start = time.perf_counter()
+                algo.on_turn(message)
+                elapsed = time.perf_counter() - start
+                turn_info = game_state_module._decode_field(message, "turnInfo")
+                build, deploy = (json.loads(command) for command in (commands + ["[]", "[]"])[:2])
+                turns.append({"turn": int(turn_info[1]), "build": build, "deploy": deploy, "seconds": elapsed, "frame_seconds": 0.0})
+            elif state_type == 1 and action_frames:
+                start = time.perf_counter()
+                algo.on_action_frame(message)
+                if turns:
+                    turns[-1]["frame_seconds"] += time.perf_counter() - start
+            elif state_type == 2:
+                break
+    finally:
+        game_state_module.send_command = send_command
+    return turns
+
+
+def latency_summary(turns):
+    """Summarizes the on_turn latency of a replay
+
+    Args:
+        * turns: The list returned by replay_match
+
+    Returns:
+        A dict with the number of turns and the mean, median, 95th percentile and max seconds per turn
+
+    """
+    seconds = sorted(turn["seconds"] for turn in turns)
+    if not seconds:
+        return {"turns": 0, "mean": 0.0, "median": 0.0, "p95": 0.0, "max": 0.0}
+    return {
+        "turns": len(seconds),
+        "mean": sum(seconds) / len(seconds),
+        "median": seconds[len(seconds) // 2],
+        "p95": seconds[min(len(seconds) - 1, int(len(seconds) * 0.95))],
+        "max": seconds[-1],
+    }
+
+
+def compare_commands(turns, expected):
+    """Finds the turns whose commands differ from an earlier replay
+
+    Args:
+        * turns: The list returned by replay_match
+        * expected: A list saved from an earlier replay_match
+
+    Returns:
+        The turn numbers whose build or deploy commands differ
+
+    """
+    expected_by_turn = {turn["turn"]: turn for turn in expected}
+    changed = []
+    for turn in turns:
+        old = expected_by_turn.get(turn["turn"])
+        if old is None or old["build"] != turn["build"] or old["deploy"] != turn["deploy"]:
+            changed.append(turn["turn"])
+    return changed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded match through AlgoStrategy and report turn latency.")
+    parser.add_argument("recording", help="A file recorded with ALGO_RECORD, or a binary replay")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the strategy")
+    parser.add_argument("--no-frames", action="store_true", help="Do not replay the action frames")
+    parser.add_argument("--save", help="Write the emitted commands and timings to this json file")
+    parser.add_argument("--compare", help="Report turns whose commands differ from this saved json file")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, os.getcwd())
+    from algo_strategy import AlgoStrategy
+
+    turns = replay_match(args.recording, AlgoStrategy, args.seed, not args.no_frames)
+    for turn in turns:
+        print("turn {:3d}  {:8.2f} ms  frames {:8.2f} ms  build {:3d}  deploy {:3d}".format(
+            turn["turn"], turn["seconds"] * 1000, turn["frame_seconds"] * 1000, len(turn["build"]), len(turn["deploy"])))
+    summary = latency_summary(turns)
+    print("{} turns, mean {:.2f} ms, median {:.2f} ms, p95 {:.2f} ms, max {:.2f} ms".format(
+        summary["turns"], summary["mean"] * 1000, summary["median"] * 1000, summary["p95"] * 1000, summary["max"] * 1000))
+
+    if args.save:
+        with open(args.save, "w") as saved:
+            json.dump(turns, saved)
+    if args.compare:
+        with open(args.compare) as saved:
+            changed = compare_commands(turns, json.load(saved))
+        print("commands changed on turns: {}".format(changed) if changed else "commands unchanged")
+        return 1 if changed else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
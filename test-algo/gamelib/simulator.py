@@ -0,0 +1,373 @@
+import copy
+
+from .game_map import GameMap
+from .range_table import get_range_table
+from .targeting import TargetResolver
+from .unit_spec import get_unit_specs
+from .unit_pool import get_unit_pool
+
+# Indices into config["unitInformation"], matching UNIT_TYPE_TO_INDEX in game_state
+ENCRYPTOR_INDEX = 1
+DESTRUCTOR_INDEX = 2
+
+
+def _copy_state(game_state):
+    """
+    Returns a shallow copy of game_state with its own list based GameMap holding copies of every unit,
+    so the simulation can move and destroy units without touching the original. Nothing that can change
+    is shared: the resources, stacks and journal are the copy's own. The unit copies are taken from the
+    UnitPool and listed in the copy's _pooled_units, so release_units hands them back. An array board is
+    read from its arrays, without building its cells.
+    """
+    state = copy.copy(game_state)
+    state.array_board = False
+    state.game_map = GameMap(game_state.config)
+    state.game_map.enable_warnings = False
+    state.enable_warnings = False
+    state._path_cache = {}
+    state._path_fields = (None, {})
+    state._layout_fingerprint = None
+    state._placement_masks = None
+    state._influence_map = None
+    state._occupancy_index = None
+    state._player_resources = [dict(resources) for resources in game_state._player_resources]
+    state._build_stack = list(game_state._build_stack)
+    state._deploy_stack = list(game_state._deploy_stack)
+    state._shared_turn_data = False
+    state._journal = None
+    state._savepoints = []
+    state._forks = None
+    state._pooled_units = []
+    state.parent = None
+
+    acquire = get_unit_pool(game_state.config).acquire
+    pooled = state._pooled_units
+    source = game_state.game_map
+    size = game_state.ARENA_SIZE
+    if game_state.array_board:
+        shorthands = [spec.shorthand for spec in game_state.unit_specs.specs]
+        mobile_units = source.mobile_units
+        for location in source:
+            x, y = location
+            index = x * size + y
+            cell = state.game_map[location]
+            type_index = source.unit_types[index]
+            if type_index >= 0:
+                unit = acquire(shorthands[type_index], source.owners[index], source.stabilities[index], x, y)
+                unit.pending_removal = source.pending_removal[index]
+                cell.append(unit)
+            for type_index, player_index, stability in mobile_units.get(index, ()):
+                cell.append(acquire(shorthands[type_index], player_index, stability, x, y))
+            pooled.extend(cell)
+    else:
+        for location in source:
+            cell = state.game_map[location]
+            for unit in source[location]:
+                copied = acquire(unit.unit_type, unit.player_index, unit.stability, unit.x, unit.y)
+                copied.pending_removal = unit.pending_removal
+                cell.append(copied)
+            pooled.extend(cell)
+    return state
+
+
+class _Mover:
+    """
+    Simulation bookkeeping for one information unit.
+    """
+    def __init__(self, unit, unit_id, target_edge):
+        self.unit = unit
+        self.id = unit_id
+        self.target_edge = target_edge
+        self.path = None
+        self.path_version = -1
+        self.path_index = 0
+        self.progress = 0.0
+        self.steps = 0
+        self.finished = False
+
+
+class ActionSimulator:
+    """Plays out an action phase locally, frame by frame.
+
+    The simulation starts from the board of a GameState, including the units
+    placed this turn with attempt_spawn (the pending build and deploy stacks),
+    plus any enemy deploys you want to test against. Each frame, encryptors
+    shield friendly information units, information units move along the path
+    given by find_path_to_edge, every unit that can attack picks a target like
+    GameState.get_target would and deals its damage, and destroyed units are removed.
+    Units that reach their target edge breach, and units whose path ends
+    elsewhere self destruct.
+
+    The original GameState is never modified.
+
+    Attributes:
+        * frame (int): The number of frames simulated so far
+        * health (list): Remaining health of [you, your opponent]
+        * breaches (list): Number of information units that scored, by owning player
+        * damage_dealt (list): Damage dealt to enemy firewalls, by attacking player
+        * units_lost (list): Number of units destroyed, by owning player
+
+    """
+
+    def __init__(self, game_state, enemy_deploys=None):
+        """ Sets up the simulated board
+
+        Args:
+            * game_state: The GameState to simulate. Units pending in its deploy stack are already on its map.
+            * enemy_deploys: A list of (unit_type, location, num) information units the opponent deploys
+
+        """
+        self.config = game_state.config
+        self.state = _copy_state(game_state)
+        self.game_map = self.state.game_map
+        self.range_table = get_range_table(self.config)
+        self.unit_specs = get_unit_specs(self.config)
+        self.frame = 0
+        self.health = [game_state.my_health, game_state.enemy_health]
+        self.breaches = [0, 0]
+        self.damage_dealt = [0.0, 0.0]
+        self.units_lost = [0, 0]
+
+        self._type_index = {spec.shorthand: spec.index for spec in self.unit_specs.specs}
+        mechanics = self.config.get("mechanics", {})
+        self._self_destruct_steps = mechanics.get("stepsRequiredSelfDestruct", 5)
+        self._self_destruct_radius = mechanics.get("selfDestructRadius", 1.5)
+        self._encryptor_range = self.unit_specs.specs[ENCRYPTOR_INDEX].range
+        self._shield_amount = self.unit_specs.specs[ENCRYPTOR_INDEX].shield_amount
+
+        self._ids = {}
+        self._next_id = 0
+        self._layout_version = 0
+        self._shielded = set()
+
+        for unit_type, location, num in enemy_deploys or ():
+            for _ in range(num):
+                self.game_map.add_unit(unit_type, location, 1)
+
+        self.firewalls = []
+        self.movers = []
+        for location in self.game_map:
+            for unit in self.game_map[location]:
+                if unit.stationary:
+                    self.firewalls.append(unit)
+                else:
+                    self.movers.append(_Mover(unit, self.__unit_id(unit), self.state.get_target_edge(location)))
+        self._pending_spawns = list(self.movers)
+
+    def __unit_id(self, unit):
+        unit_id = self._ids.get(id(unit))
+        if unit_id is None:
+            self._next_id += 1
+            unit_id = str(self._next_id)
+            self._ids[id(unit)] = unit_id
+        return unit_id
+
+    def __event_player(self, unit):
+        # Action frames use 1 for yourself and 2 for your opponent
+        return unit.player_index + 1
+
+    def finished(self):
+        """Checks whether the action phase is over
+
+        Returns:
+            True once no information units are left on the board
+
+        """
+        return not self.movers
+
+    def run(self, max_frames=500):
+        """Simulates frames until the action phase ends
+
+        Once the action phase is over, the simulated units go back to the UnitPool. The totals and
+        events stay valid, but read firewalls and game_map before building another GameState.
+
+        Args:
+            * max_frames: The maximum number of frames to simulate
+
+        Returns:
+            A list with the events dict of every simulated frame, in the same shape as the "events" of action frames
+
+        """
+        frames = []
+        while not self.finished() and self.frame < max_frames:
+            frames.append(self.step())
+        if self.finished():
+            self.release_units()
+        return frames
+
+    def release_units(self):
+        """Hands the units of the simulated board back to the UnitPool. They must not be used afterwards.
+
+        """
+        self.state.release_units()
+
+    def step(self):
+        """Simulates a single frame
+
+        Returns:
+            The events of the frame, in the same shape as the "events" of action frames
+
+        """
+        events = {"selfDestruct": [], "breach": [], "damage": [], "shield": [], "move": [], "spawn": [], "death": [], "attack": [], "melee": []}
+        for mover in self._pending_spawns:
+            unit = mover.unit
+            events["spawn"].append([[unit.x, unit.y], self._type_index[unit.unit_type], mover.id, self.__event_player(unit)])
+        self._pending_spawns = []
+
+        self.__shield(events)
+        self.__move(events)
+        self.__attack(events)
+        self.__remove_dead(events)
+        self.frame += 1
+        return events
+
+    def __shield(self, events):
+        size = self.state.ARENA_SIZE
+        movers_by_cell = {}
+        for mover in self.movers:
+            movers_by_cell.setdefault(mover.unit.x * size + mover.unit.y, []).append(mover)
+        for source in self.firewalls:
+            if self._type_index[source.unit_type] != ENCRYPTOR_INDEX:
+                continue
+            source_id = self.__unit_id(source)
+            for index in self.range_table.cell_indices_in_range([source.x, source.y], self._encryptor_range):
+                for mover in movers_by_cell.get(index, ()):
+                    unit = mover.unit
+                    if unit.player_index != source.player_index or (source_id, mover.id) in self._shielded:
+                        continue
+                    self._shielded.add((source_id, mover.id))
+                    unit.stability += self._shield_amount
+                    events["shield"].append([[source.x, source.y], [unit.x, unit.y], self._shield_amount, ENCRYPTOR_INDEX, source_id, mover.id, self.__event_player(source)])
+
+    def __move(self, events):
+        for mover in self.movers:
+            unit = mover.unit
+            mover.progress += unit.speed
+            if mover.progress < 1:
+                continue
+            mover.progress -= 1
+            if mover.path is None or mover.path_version != self._layout_version:
+                mover.path = self.state.find_path_to_edge([unit.x, unit.y], mover.target_edge)
+                mover.path_version = self._layout_version
+                mover.path_index = 0
+            if mover.path_index + 1 < len(mover.path):
+                mover.path_index += 1
+                x, y = mover.path[mover.path_index]
+                events["move"].append([[unit.x, unit.y], [x, y], [], self._type_index[unit.unit_type], mover.id, self.__event_player(unit)])
+                self.game_map[unit.x, unit.y].remove(unit)
+                unit.x, unit.y = x, y
+                self.game_map[x, y].append(unit)
+                mover.steps += 1
+            if mover.path_index + 1 >= len(mover.path):
+                self.__finish_path(mover, events)
+
+    def __finish_path(self, mover, events):
+        """
+        Scores a unit standing on its target edge, otherwise makes it self destruct.
+        Either way the unit leaves the board.
+        """
+        unit = mover.unit
+        location = [unit.x, unit.y]
+        unit_type_index = self._type_index[unit.unit_type]
+        if location in self.game_map.get_edge_locations(mover.target_edge):
+            damage = self.unit_specs[unit.unit_type].damage_to_player
+            self.health[1 - unit.player_index] -= damage
+            self.breaches[unit.player_index] += 1
+            events["breach"].append([location, damage, unit_type_index, mover.id, self.__event_player(unit)])
+        else:
+            targets = []
+            if mover.steps >= self._self_destruct_steps:
+                for target_location in self.range_table.locations_in_range(location, self._self_destruct_radius):
+                    for target in self.game_map[target_location]:
+                        if target.stationary and target.player_index != unit.player_index:
+                            targets.append(target_location)
+                            self.__deal_damage(unit, target, unit.max_stability, events)
+            events["selfDestruct"].append([location, targets, unit.max_stability, unit_type_index, mover.id, self.__event_player(unit)])
+            events["death"].append([location, unit_type_index, mover.id, self.__event_player(unit), False])
+            self.units_lost[unit.player_index] += 1
+        self.game_map[unit.x, unit.y].remove(unit)
+        mover.finished = True
+
+    def __attack(self, events):
+        hits = []
+        size = self.state.ARENA_SIZE
+        mover_cells = [set(), set()]
+        for mover in self.movers:
+            if not mover.finished:
+                mover_cells[mover.unit.player_index].add(mover.unit.x * size + mover.unit.y)
+        attackers = []
+        for firewall in self.firewalls:
+            # Destructors only shoot information units, so skip the ones with nothing in range
+            if self._type_index[firewall.unit_type] == DESTRUCTOR_INDEX:
+                enemy_cells = mover_cells[1 - firewall.player_index]
+                if any(index in enemy_cells for index in self.range_table.cell_indices_in_range([firewall.x, firewall.y], firewall.range)):
+                    attackers.append(firewall)
+        movers = [mover.unit for mover in self.movers if not mover.finished]
+        attackers += movers
+        # Every unit picks its target from the same board, so it is summarized once for the frame
+        resolver = TargetResolver(self.state, self.firewalls + movers)
+        for unit, target in zip(attackers, resolver.resolve_all(attackers)):
+            if target is None or (unit.stationary and target.stationary):
+                continue
+            spec = self.unit_specs[unit.unit_type]
+            if unit.stationary:
+                damage = spec.damage
+            elif target.stationary:
+                damage = spec.damage_f
+            else:
+                damage = spec.damage_i
+            if damage > 0:
+                hits.append((unit, target, damage))
+        for unit, target, damage in hits:
+            events["attack"].append([[unit.x, unit.y], [target.x, target.y], damage, self._type_index[unit.unit_type], self.__unit_id(unit), self.__unit_id(target), self.__event_player(unit)])
+            self.__deal_damage(unit, target, damage, events)
+
+    def __deal_damage(self, attacker, target, damage, events):
+        target.stability -= damage
+        if target.stationary:
+            self.damage_dealt[attacker.player_index] += damage
+        events["damage"].append([[target.x, target.y], damage, self._type_index[target.unit_type], self.__unit_id(target), self.__event_player(target)])
+
+    def __remove_dead(self, events):
+        firewalls = []
+        for unit in self.firewalls:
+            if unit.stability > 0:
+                firewalls.append(unit)
+                continue
+            self.game_map[unit.x, unit.y].remove(unit)
+            self.units_lost[unit.player_index] += 1
+            events["death"].append([[unit.x, unit.y], self._type_index[unit.unit_type], self.__unit_id(unit), self.__event_player(unit), False])
+            # Information units reroute around the hole on their next move
+            self._layout_version += 1
+            self.state.invalidate_path_cache()
+        self.firewalls = firewalls
+
+        movers = []
+        for mover in self.movers:
+            unit = mover.unit
+            if mover.finished:
+                continue
+            if unit.stability > 0:
+                movers.append(mover)
+                continue
+            self.game_map[unit.x, unit.y].remove(unit)
+            self.units_lost[unit.player_index] += 1
+            events["death"].append([[unit.x, unit.y], self._type_index[unit.unit_type], mover.id, self.__event_player(unit), False])
+        self.movers = movers
+
+
+def simulate(game_state, enemy_deploys=None, max_frames=500):
+    """Simulates the action phase that would follow the current GameState
+
+    Args:
+        * game_state: The GameState to simulate, including units placed this turn with attempt_spawn
+        * enemy_deploys: A list of (unit_type, location, num) information units the opponent deploys
+        * max_frames: The maximum number of frames to simulate
+
+    Returns:
+        The finished ActionSimulator with its totals. The events of every frame are kept in its frames attribute.
+
+    """
+    simulator = ActionSimulator(game_state, enemy_deploys)
+    simulator.frames = simulator.run(max_frames)
+    return simulator
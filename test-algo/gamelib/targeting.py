@@ -0,0 +1,115 @@
+from .range_table import get_range_table
+
+# Index into config["unitInformation"], matching UNIT_TYPE_TO_INDEX in game_state
+SCRAMBLER_INDEX = 5
+
+
+class TargetResolver:
+    """Picks the targets of many attackers on one board, matching GameState.get_target.
+
+    get_target keeps the first candidate that beats every earlier one on the
+    chain information unit > nearest > lowest stability > lowest y (highest
+    for the enemy) > farthest from the centre column. That is the same as
+    taking the candidate with the smallest key
+    (stationary, distance, stability, y or -y, -x distance), the first one
+    winning ties, with candidates ordered by GameMap.get_locations_in_range
+    and then by their position in the cell.
+
+    Units on the same cell only differ in stability and type, so the board
+    is summarized once into the best mobile and best stationary unit of each
+    player on each occupied cell. Each attacker then only looks those up for
+    the cells in its range, with the distances read from the RangeTable.
+
+    The summary is a snapshot, build a new resolver after units move, spawn or die.
+
+    """
+
+    def __init__(self, game_state, units=None):
+        """ Summarizes the units on the board
+
+        Args:
+            * game_state: The GameState whose board to read
+            * units: Every unit on the board, if the caller already has them. Only their positions are used,
+              the units of each cell are read from game_map so ties are broken in the same order.
+
+        """
+        self.game_map = game_state.game_map
+        self.range_table = get_range_table(game_state.config)
+        self.ARENA_SIZE = game_state.ARENA_SIZE
+        self.HALF_ARENA = game_state.HALF_ARENA
+        self.SCRAMBLER = game_state.config["unitInformation"][SCRAMBLER_INDEX]["shorthand"]
+        self._cells = ({}, {})
+
+        size = self.ARENA_SIZE
+        if units is not None:
+            locations = {unit.x * size + unit.y for unit in units}
+        elif game_state.array_board:
+            locations = {index for index, type_index in enumerate(self.game_map.unit_types) if type_index >= 0}
+            locations.update(index for index, cell in self.game_map.mobile_units.items() if cell)
+        else:
+            locations = None
+        if locations is None:
+            for location in self.game_map:
+                self.__add_cell(location[0] * size + location[1], self.game_map[location])
+        else:
+            for index in locations:
+                self.__add_cell(index, self.game_map[index // size, index % size])
+
+    def __add_cell(self, index, units):
+        """
+        Keeps the first unit with the lowest stability of each player and kind on a cell.
+        """
+        for unit in units:
+            best = self._cells[unit.player_index].get(index)
+            if best is None:
+                best = [None, None]
+                self._cells[unit.player_index][index] = best
+            kind = 1 if unit.stationary else 0
+            if best[kind] is None or unit.stability < best[kind].stability:
+                best[kind] = unit
+
+    def resolve(self, attacking_unit):
+        """Gets the unit an attacker would choose to attack
+
+        Args:
+            * attacking_unit: A unit on this board
+
+        Returns:
+            The unit get_target would return, or None
+
+        """
+        player_index = attacking_unit.player_index
+        enemy_cells = self._cells[1 - player_index]
+        if not enemy_cells:
+            return None
+        mobile_only = attacking_unit.unit_type == self.SCRAMBLER
+        y_sign = 1 if player_index == 0 else -1
+        centre = self.HALF_ARENA - 0.5
+        target = None
+        target_key = None
+        for index, distance in self.range_table.cell_distances_in_range([attacking_unit.x, attacking_unit.y], attacking_unit.range):
+            best = enemy_cells.get(index)
+            if best is None:
+                continue
+            for stationary in (False, True):
+                unit = best[stationary]
+                if unit is None or (stationary and mobile_only):
+                    continue
+                key = (stationary, distance, unit.stability, y_sign * unit.y, -abs(centre - unit.x))
+                if target_key is None or key < target_key:
+                    target = unit
+                    target_key = key
+        return target
+
+    def resolve_all(self, attackers):
+        """Gets the targets of many attackers at once
+
+        Args:
+            * attackers: A list of units on this board
+
+        Returns:
+            A list with the target of each attacker, None where there is nothing to attack
+
+        """
+        resolve = self.resolve
+        return [resolve(unit) for unit in attackers]
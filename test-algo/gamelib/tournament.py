@@ -0,0 +1,522 @@
+"""
+Playing strategy variants against each other locally.
+
+A variant is AlgoStrategy with some of its tuning constants overridden. The
+variants are read from a json file mapping each name to the class attributes
+it changes, for example:
+
+    {"baseline": {}, "patient": {"ATTACK_BITS_RANGE": [18, 25]}}
+
+Every pair of variants plays a number of games, alternating sides, in
+parallel worker processes. The games are played by LocalEngine, a simplified
+stand-in for the game engine that runs both algos in the worker and plays
+the action phases with the ActionSimulator, so no engine or network is
+needed. The result of each game is appended to a json lines file as soon as
+it finishes, and the win rates are reported with 95% confidence intervals:
+
+    python -m gamelib.tournament config.json variants.json --games 20 --workers 8 --results results.jsonl
+
+from the algo's directory. The config can be a json file or a recording, whose first line is the config.
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+import traceback
+
+from . import game_state as game_state_module
+from .game_state import GameState
+from .simulator import ActionSimulator
+from .unit_spec import get_unit_specs
+
+ARENA_SIZE = 28
+HALF_ARENA = ARENA_SIZE // 2
+MAX_TURNS = 100
+MAX_FRAMES = 500
+# Indices into config["unitInformation"], matching UNIT_TYPE_TO_INDEX in game_state
+REMOVE_INDEX = 6
+# The positions of the locations in each kind of action frame event, the targets of selfDestruct are a list of locations
+_EVENT_LOCATIONS = {
+    "selfDestruct": (0, 1), "shield": (0, 1), "move": (0, 1), "attack": (0, 1), "melee": (0, 1),
+    "breach": (0,), "damage": (0,), "spawn": (0,), "death": (0,),
+}
+# The position of the player, the last one unless listed here
+_EVENT_PLAYER = {"death": 3}
+
+
+def _flip(location):
+    """
+    Turns a location around the centre of the arena, between the two players' points of view.
+    """
+    return [ARENA_SIZE - 1 - location[0], ARENA_SIZE - 1 - location[1]]
+
+
+def _in_arena_bounds(x, y):
+    if y < HALF_ARENA:
+        return HALF_ARENA - 1 - y <= x <= HALF_ARENA + y
+    return y - HALF_ARENA <= x <= ARENA_SIZE - 1 - (y - HALF_ARENA)
+
+
+def _on_own_edge(x, y):
+    return y < HALF_ARENA and (y == HALF_ARENA - 1 - x or y == x - HALF_ARENA)
+
+
+def _mirror_events(events):
+    """
+    Converts the events of an action frame to the other player's point of view:
+    locations are turned around and players 1 and 2 are swapped.
+    """
+    mirrored = {}
+    for kind, entries in events.items():
+        positions = _EVENT_LOCATIONS.get(kind, ())
+        player = _EVENT_PLAYER.get(kind, -1)
+        converted = []
+        for entry in entries:
+            entry = list(entry)
+            for position in positions:
+                value = entry[position]
+                if kind == "selfDestruct" and position == 1:
+                    entry[position] = [_flip(location) for location in value]
+                elif value:
+                    entry[position] = _flip(value)
+            entry[player] = 3 - entry[player]
+            converted.append(entry)
+        mirrored[kind] = converted
+    return mirrored
+
+
+class LocalEngine:
+    """A simplified stand-in for the game engine that plays two algos in this process.
+
+    The board is kept from the first player's point of view. Each turn both
+    algos get a turn state from their own point of view, the second player's
+    board being turned around as the real engine does, and their commands are
+    captured instead of written to stdout. Valid builds, removals and deploys
+    are applied, the action phase is played by the ActionSimulator, and its
+    frames are passed to on_action_frame with only the stats and events filled in.
+
+    Resources follow the config: cores per round, cores for damage dealt,
+    bits per round growing every turnIntervalForBitSchedule turns, bit decay,
+    the bit cap and the refund for removed firewalls. Anything the simulator
+    does not model, like the engine's timing rules, is left out, so use it
+    to compare strategies, not to predict real matches.
+
+    Attributes:
+        * turn (int): The number of turns played so far
+        * health (list): Remaining health of [first player, second player]
+        * cores (list): Cores of [first player, second player]
+        * bits (list): Bits of [first player, second player]
+
+    """
+
+    def __init__(self, config, algos, max_turns=MAX_TURNS, action_frames=True):
+        """ Sets up a new game
+
+        Args:
+            * config (JSON): A json object containing information about the game
+            * algos: The two AlgoCore instances to play, first player first. on_game_start is called on both.
+            * max_turns: The game is decided on health after this many turns
+            * action_frames: Whether to pass the simulated action frames to on_action_frame
+
+        """
+        self.config = config
+        self.algos = algos
+        self.max_turns = max_turns
+        self.action_frames = action_frames
+        self.unit_specs = get_unit_specs(config)
+        self._type_index = {spec.shorthand: spec.index for spec in self.unit_specs.specs}
+        resources = config["resources"]
+        self.resources = resources
+        self.refund = config.get("mechanics", {}).get("destroyOwnUnitRefund", 0.5)
+        self.turn = 0
+        self.health = [float(resources["startingHP"])] * 2
+        self.cores = [float(resources["startingCores"])] * 2
+        self.bits = [float(resources["startingBits"])] * 2
+        # Flat index x * ARENA_SIZE + y of each firewall -> [type index, owner, stability, id, pending removal]
+        self._firewalls = {}
+        self._deploys = []
+        self._next_id = 0
+        for algo in algos:
+            algo.on_game_start(config)
+
+    def __unit_id(self):
+        self._next_id += 1
+        return str(self._next_id)
+
+    def __stats(self, player_index):
+        return [self.health[player_index], self.cores[player_index], self.bits[player_index], 0]
+
+    def __state_string(self, player_index, deploys=()):
+        """
+        Serializes the board from one player's point of view, like the turn states of the engine.
+        """
+        units = [[[] for _ in range(REMOVE_INDEX + 1)] for _ in range(2)]
+        for index, (type_index, owner, stability, unit_id, pending) in sorted(self._firewalls.items()):
+            location = [index // ARENA_SIZE, index % ARENA_SIZE]
+            if player_index == 1:
+                location = _flip(location)
+            side = units[0 if owner == player_index else 1]
+            side[type_index].append(location + [stability, unit_id])
+            if pending:
+                side[REMOVE_INDEX].append(location + [0.0, unit_id])
+        for type_index, owner, location, unit_id in deploys:
+            if player_index == 1:
+                location = _flip(location)
+            units[0 if owner == player_index else 1][type_index].append(location + [self.unit_specs.specs[type_index].stability, unit_id])
+        return json.dumps({
+            "p1Units": units[0], "p2Units": units[1], "turnInfo": [0, self.turn, -1],
+            "p1Stats": self.__stats(player_index), "p2Stats": self.__stats(1 - player_index)})
+
+    def __collect_commands(self, player_index):
+        """
+        Runs one algo's turn and returns its build and deploy commands, in that player's point of view.
+        """
+        commands = []
+        send_command = game_state_module.send_command
+        game_state_module.send_command = commands.append
+        try:
+            self.algos[player_index].on_turn(self.__state_string(player_index))
+        finally:
+            game_state_module.send_command = send_command
+        build, deploy = (json.loads(command) for command in (commands + ["[]", "[]"])[:2])
+        return build, deploy
+
+    def __apply_build(self, player_index, build):
+        """
+        Places the firewalls and flags the removals a player can afford, skipping invalid ones like the engine.
+        """
+        for unit_type, x, y in build:
+            x, y = int(x), int(y)
+            type_index = self._type_index.get(unit_type)
+            if type_index is None or not _in_arena_bounds(x, y) or y >= HALF_ARENA:
+                continue
+            location = [x, y] if player_index == 0 else _flip([x, y])
+            index = location[0] * ARENA_SIZE + location[1]
+            firewall = self._firewalls.get(index)
+            if type_index == REMOVE_INDEX:
+                if firewall is not None and firewall[1] == player_index:
+                    firewall[4] = True
+                continue
+            spec = self.unit_specs.specs[type_index]
+            if not spec.stationary or firewall is not None or spec.cost > self.cores[player_index]:
+                continue
+            self.cores[player_index] -= spec.cost
+            self._firewalls[index] = [type_index, player_index, spec.stability, self.__unit_id(), False]
+
+    def __apply_deploy(self, player_index, deploy):
+        """
+        Queues the information units a player can afford on its own edges.
+        """
+        for unit_type, x, y in deploy:
+            x, y = int(x), int(y)
+            type_index = self._type_index.get(unit_type)
+            if type_index is None or type_index == REMOVE_INDEX or not _on_own_edge(x, y):
+                continue
+            spec = self.unit_specs.specs[type_index]
+            location = [x, y] if player_index == 0 else _flip([x, y])
+            if spec.stationary or location[0] * ARENA_SIZE + location[1] in self._firewalls or spec.cost > self.bits[player_index]:
+                continue
+            self.bits[player_index] -= spec.cost
+            self._deploys.append((type_index, player_index, location, self.__unit_id()))
+
+    def __action_phase(self):
+        """
+        Plays out the action phase and keeps the firewalls that survived it.
+        """
+        state = GameState(self.config, self.__state_string(0, self._deploys))
+        state.enable_warnings = False
+        state.game_map.enable_warnings = False
+        simulator = ActionSimulator(state)
+        frames = simulator.run(MAX_FRAMES)
+        self._deploys = []
+
+        surviving = {}
+        for unit in simulator.firewalls:
+            index = unit.x * ARENA_SIZE + unit.y
+            firewall = self._firewalls.get(index)
+            if firewall is not None and unit.stability > 0:
+                firewall[2] = unit.stability
+                surviving[index] = firewall
+        self._firewalls = surviving
+
+        for player_index in range(2):
+            damage_dealt = self.health[1 - player_index] - simulator.health[1 - player_index]
+            self.cores[player_index] += damage_dealt * self.resources.get("coresForPlayerDamage", 0)
+        self.health = [float(health) for health in simulator.health]
+
+        if self.action_frames:
+            for frame, events in enumerate(frames):
+                for player_index, algo in enumerate(self.algos):
+                    algo.on_action_frame(json.dumps({
+                        "turnInfo": [1, self.turn, frame], "p1Stats": self.__stats(player_index),
+                        "p2Stats": self.__stats(1 - player_index), "p1Units": [], "p2Units": [],
+                        "events": events if player_index == 0 else _mirror_events(events)}))
+
+    def __end_round(self):
+        """
+        Removes the firewalls flagged for removal with their refund and hands out the resources of the next turn.
+        """
+        for index, firewall in list(self._firewalls.items()):
+            type_index, owner, stability, unit_id, pending = firewall
+            if pending:
+                spec = self.unit_specs.specs[type_index]
+                self.cores[owner] += spec.cost * self.refund * stability / spec.stability
+                del self._firewalls[index]
+        self.turn += 1
+        resources = self.resources
+        schedule = self.turn // resources.get("turnIntervalForBitSchedule", 10)
+        for player_index in range(2):
+            self.cores[player_index] += resources["coresPerRound"]
+            bits = self.bits[player_index] * (1 - resources.get("bitDecayPerRound", 0))
+            bits += resources["bitsPerRound"] + resources.get("bitGrowthRate", 0) * schedule
+            self.bits[player_index] = round(min(bits, resources.get("maxBits", bits)), 1)
+
+    def play_turn(self):
+        """Plays one turn: both algos submit their commands, then the action phase is played
+
+        Returns:
+            True while the game goes on
+
+        """
+        commands = [self.__collect_commands(player_index) for player_index in range(2)]
+        for player_index, (build, deploy) in enumerate(commands):
+            self.__apply_build(player_index, build)
+        for player_index, (build, deploy) in enumerate(commands):
+            self.__apply_deploy(player_index, deploy)
+        self.__action_phase()
+        self.__end_round()
+        return min(self.health) > 0 and self.turn < self.max_turns
+
+    def play(self):
+        """Plays the game to the end
+
+        Returns:
+            The index of the winning player, or None for a draw
+
+        """
+        while self.play_turn():
+            pass
+        if self.health[0] == self.health[1]:
+            return None
+        return 0 if self.health[0] > self.health[1] else 1
+
+
+def load_config(path):
+    """Reads a game config
+
+    Args:
+        * path: A json config file, or a recording whose first line is the config
+
+    Returns:
+        The parsed config
+
+    """
+    with open(path) as config_file:
+        text = config_file.read()
+    try:
+        return json.loads(text)
+    except ValueError:
+        return json.loads(text.splitlines()[0])
+
+
+def make_variant(base_class, name, overrides):
+    """Makes a strategy class with some class attributes overridden
+
+    Args:
+        * base_class: The strategy class, usually AlgoStrategy
+        * name: The name of the new class
+        * overrides: A dict of class attribute names to their new values
+
+    Returns:
+        A subclass of base_class
+
+    """
+    unknown = [attribute for attribute in overrides if not hasattr(base_class, attribute)]
+    if unknown:
+        raise ValueError("Variant {} sets unknown attributes {}".format(name, unknown))
+    return type(str(name), (base_class,), dict(overrides))
+
+
+def play_match(task):
+    """Plays one game between two variants, the worker function of run_tournament
+
+    Args:
+        * task: A dict with the config, the variants dict, the names of the first and second
+          player's variants, the random seed, the turn limit and whether to capture the algos' debug output
+
+    Returns:
+        A dict with both variant names, the winner's name or None for a draw, the seed,
+        the number of turns, the final health and the seconds the game took. If the game
+        raised, the dict instead has an error with the traceback, and with quiet set the
+        debug output captured during the game under stderr.
+
+    """
+    from algo_strategy import AlgoStrategy
+
+    start = time.perf_counter()
+    names = task["players"]
+    output = io.StringIO()
+    capture = contextlib.redirect_stderr(output) if task["quiet"] else contextlib.nullcontext()
+    try:
+        with capture:
+            algos = [make_variant(AlgoStrategy, name, task["variants"][name])() for name in names]
+            # Both algos share the random module, so seeding once after creating them makes the game repeatable
+            random.seed(task["seed"])
+            engine = LocalEngine(task["config"], algos, task["max_turns"])
+            winner = engine.play()
+    except Exception:
+        return {
+            "players": names, "seed": task["seed"], "error": traceback.format_exc(),
+            "stderr": output.getvalue(), "seconds": time.perf_counter() - start,
+        }
+    return {
+        "players": names, "winner": None if winner is None else names[winner], "seed": task["seed"],
+        "turns": engine.turn, "health": engine.health, "seconds": time.perf_counter() - start,
+    }
+
+
+def _init_worker(path):
+    sys.path.insert(0, path)
+
+
+def run_tournament(config, variants, games, results_path, workers=None, seed=0, max_turns=MAX_TURNS, quiet=True):
+    """Plays every pair of variants against each other in parallel
+
+    Each pair plays games games, swapping sides every game. Results are appended to
+    results_path as json lines as soon as each game ends, so an interrupted tournament
+    keeps the games it finished.
+
+    Args:
+        * config (JSON): A json object containing information about the game
+        * variants: A dict of variant names to their class attribute overrides
+        * games: The number of games per pair of variants
+        * results_path: The json lines file results are appended to
+        * workers: The number of worker processes, one per CPU if None. With 1 the games run in this process.
+        * seed: The seed of the first game, each game gets the next one
+        * max_turns: The turn limit of each game
+        * quiet: Capture the algos' debug output, it is only kept for games that raise
+
+    Returns:
+        The list of game results, as returned by play_match
+
+    """
+    names = sorted(variants)
+    tasks = []
+    for first, second in itertools.combinations(names, 2):
+        for game in range(games):
+            players = [first, second] if game % 2 == 0 else [second, first]
+            tasks.append({"config": config, "variants": variants, "players": players,
+                          "seed": seed + len(tasks), "max_turns": max_turns, "quiet": quiet})
+
+    results = []
+    with open(results_path, "a") as results_file:
+        def save(result):
+            results.append(result)
+            results_file.write(json.dumps(result) + "\n")
+            results_file.flush()
+
+        if workers == 1:
+            _init_worker(os.getcwd())
+            for task in tasks:
+                save(play_match(task))
+        else:
+            with multiprocessing.Pool(workers, _init_worker, (os.getcwd(),)) as pool:
+                for result in pool.imap_unordered(play_match, tasks):
+                    save(result)
+    return results
+
+
+def wilson_interval(successes, trials, z=1.96):
+    """Computes the Wilson score interval of a win rate
+
+    Args:
+        * successes: The number of wins, draws counting as half a win
+        * trials: The number of games
+        * z: The normal quantile of the confidence level, 1.96 for 95%
+
+    Returns:
+        (low, high), (0.0, 1.0) if there were no games
+
+    """
+    if trials == 0:
+        return 0.0, 1.0
+    rate = successes / trials
+    denominator = 1 + z * z / trials
+    centre = (rate + z * z / (2 * trials)) / denominator
+    margin = z * math.sqrt(rate * (1 - rate) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+
+def summarize(results):
+    """Computes the record of every variant
+
+    Args:
+        * results: Game results, as returned by play_match. Games that raised are left out.
+
+    Returns:
+        A list of dicts with the name, games, wins, draws, losses, win rate (draws count as half)
+        and its 95% confidence interval of every variant, best win rate first
+
+    """
+    records = {}
+    for result in results:
+        if "error" in result:
+            continue
+        for name in result["players"]:
+            record = records.setdefault(name, {"name": name, "games": 0, "wins": 0, "draws": 0, "losses": 0})
+            record["games"] += 1
+            if result["winner"] is None:
+                record["draws"] += 1
+            elif result["winner"] == name:
+                record["wins"] += 1
+            else:
+                record["losses"] += 1
+    for record in records.values():
+        score = record["wins"] + record["draws"] / 2
+        record["win_rate"] = score / record["games"]
+        record["interval"] = wilson_interval(score, record["games"])
+    return sorted(records.values(), key=lambda record: (-record["win_rate"], record["name"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play AlgoStrategy variants against each other and report their win rates.")
+    parser.add_argument("config", help="The game config as json, or a recording whose first line is the config")
+    parser.add_argument("variants", help="A json file mapping variant names to the AlgoStrategy attributes they override")
+    parser.add_argument("--games", type=int, default=10, help="Games per pair of variants")
+    parser.add_argument("--workers", type=int, help="Worker processes, one per CPU by default")
+    parser.add_argument("--results", default="tournament.jsonl", help="Append each game result to this json lines file")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the first game")
+    parser.add_argument("--turns", type=int, default=MAX_TURNS, help="Turn limit of each game")
+    parser.add_argument("--verbose", action="store_true", help="Keep the algos' debug output")
+    args = parser.parse_args(argv)
+
+    with open(args.variants) as variants_file:
+        variants = json.load(variants_file)
+    if len(variants) < 2:
+        parser.error("{} needs at least two variants".format(args.variants))
+
+    start = time.perf_counter()
+    results = run_tournament(load_config(args.config), variants, args.games, args.results,
+                             args.workers, args.seed, args.turns, not args.verbose)
+    print("{} games in {:.1f} s, results appended to {}".format(len(results), time.perf_counter() - start, args.results))
+    for result in results:
+        if "error" in result:
+            print("{} vs {} (seed {}) failed, its debug output is in the results:\n{}".format(
+                result["players"][0], result["players"][1], result["seed"], result["error"]))
+    for record in summarize(results):
+        low, high = record["interval"]
+        print("{:20s} {:4d} games  {:4d} W {:4d} D {:4d} L  win rate {:5.1f}%  95% CI [{:5.1f}%, {:5.1f}%]".format(
+            record["name"], record["games"], record["wins"], record["draws"], record["losses"],
+            record["win_rate"] * 100, low * 100, high * 100))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
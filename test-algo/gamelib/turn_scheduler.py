@@ -0,0 +1,153 @@
+import threading
+import time
+
+from .util import debug_write
+from .profiler import profiler
+
+
+class TurnScheduler:
+    """Runs the stages of a turn in priority order within a time budget.
+
+    Stages are functions taking the GameState. After every stage finishes, the
+    build and deploy stacks are saved as the fallback plan. Before the first
+    stage, the fallback is the plan queued with plan_fallback, if any. If the
+    budget runs out, stages that have not started yet are skipped.
+
+    Long stages should poll expired in their loops and return once it is True,
+    so the turn is submitted on time. If a stage is still running at the deadline
+    anyway, a watchdog thread submits the fallback plan so the turn is never lost.
+    The stage itself can't be interrupted and keeps the algo busy until it
+    returns. From then on attempt_spawn and attempt_remove on the GameState warn
+    and do nothing, so the stage can't change what was sent. The turn is only
+    ever submitted once.
+
+    Attributes:
+        * budget (float): Seconds available for this turn
+        * deadline (float): The time.time() value by which the turn is submitted
+        * completed (list): Names of the stages that finished
+        * skipped (list): Names of the stages that were skipped for lack of time
+
+    """
+
+    def __init__(self, game_state, budget=None, safety_margin=0.5):
+        """ Starts the clock for a turn
+
+        Args:
+            * game_state: The GameState of this turn
+            * budget: Seconds available for the turn. Defaults to the soft bot time limit in the config, or 5 seconds.
+            * safety_margin: Seconds kept in reserve to submit before the budget runs out
+
+        """
+        self.game_state = game_state
+        if budget is None:
+            budget = game_state.config.get("timingAndReplay", {}).get("waitTimeBotSoft", 5000) / 1000
+        self.budget = budget
+        self.start_time = time.time()
+        self.deadline = self.start_time + max(0, budget - safety_margin)
+        self.completed = []
+        self.skipped = []
+        self._tasks = []
+        self._fallback = ([], [])
+        self._submitted = False
+        self._lock = threading.Lock()
+
+        # my_time is the time we took to submit the previous turn, in milliseconds
+        if game_state.my_time > budget * 1000:
+            debug_write("Previous turn took {} ms, over the {} s turn budget".format(game_state.my_time, budget))
+
+    def add_task(self, name, function, priority=None):
+        """Adds a stage to the turn
+
+        Args:
+            * name: A name for the stage, used in debug output
+            * function: A function taking the GameState
+            * priority: Stages with lower priority run first. Defaults to running in the order stages are added.
+
+        """
+        if priority is None:
+            priority = len(self._tasks)
+        self._tasks.append((priority, len(self._tasks), name, function))
+
+    def time_left(self):
+        """Gets the time left before the deadline
+
+        Returns:
+            The number of seconds left, negative once the deadline has passed
+
+        """
+        return self.deadline - time.time()
+
+    def expired(self):
+        """Checks whether the deadline has passed
+
+        Returns:
+            True once stages should stop and return
+
+        """
+        return time.time() >= self.deadline
+
+    def plan_fallback(self, function):
+        """Queues a minimal plan on a fork of the GameState and keeps it as the fallback plan
+        until the first stage finishes, so even an overrunning first stage submits something
+
+        Args:
+            * function: A function taking the GameState, it should be quick
+
+        """
+        fork = self.game_state.fork()
+        function(fork)
+        fallback = (list(fork._build_stack), list(fork._deploy_stack))
+        with self._lock:
+            self._fallback = fallback
+
+    def checkpoint(self):
+        """Saves the current build and deploy stacks as the fallback plan
+
+        """
+        with self._lock:
+            if not self._submitted:
+                self._fallback = (list(self.game_state._build_stack), list(self.game_state._deploy_stack))
+
+    def run(self):
+        """Runs the stages by priority until they are done or time runs out, then submits the turn
+
+        """
+        watchdog = threading.Timer(max(0, self.time_left()), self.__submit_fallback)
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            for _, _, name, function in sorted(self._tasks, key=lambda task: task[:2]):
+                if self.time_left() <= 0:
+                    self.skipped.append(name)
+                    continue
+                with profiler.stage("stage." + name):
+                    function(self.game_state)
+                self.completed.append(name)
+                self.checkpoint()
+        finally:
+            watchdog.cancel()
+            if self.skipped:
+                debug_write("Out of time, skipped stages: {}".format(", ".join(self.skipped)))
+            if self.skipped and not self.completed:
+                # No stage finished, send the plan from plan_fallback
+                self.__submit_fallback()
+            self.submit()
+
+    def submit(self):
+        """Submits the turn with the current build and deploy stacks, unless it was already submitted
+
+        """
+        with self._lock:
+            if self._submitted:
+                return
+            self._submitted = True
+        self.game_state.submit_turn()
+
+    def __submit_fallback(self):
+        with self._lock:
+            if self._submitted:
+                return
+            self._submitted = True
+            build_stack, deploy_stack = self._fallback
+        debug_write("Turn deadline reached, submitting the plan from stages: {}".format(", ".join(self.completed)))
+        self.game_state._submit_stacks(build_stack, deploy_stack)
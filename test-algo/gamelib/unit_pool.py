@@ -0,0 +1,177 @@
+from .unit_spec import get_unit_specs
+
+_pool_config = None
+_pool = None
+
+
+class CompactUnit:
+    """A GameUnit with a fixed set of slots instead of an instance dict.
+
+    The per-unit state (type, owner, position, stability and removal flag) is
+    stored in slots. The stats shared by all units of a type (cost, range,
+    damage, speed, max stability) are read from the type's UnitSpec. Otherwise it
+    behaves like a GameUnit and takes the same constructor arguments.
+
+    Boards get their units from a UnitPool, which reuses CompactUnits across turns.
+
+    Attributes:
+        * unit_type (string): This unit's type
+        * config (JSON): Contains information about the game
+        * player_index (integer): The player that controls this unit. 0 for you, 1 for your opponent.
+        * x (integer): The x coordinate of the unit
+        * y (integer): The y coordinate of the unit
+        * stability (float): The current health of the unit
+        * pending_removal (boolean): If this unit is marked for removal by its owner
+        * spec (:obj: UnitSpec): The stats of the unit's type
+
+    """
+    __slots__ = ("unit_type", "config", "player_index", "pending_removal", "x", "y", "stability", "spec")
+
+    def __init__(self, unit_type, config, player_index=None, stability=None, x=-1, y=-1):
+        """ Initialize unit variables using args passed
+
+        """
+        self.reset(get_unit_specs(config)[unit_type], config, player_index, stability, x, y)
+
+    def reset(self, spec, config, player_index=None, stability=None, x=-1, y=-1):
+        """Reinitializes the unit in place, which is how pooled units are reused
+
+        Args:
+            * spec: The UnitSpec of the unit's type
+            * config (JSON): A json object containing information about the game
+            * player_index: The player that controls this unit
+            * stability: The current health of the unit, full health if None
+            * x: The x coordinate of the unit
+            * y: The y coordinate of the unit
+
+        """
+        self.unit_type = spec.shorthand
+        self.config = config
+        self.player_index = player_index
+        self.pending_removal = False
+        self.x = x
+        self.y = y
+        self.spec = spec
+        self.stability = spec.stability if not stability else stability
+
+    @property
+    def stationary(self):
+        return self.spec.stationary
+
+    @property
+    def speed(self):
+        return self.spec.speed
+
+    @property
+    def damage(self):
+        return self.spec.damage
+
+    @property
+    def range(self):
+        return self.spec.range
+
+    @property
+    def max_stability(self):
+        return self.spec.stability
+
+    @property
+    def cost(self):
+        return self.spec.cost
+
+    def __copy__(self):
+        unit = CompactUnit.__new__(CompactUnit)
+        unit.reset(self.spec, self.config, self.player_index, self.stability, self.x, self.y)
+        unit.pending_removal = self.pending_removal
+        return unit
+
+    def __toString(self):
+        owner = "Friendly" if self.player_index == 0 else "Enemy"
+        removal = ", pending removal" if self.pending_removal else ""
+        return "{} {}, stability: {} location: {}{} ".format(owner, self.unit_type, self.stability, [self.x, self.y], removal)
+
+    def __str__(self):
+        return self.__toString()
+
+    def __repr__(self):
+        return self.__toString()
+
+
+class UnitPool:
+    """A free list of CompactUnits shared by every board built from one config.
+
+    Boards take units with acquire and hand them back with release once the
+    board is discarded, so a new turn reuses the previous turn's units instead
+    of allocating new ones. Use get_unit_pool to get the pool for a config.
+
+    Attributes:
+        * max_free (int): The most released units kept for reuse, the rest are left to the garbage collector
+
+    """
+
+    def __init__(self, config, max_free=4096):
+        """ Creates an empty pool
+
+        Args:
+            * config (JSON): A json object containing information about the game
+            * max_free: The most released units kept for reuse
+
+        """
+        self.config = config
+        self.unit_specs = get_unit_specs(config)
+        self.max_free = max_free
+        self._free = []
+
+    def acquire(self, unit_type, player_index=None, stability=None, x=-1, y=-1):
+        """Gets a unit, reusing a released one when possible
+
+        Args:
+            * unit_type: The type of the unit
+            * player_index: The player that controls this unit, 0 for you 1 for your opponent
+            * stability: The current health of the unit, full health if None
+            * x: The x coordinate of the unit
+            * y: The y coordinate of the unit
+
+        Returns:
+            A CompactUnit
+
+        """
+        unit = self._free.pop() if self._free else CompactUnit.__new__(CompactUnit)
+        unit.reset(self.unit_specs[unit_type], self.config, player_index, stability, x, y)
+        return unit
+
+    def release(self, units):
+        """Returns units to the pool. They must not be used afterwards.
+
+        Args:
+            * units: The units to return
+
+        """
+        room = self.max_free - len(self._free)
+        if room > 0:
+            self._free.extend(units[:room])
+
+    def free_count(self):
+        """Gets the number of units waiting to be reused
+
+        Returns:
+            The size of the free list
+
+        """
+        return len(self._free)
+
+
+def get_unit_pool(config):
+    """Gets the UnitPool for a config, creating it on first use
+
+    Args:
+        * config (JSON): A json object containing information about the game
+
+    Returns:
+        The UnitPool shared by everything using this config
+
+    """
+    global _pool_config, _pool
+    if _pool_config is not config:
+        _pool = UnitPool(config)
+        _pool_config = config
+    return _pool
@@ -0,0 +1,132 @@
+from collections import namedtuple
+
+# Indices into config["unitInformation"], matching UNIT_TYPE_TO_INDEX in game_state
+FIREWALL_INDICES = (0, 1, 2)
+ENCRYPTOR_INDEX = 1
+
+_compiled_config = None
+_compiled_registry = None
+
+
+class UnitSpec(namedtuple("UnitSpec", ("shorthand", "index", "stationary", "cost", "stability", "range", "speed",
+                                       "damage", "damage_f", "damage_i", "shield_amount", "damage_to_player"))):
+    """The stats shared by every unit of one type.
+
+    Specs are immutable and there is exactly one per unit type, so read them
+    instead of building a GameUnit just to look at its stats.
+
+    Attributes:
+        * shorthand (str): The unit type, FF, PI, etc.
+        * index (int): The index of the type in config["unitInformation"]
+        * stationary (bool): True for firewalls
+        * cost (float): The cores or bits needed to spawn the unit
+        * stability (float): The stability of a newly spawned unit
+        * range (float): The attack or shield range
+        * speed (float): The number of moves per frame, 0 for firewalls
+        * damage (float): The damage a GameUnit of this type reports, 0 for encryptors
+        * damage_f (float): The damage dealt to firewalls
+        * damage_i (float): The damage dealt to information units
+        * shield_amount (float): The shield an encryptor gives, 0 for other types
+        * damage_to_player (float): The health an information unit takes when it breaches
+
+    """
+    __slots__ = ()
+
+
+class UnitSpecRegistry:
+    """The UnitSpec of every unit type in a config, compiled once.
+
+    Look specs up by shorthand with registry[unit_type] or by config index
+    with registry.specs[index]. The stats of all types are also kept in lists
+    indexed like config["unitInformation"], for code that works with type indices.
+
+    Attributes:
+        * specs (list): The UnitSpec of each type, by config index
+        * costs (list): The cost of each type
+        * stabilities (list): The starting stability of each type
+        * ranges (list): The range of each type
+        * speeds (list): The speed of each type
+        * damages (list): The damage of each type, as reported by GameUnit
+        * stationary (list): True for each firewall type
+
+    """
+
+    def __init__(self, config):
+        """ Compiles the specs of every unit type in config
+
+        Args:
+            * config (JSON): A json object containing information about the game
+
+        """
+        self.specs = []
+        self._by_type = {}
+        for index, unit_info in enumerate(config["unitInformation"]):
+            spec = self.__compile(index, unit_info)
+            self.specs.append(spec)
+            self._by_type[spec.shorthand] = spec
+        self.costs = [spec.cost for spec in self.specs]
+        self.stabilities = [spec.stability for spec in self.specs]
+        self.ranges = [spec.range for spec in self.specs]
+        self.speeds = [spec.speed for spec in self.specs]
+        self.damages = [spec.damage for spec in self.specs]
+        self.stationary = [spec.stationary for spec in self.specs]
+
+    def __compile(self, index, unit_info):
+        stationary = index in FIREWALL_INDICES
+        damage_f = unit_info.get("damageF", unit_info.get("damage", 0))
+        damage_i = unit_info.get("damageI", unit_info.get("damage", 0))
+        if stationary:
+            # Matches GameUnit, which reports 0 damage for encryptors
+            damage = 0 if index == ENCRYPTOR_INDEX else unit_info.get("damage", 0)
+        else:
+            damage = damage_i
+        shield_amount = unit_info.get("shieldAmount", unit_info.get("damage", 0)) if index == ENCRYPTOR_INDEX else 0
+        return UnitSpec(
+            shorthand=unit_info.get("shorthand"),
+            index=index,
+            stationary=stationary,
+            cost=unit_info.get("cost", 0),
+            stability=unit_info.get("stability", 0),
+            range=unit_info.get("range", 0),
+            speed=0 if stationary else unit_info.get("speed", 0),
+            damage=damage,
+            damage_f=damage_f,
+            damage_i=damage_i,
+            shield_amount=shield_amount,
+            damage_to_player=unit_info.get("damageToPlayer", 1),
+        )
+
+    def __getitem__(self, unit_type):
+        return self._by_type[unit_type]
+
+    def __contains__(self, unit_type):
+        return unit_type in self._by_type
+
+    def index_of(self, unit_type):
+        """Gets the config index of a unit type
+
+        Args:
+            * unit_type: The unit type, FF, PI, etc.
+
+        Returns:
+            The index of the type in config["unitInformation"]
+
+        """
+        return self._by_type[unit_type].index
+
+
+def get_unit_specs(config):
+    """Gets the UnitSpecRegistry for a config, compiling it on first use
+
+    Args:
+        * config (JSON): A json object containing information about the game
+
+    Returns:
+        The UnitSpecRegistry shared by everything using this config
+
+    """
+    global _compiled_config, _compiled_registry
+    if _compiled_config is not config:
+        _compiled_registry = UnitSpecRegistry(config)
+        _compiled_config = config
+    return _compiled_registry